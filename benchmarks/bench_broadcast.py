@@ -0,0 +1,154 @@
+"""
+Localhost benchmark of the canvas-delta broadcast server.
+
+Drives a sketchpad with synthetic landmarks (an index fingertip drawing circles,
+plus periodic undo, redo, and clear), streams it to several viewers on
+localhost, and reports bytes per second and creation-to-applied delta
+latency per viewer. Fast viewers must end up with the same canvas as the
+sketchpad.
+
+Run from the repository root:
+    python3 benchmarks/bench_broadcast.py --seconds 5 --viewers 3
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from broadcast import BroadcastServer  # noqa: E402
+from sketchpad import Sketchpad  # noqa: E402
+from viewer import Viewer  # noqa: E402
+
+# Row, col landmarks of an upright hand relative to its index fingertip, with the index finger extended and
+# the other fingers curled (the thumb folded across the palm, or held straight out for the toggle)
+HAND_TEMPLATE = np.array([[200, 20],
+                          [180, -10], [160, -25], [150, -5], [145, 15],
+                          [110, 0], [70, 0], [40, 0], [0, 0],
+                          [105, 30], [80, 30], [100, 30], [120, 30],
+                          [110, 55], [85, 55], [105, 55], [125, 55],
+                          [120, 80], [100, 80], [115, 80], [130, 80]])
+THUMB_OUT = np.array([[180, -10], [160, -35], [140, -60], [120, -85]])
+
+
+def synthetic_hand(t, radius=150, center=(400, 640), thumb=False):
+    """
+    Builds one hand whose index fingertip moves around a circle.
+
+    Parameters:
+        t (float): The time in seconds.
+        radius (int): The circle radius in pixels.
+        center (tuple of ints): The row, col circle center.
+        thumb (bool): Whether or not the thumb is extended (toggles the
+                      cursor).
+
+    Returns:
+        (3d numpy array): The (1, 21, 2) positions.
+    """
+    landmarks = HAND_TEMPLATE.copy()
+    if thumb:
+        landmarks[1:5] = THUMB_OUT
+    tip = (int(center[0] + radius * math.sin(2 * t)), int(center[1] + radius * math.cos(3 * t)))
+    return (landmarks + tip)[None].astype(np.int32)
+
+
+def drive(sketchpad, seconds, fps):
+    """
+    Runs the sketchpad on synthetic landmarks at a fixed frame rate.
+
+    Parameters:
+        sketchpad (Sketchpad): The sketchpad.
+        seconds (float): How long to draw for.
+        fps (float): Updates per second.
+
+    Returns:
+        (int): The number of updates.
+    """
+
+    # Turning the cursor on with a thumb extension (held for a few frames so the toggle gesture enters)
+    for _ in range(3):
+        sketchpad.update(synthetic_hand(0.0, thumb=True), None, [0])
+
+    start = time.perf_counter()
+    n_frames = 0
+    while time.perf_counter() - start < seconds:
+        t = time.perf_counter() - start
+        sketchpad.update(synthetic_hand(t), None, [0])
+
+        # Undo, redo, and clear now and then (tile deltas and clear events)
+        if n_frames % 90 == 45:
+            sketchpad.undo()
+        elif n_frames % 90 == 60:
+            sketchpad.redo()
+        elif n_frames % 300 == 299:
+            sketchpad.clear()
+
+        n_frames += 1
+        time.sleep(max(0.0, start + n_frames / fps - time.perf_counter()))
+
+    # One more update so pending keyframe requests are served
+    sketchpad.update(synthetic_hand(seconds), None, [0])
+    return n_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broadcast server localhost benchmark")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--fps", type=float, default=60.0)
+    parser.add_argument("--viewers", type=int, default=3)
+    parser.add_argument("--slow-delay", type=float, default=0.05,
+                        help="per-message delay of one extra slow viewer (0 to disable)")
+    args = parser.parse_args()
+
+    sketchpad = Sketchpad()
+    server = BroadcastServer(sketchpad.canvas, port=0, max_queue=16)
+    server.start()
+    sketchpad.broadcaster = server
+
+    # Viewers run on their own event loop thread
+    viewers = [Viewer(port=server.port) for _ in range(args.viewers)]
+    if args.slow_delay:
+        viewers.append(Viewer(port=server.port, read_delay=args.slow_delay))
+
+    async def run_viewers():
+        await asyncio.gather(*(viewer.run(duration=args.seconds + 1.0) for viewer in viewers))
+
+    viewer_thread = threading.Thread(target=asyncio.run, args=(run_viewers(),))
+    viewer_thread.start()
+    while len(server.viewers) < len(viewers):
+        time.sleep(0.01)
+
+    n_frames = drive(sketchpad, args.seconds, args.fps)
+    viewer_thread.join()
+    server_stats = server.stats()
+    server.stop()
+
+    print("{} updates, {} segments".format(n_frames, sketchpad.strokes.n_segments))
+    for i, viewer in enumerate(viewers):
+        summary = viewer.summary()
+        latency = summary["latency_ms"]
+        slow = " (slow)" if viewer.read_delay else ""
+        print("viewer {}{}: {:8.1f} KB/s  {:5d} messages  {} keyframes  "
+              "latency p50 {:6.2f} ms  p95 {:6.2f} ms  max {:6.2f} ms"
+              .format(i, slow, summary["bytes_per_s"] / 1024, summary["messages"], summary["keyframes"],
+                      latency.get("p50", 0.0), latency.get("p95", 0.0), latency.get("max", 0.0)))
+
+        # Fast viewers must match the sketchpad exactly
+        if not viewer.read_delay:
+            canvas = sketchpad.canvas
+            assert np.array_equal(viewer.canvas.mask, canvas.mask), "viewer {} mask differs".format(i)
+            ink = canvas.mask > 0
+            assert np.array_equal(viewer.canvas.image[ink], canvas.image[ink]), "viewer {} image differs".format(i)
+
+    for i, stats in enumerate(server_stats):
+        print("server queue {}: {} dropped".format(i, stats["dropped"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Microbenchmark comparing the tuple landmark API with the array-backed one.
+
+Run from the repository root:
+    python3 benchmarks/bench_landmarks.py
+"""
+import os
+import sys
+import timeit
+from math import dist
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from hand_tracker import HandTracker  # noqa: E402
+
+
+class FakeLandmark:
+    """Stand-in for a MediaPipe normalized landmark."""
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class FakeHand:
+    """Stand-in for a MediaPipe hand landmark list."""
+
+    def __init__(self, coords):
+        self.landmark = [FakeLandmark(x, y) for x, y in coords]
+
+
+def legacy_extended_fingers(pos_list):
+    """
+    Scalar finger extension check (the implementation the batched classifier
+    replaced), kept here as the baseline.
+
+    Parameters:
+        pos_list (list of tuples): The row, col position of each landmark.
+
+    Returns:
+        (list of bools): Whether or not each finger is extended.
+    """
+    extend_list = []
+    for i in [4, 8, 12, 16, 20]:
+        if i == 4:
+            a1 = np.array(pos_list[4]) - np.array(pos_list[3])
+            b1 = np.array(pos_list[2]) - np.array(pos_list[3])
+            cos_angle1 = np.dot(a1, b1) / (np.linalg.norm(a1) * np.linalg.norm(b1) + 1e-6)
+            angle_2_3_4 = np.degrees(np.arccos(np.clip(cos_angle1, -1.0, 1.0)))
+            a2 = np.array(pos_list[3]) - np.array(pos_list[2])
+            b2 = np.array(pos_list[1]) - np.array(pos_list[2])
+            cos_angle2 = np.dot(a2, b2) / (np.linalg.norm(a2) * np.linalg.norm(b2) + 1e-6)
+            angle_1_2_3 = np.degrees(np.arccos(np.clip(cos_angle2, -1.0, 1.0)))
+            thumb_tip_dist = dist(pos_list[4], pos_list[17])
+            hand_base_dist = dist(pos_list[0], pos_list[5])
+            extend_list.append(150 <= angle_2_3_4 <= 195 and
+                               150 <= angle_1_2_3 <= 195 and
+                               thumb_tip_dist > 1.2 * hand_base_dist)
+        else:
+            extend_list.append(dist(pos_list[i], pos_list[0]) > dist(pos_list[i - 1], pos_list[0])
+                               and dist(pos_list[i], pos_list[0]) > dist(pos_list[i - 2], pos_list[0])
+                               and dist(pos_list[i], pos_list[0]) > dist(pos_list[i - 3], pos_list[0]))
+    return extend_list
+
+
+def main(n_hands=2, number=2000, seed=0):
+    """
+    Times both landmark paths and checks that they agree.
+
+    Parameters:
+        n_hands (int): The number of hands in each synthetic frame.
+        number (int): The number of timed iterations.
+        seed (int): Seed for the synthetic landmarks.
+    """
+
+    # Tracker fed with synthetic landmarks (MediaPipe inference is not timed)
+    rng = np.random.default_rng(seed)
+    tracker = HandTracker(max_hands=n_hands)
+    tracker.img_h, tracker.img_w = 720, 1280
+    tracker.hand_landmarks = [FakeHand(rng.uniform(0.2, 0.8, size=(21, 2))) for _ in range(n_hands)]
+    tracker.landmarks = tracker.hand_landmarks[-1]
+
+    # Both paths must classify every hand the same way
+    pos_array = tracker.get_pos_array()
+    batched = tracker.get_extended_array().tolist()
+    legacy = [legacy_extended_fingers([tuple(p) for p in hand.tolist()]) for hand in pos_array]
+    assert batched == legacy, (batched, legacy)
+
+    def tuple_path():
+        for hand in tracker.hand_landmarks:
+            pos_list = [(int(lm.y * tracker.img_h), int(lm.x * tracker.img_w)) for lm in hand.landmark]
+            legacy_extended_fingers(pos_list)
+
+    def array_path():
+        tracker.get_pos_array()
+        tracker.get_extended_array()
+
+    # Timing each path
+    for name, fn in (("tuple + scalar", tuple_path), ("array + batched", array_path)):
+        seconds = timeit.timeit(fn, number=number)
+        print("{:<16} {:8.1f} us/frame ({} hands)".format(name, seconds / number * 1e6, n_hands))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+import asyncio
+import json
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+from session import pack_segments
+from tiled_canvas import TiledCanvas
+
+# Message kinds
+HELLO = 0
+SEGMENTS = 1
+TILES = 2
+CLEAR = 3
+KEYFRAME = 4
+
+# Every message starts with its kind, payload length, and the time.time() it was created at
+HEADER = struct.Struct("<BId")
+
+# Each tile in a tiles payload starts with its tile row, tile col, and encoded length
+TILE_HEADER = struct.Struct("<iiI")
+
+
+def encode_message(kind, payload=b"", t=None):
+    """
+    Frames a message.
+
+    Parameters:
+        kind (int): The message kind.
+        payload (bytes): The message body.
+        t (float): The creation time (None for now).
+
+    Returns:
+        (bytes): The framed message.
+    """
+    return HEADER.pack(kind, len(payload), time.time() if t is None else t) + payload
+
+
+async def read_message(reader):
+    """
+    Reads one framed message.
+
+    Parameters:
+        reader (asyncio.StreamReader): The connection.
+
+    Returns:
+        (int), (bytes), (float): The kind, payload, and creation time.
+    """
+    kind, length, t = HEADER.unpack(await reader.readexactly(HEADER.size))
+    payload = await reader.readexactly(length) if length else b""
+    return kind, payload, t
+
+
+def encode_tiles(tiles, tile_size):
+    """
+    Compresses canvas tiles into a tiles payload (each tile is a PNG with the
+    ink mask as its alpha channel, so empty areas compress to almost nothing).
+
+    Parameters:
+        tiles (list of tuples): (tile row, tile col), image, mask of each tile.
+        tile_size (int): The tile side length in pixels.
+
+    Returns:
+        (bytes): The payload.
+    """
+    parts = [struct.pack("<I", tile_size)]
+    for (row, col), image, mask in tiles:
+        _, png = cv2.imencode(".png", np.dstack((image, mask)), [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        parts.append(TILE_HEADER.pack(row, col, len(png)))
+        parts.append(png.tobytes())
+    return b"".join(parts)
+
+
+def decode_tiles(payload):
+    """
+    Decompresses a tiles payload.
+
+    Parameters:
+        payload (bytes): The payload.
+
+    Returns:
+        (int), (list of tuples): The tile size and the (tile row, tile col),
+                                 image, mask of each tile.
+    """
+    tile_size = struct.unpack_from("<I", payload)[0]
+    offset = 4
+    tiles = []
+    while offset < len(payload):
+        row, col, length = TILE_HEADER.unpack_from(payload, offset)
+        offset += TILE_HEADER.size
+        bgra = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8, count=length, offset=offset), cv2.IMREAD_UNCHANGED)
+        offset += length
+        tiles.append(((row, col), np.ascontiguousarray(bgra[:, :, :3]), np.ascontiguousarray(bgra[:, :, 3])))
+    return tile_size, tiles
+
+
+class ViewerConnection:
+    """Class holding the send queue and statistics of one connected viewer."""
+
+    def __init__(self, writer, max_queue):
+        """
+        Initializes a ViewerConnection object.
+
+        Parameters:
+            writer (asyncio.StreamWriter): The connection.
+            max_queue (int): The number of unsent messages before the viewer
+                             counts as too slow.
+        """
+        self.writer = writer
+        self.queue = asyncio.Queue(maxsize=max_queue)
+
+        # Whether or not deltas are skipped until the viewer receives a keyframe
+        self.resync = True
+
+        # Statistics
+        self.bytes_sent = 0
+        self.messages_sent = 0
+        self.dropped = 0
+
+
+class BroadcastServer(threading.Thread):
+    """Thread running an asyncio server that streams canvas deltas to viewers.
+
+    Viewers receive new stroke segments, compressed tiles changed by undo and
+    redo, and clear events, never webcam frames. A viewer that falls more than
+    max_queue messages behind has its backlog dropped and is sent a single
+    keyframe (every tile with ink) instead, so a slow viewer never slows the
+    render loop or the other viewers.
+
+    The render thread calls the send methods; messages are handed to the
+    server loop with call_soon_threadsafe, which keeps them in order.
+    """
+
+    def __init__(self, canvas, host="127.0.0.1", port=8765, max_queue=64, tile_size=64):
+        """
+        Initializes a BroadcastServer object.
+
+        Parameters:
+            canvas (Canvas or TiledCanvas): The canvas being broadcast.
+            host (str): The address to listen on.
+            port (int): The port to listen on (0 for any free port).
+            max_queue (int): The number of unsent messages per viewer before
+                             it is resynced with a keyframe.
+            tile_size (int): The keyframe tile size for fixed-size canvases.
+        """
+        super().__init__(daemon=True)
+
+        # Defining class attributes with constructor args
+        self.canvas = canvas
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self.tile_size = canvas.tile_size if isinstance(canvas, TiledCanvas) else tile_size
+
+        # Canvas description sent to every new viewer
+        if isinstance(canvas, TiledCanvas):
+            self.hello = {"infinite": True, "tile_size": canvas.tile_size}
+        else:
+            self.hello = {"infinite": False, "width": canvas.width, "height": canvas.height}
+
+        # Connected viewers, and viewers waiting for a keyframe from the render thread
+        self.viewers = []
+        self.keyframe_lock = threading.Lock()
+        self.keyframe_requested = False
+
+        # Number of segments already sent
+        self.sent_segments = 0
+
+        # Server loop (set once the server is listening)
+        self.loop = None
+        self.stopped = None
+        self.ready = threading.Event()
+
+        # Error that kept the server from listening (re-raised by start)
+        self.error = None
+
+    def run(self):
+        """Runs the server loop until stop is called."""
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        """Listens for viewers until stopped."""
+        self.loop = asyncio.get_running_loop()
+        self.stopped = self.loop.create_future()
+
+        # Listening (e.g. a port in use fails here; start is woken up either way)
+        try:
+            server = await asyncio.start_server(self.handle_viewer, self.host, self.port)
+            self.port = server.sockets[0].getsockname()[1]
+        except Exception as error:
+            self.error = error
+            self.loop = None
+            return
+        finally:
+            self.ready.set()
+
+        async with server:
+            await self.stopped
+
+        # Closing viewer connections
+        for viewer in self.viewers:
+            viewer.writer.close()
+
+    def start(self):
+        """Starts the server thread and waits until it is listening (re-raises the error if it can't listen)."""
+        super().start()
+        self.ready.wait()
+        if self.error is not None:
+            self.join()
+            raise self.error
+
+    def stop(self):
+        """Stops the server and waits for the thread."""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopped.set_result, None)
+        self.join()
+
+    async def handle_viewer(self, reader, writer):
+        """
+        Sends queued messages to one viewer until it disconnects.
+
+        Parameters:
+            reader (asyncio.StreamReader): The viewer's incoming stream.
+            writer (asyncio.StreamWriter): The viewer's outgoing stream.
+        """
+        viewer = ViewerConnection(writer, self.max_queue)
+        self.viewers.append(viewer)
+        self.request_keyframe()
+        try:
+            await self.write(viewer, encode_message(HELLO, json.dumps(self.hello).encode()))
+            while True:
+                await self.write(viewer, await viewer.queue.get())
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.viewers.remove(viewer)
+            writer.close()
+
+    async def write(self, viewer, message):
+        """
+        Writes a message and waits until the socket can take more.
+
+        Parameters:
+            viewer (ViewerConnection): The viewer.
+            message (bytes): The framed message.
+        """
+        viewer.writer.write(message)
+        await viewer.writer.drain()
+        viewer.bytes_sent += len(message)
+        viewer.messages_sent += 1
+
+    def request_keyframe(self):
+        """Asks the render thread to send a keyframe on its next poll."""
+        with self.keyframe_lock:
+            self.keyframe_requested = True
+
+    def dispatch(self, message, keyframe=False):
+        """
+        Queues a message for every viewer (runs on the server loop).
+
+        Parameters:
+            message (bytes): The framed message.
+            keyframe (bool): Whether or not the message is a keyframe.
+        """
+        for viewer in self.viewers:
+
+            # Keyframes replace whatever a resyncing viewer has queued
+            if keyframe:
+                if not viewer.resync:
+                    continue
+                while not viewer.queue.empty():
+                    viewer.queue.get_nowait()
+                viewer.resync = False
+                viewer.queue.put_nowait(message)
+                continue
+
+            # Deltas are skipped until the keyframe arrives
+            if viewer.resync:
+                continue
+
+            # Too slow: drop the backlog and resync with a keyframe
+            if viewer.queue.full():
+                viewer.dropped += viewer.queue.qsize()
+                while not viewer.queue.empty():
+                    viewer.queue.get_nowait()
+                viewer.resync = True
+                self.request_keyframe()
+                continue
+
+            viewer.queue.put_nowait(message)
+
+    def dispatch_tiles(self, kind, tiles, tile_size, t):
+        """
+        Compresses tiles and queues them for every viewer (runs on the server
+        loop so compression never blocks the render thread).
+
+        Parameters:
+            kind (int): TILES or KEYFRAME.
+            tiles (list of tuples): (tile row, tile col), image, mask of each
+                                    tile.
+            tile_size (int): The tile side length in pixels.
+            t (float): The time the tiles were read.
+        """
+        self.dispatch(encode_message(kind, encode_tiles(tiles, tile_size), t), keyframe=kind == KEYFRAME)
+
+    def send(self, message):
+        """
+        Hands a message to the server loop (called from the render thread).
+
+        Parameters:
+            message (bytes): The framed message.
+        """
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.dispatch, message)
+
+    def send_segments(self, strokes):
+        """
+        Sends the segments added since the last call.
+
+        Parameters:
+            strokes (StrokeStore): The strokes of the sketchpad.
+        """
+        start, end = self.sent_segments, strokes.n_segments
+        if end <= start:
+            return
+        self.send(encode_message(SEGMENTS, pack_segments(strokes, start, end).tobytes()))
+        self.sent_segments = end
+
+    def send_clear(self):
+        """Sends a clear event."""
+        self.send(encode_message(CLEAR))
+
+    def send_tiles(self, keys, tile_size):
+        """
+        Sends canvas tiles (e.g. the ones undo or redo changed).
+
+        Parameters:
+            keys (list of tuples): The tile row, tile col of each tile.
+            tile_size (int): The tile side length in pixels.
+        """
+        if not keys or self.loop is None:
+            return
+        tiles = [(key,) + self.canvas.read_tile(key, tile_size) for key in keys]
+        self.loop.call_soon_threadsafe(self.dispatch_tiles, TILES, tiles, tile_size, time.time())
+
+    def poll(self):
+        """Sends a keyframe if a viewer asked for one (called from the render thread)."""
+        with self.keyframe_lock:
+            if not self.keyframe_requested:
+                return
+            self.keyframe_requested = False
+
+        # Reading every tile with ink on the render thread, so the keyframe matches the deltas after it
+        tiles = [(key,) + self.canvas.read_tile(key, self.tile_size) for key in self.canvas.ink_tiles(self.tile_size)]
+        self.loop.call_soon_threadsafe(self.dispatch_tiles, KEYFRAME, tiles, self.tile_size, time.time())
+
+    def stats(self):
+        """
+        Returns per-viewer statistics.
+
+        Returns:
+            (list of dicts): Bytes sent, messages sent, messages dropped, and
+                             queue depth of each viewer.
+        """
+        return [{"bytes_sent": viewer.bytes_sent,
+                 "messages_sent": viewer.messages_sent,
+                 "dropped": viewer.dropped,
+                 "queued": viewer.queue.qsize()} for viewer in list(self.viewers)]
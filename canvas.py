@@ -0,0 +1,238 @@
+import cv2
+import numpy as np
+
+
+class Canvas:
+    """Class representing the drawing canvas and its ink coverage mask."""
+
+    def __init__(self, width, height):
+        """
+        Initializes a Canvas object.
+
+        Parameters:
+            width (int): The canvas width in pixels.
+            height (int): The canvas height in pixels.
+        """
+
+        # Defining class attributes with constructor args
+        self.width = width
+        self.height = height
+
+        # Drawing image and mask of pixels that hold ink (255) or not (0)
+        self.image = np.zeros((height, width, 3), dtype=np.uint8)
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+
+        # Rows that may hold ink (empty when top >= bottom)
+        self.ink_top = height
+        self.ink_bottom = 0
+
+        # Rows changed since the last call to take_changed (drawn, erased, or cleared)
+        self.changed_top = height
+        self.changed_bottom = 0
+
+    def is_empty(self):
+        """
+        Checks if the canvas has no ink rows.
+
+        Returns:
+            (bool): Whether or not nothing has been drawn since the last clear.
+        """
+        return self.ink_top >= self.ink_bottom
+
+    def mark_dirty(self, top, bottom):
+        """
+        Extends the range of rows that may hold ink.
+
+        Parameters:
+            top (int): The first dirty row.
+            bottom (int): One past the last dirty row.
+        """
+        self.ink_top = max(0, min(self.ink_top, top))
+        self.ink_bottom = min(self.height, max(self.ink_bottom, bottom))
+
+    def mark_changed(self, top, bottom):
+        """
+        Extends the range of rows changed since the last call to take_changed.
+
+        Parameters:
+            top (int): The first changed row.
+            bottom (int): One past the last changed row.
+        """
+        self.changed_top = max(0, min(self.changed_top, top))
+        self.changed_bottom = min(self.height, max(self.changed_bottom, bottom))
+
+    def take_changed(self):
+        """
+        Returns and resets the range of changed rows.
+
+        Returns:
+            (int), (int): The first changed row and one past the last (equal
+                          if nothing changed).
+        """
+        top, bottom = self.changed_top, max(self.changed_top, self.changed_bottom)
+        self.changed_top = self.height
+        self.changed_bottom = 0
+        return top, bottom
+
+    def draw_line(self, pt1, pt2, color, thickness):
+        """
+        Draws a line on the canvas and updates the mask under it.
+
+        Parameters:
+            pt1 (tuple of ints): The x, y position of the line start.
+            pt2 (tuple of ints): The x, y position of the line end.
+            color (tuple of ints): The bgr color code for the line. Black
+                                   erases.
+            thickness (int): The line thickness.
+        """
+
+        # Draw the line on the image
+        cv2.line(self.image, pt1, pt2, color, thickness)
+
+        # Draw the same line on the mask (rasterization is identical, so only touched pixels change)
+        ink = 255 if any(color) else 0
+        cv2.line(self.mask, pt1, pt2, ink, thickness)
+
+        # Track the rows that changed and may now hold ink
+        margin = thickness // 2 + 1
+        self.mark_changed(min(pt1[1], pt2[1]) - margin, max(pt1[1], pt2[1]) + margin + 1)
+        if ink:
+            self.mark_dirty(min(pt1[1], pt2[1]) - margin, max(pt1[1], pt2[1]) + margin + 1)
+
+    def draw_segments(self, lines, color, thickness, shift=0):
+        """
+        Draws many line segments of the same color and thickness in one call.
+
+        Parameters:
+            lines (list of 2d numpy arrays): (2, 2) int32 arrays holding the
+                                             x, y start and end of each
+                                             segment.
+            color (tuple of ints): The bgr color code for the lines. Black
+                                   erases.
+            thickness (int): The line thickness.
+            shift (int): Number of fractional bits in the coordinates.
+        """
+
+        # Case for nothing to draw
+        if not lines:
+            return
+
+        # Draw all segments on the image and the mask
+        cv2.polylines(self.image, lines, False, color, thickness, shift=shift)
+        ink = 255 if any(color) else 0
+        cv2.polylines(self.mask, lines, False, ink, thickness, shift=shift)
+
+        # Track the rows that changed and may now hold ink
+        rows = np.concatenate(lines)[:, 1] >> shift
+        margin = thickness // 2 + 1
+        self.mark_changed(int(rows.min()) - margin, int(rows.max()) + margin + 2)
+        if ink:
+            self.mark_dirty(int(rows.min()) - margin, int(rows.max()) + margin + 2)
+
+    def clear(self):
+        """Erases all drawings without reallocating the canvas."""
+
+        # Case for nothing to clear
+        if self.is_empty():
+            return
+
+        # Zero only the rows that may hold ink
+        self.image[self.ink_top:self.ink_bottom] = 0
+        self.mask[self.ink_top:self.ink_bottom] = 0
+        self.mark_changed(self.ink_top, self.ink_bottom)
+        self.ink_top = self.height
+        self.ink_bottom = 0
+
+    def composite(self, frame):
+        """
+        Copies the drawings onto a frame in place.
+
+        Parameters:
+            frame (3d numpy array): The frame to draw on. Must be the same size
+                                    as the canvas.
+
+        Returns:
+            (3d numpy array): The input frame with the drawings added.
+        """
+
+        # Case for nothing to draw
+        if self.is_empty():
+            return frame
+
+        # Masked copy over the rows that may hold ink (row slices stay contiguous so the copy is in place)
+        rows = slice(self.ink_top, self.ink_bottom)
+        cv2.copyTo(self.image[rows], self.mask[rows], frame[rows])
+
+        return frame
+
+    def tile_in_bounds(self, key, tile_size):
+        """
+        Checks if a tile lies on the canvas.
+
+        Parameters:
+            key (tuple of ints): The tile row, tile col.
+            tile_size (int): The tile side length in pixels.
+
+        Returns:
+            (bool): Whether or not the tile overlaps the canvas.
+        """
+        return 0 <= key[0] * tile_size < self.height and 0 <= key[1] * tile_size < self.width
+
+    def read_tile(self, key, tile_size):
+        """
+        Copies a tile of the image and mask.
+
+        Parameters:
+            key (tuple of ints): The tile row, tile col.
+            tile_size (int): The tile side length in pixels.
+
+        Returns:
+            (3d numpy array), (2d numpy array): The image and mask of the tile.
+        """
+        rows = slice(key[0] * tile_size, (key[0] + 1) * tile_size)
+        cols = slice(key[1] * tile_size, (key[1] + 1) * tile_size)
+        return self.image[rows, cols].copy(), self.mask[rows, cols].copy()
+
+    def write_tile(self, key, tile_size, image, mask):
+        """
+        Overwrites a tile of the image and mask.
+
+        Parameters:
+            key (tuple of ints): The tile row, tile col.
+            tile_size (int): The tile side length in pixels.
+            image (3d numpy array): The tile image.
+            mask (2d numpy array): The tile mask.
+        """
+        rows = slice(key[0] * tile_size, (key[0] + 1) * tile_size)
+        cols = slice(key[1] * tile_size, (key[1] + 1) * tile_size)
+        self.image[rows, cols] = image
+        self.mask[rows, cols] = mask
+
+        # The tile changed and may hold ink now
+        self.mark_changed(rows.start, rows.stop)
+        self.mark_dirty(rows.start, rows.stop)
+
+    def ink_tiles(self, tile_size):
+        """
+        Finds the tiles that hold ink.
+
+        Parameters:
+            tile_size (int): The tile side length in pixels.
+
+        Returns:
+            (list of tuples): The tile row, tile col of each tile with ink.
+        """
+
+        # Case for an empty canvas
+        if self.is_empty():
+            return []
+
+        # Tiles in the ink rows with any ink
+        keys = []
+        for row in range(self.ink_top // tile_size, (self.ink_bottom - 1) // tile_size + 1):
+            rows = slice(row * tile_size, (row + 1) * tile_size)
+            cols_with_ink = np.flatnonzero(self.mask[rows].any(axis=0))
+            for col in np.unique(cols_with_ink // tile_size).tolist():
+                keys.append((row, col))
+
+        return keys
@@ -0,0 +1,178 @@
+import cv2
+import numpy as np
+
+
+# Resolution the default layout was designed at (all UI geometry is scaled from it)
+REFERENCE_WIDTH = 1280
+REFERENCE_HEIGHT = 720
+
+
+def parse_size(text):
+    """
+    Parses a WIDTHxHEIGHT string (for command line arguments).
+
+    Parameters:
+        text (str): The size, e.g. "640x480".
+
+    Returns:
+        (tuple of ints): The width, height.
+    """
+    try:
+        width, height = (int(value) for value in text.lower().split("x"))
+    except ValueError:
+        raise ValueError("Expected a size like 640x480, got {!r}".format(text))
+    if width <= 0 or height <= 0:
+        raise ValueError("Size must be positive, got {!r}".format(text))
+    return width, height
+
+
+class ScreenConfig:
+    """Class describing the capture and display resolutions of the sketchpad.
+
+    Capture (and hand inference) can run at a lower resolution than the
+    display. The UI, canvas, and landmark positions handed to the sketchpad
+    are all in display pixels, and every piece of UI geometry is scaled from
+    the 1280x720 reference layout.
+    """
+
+    def __init__(self, capture_size=(REFERENCE_WIDTH, REFERENCE_HEIGHT), display_size=None):
+        """
+        Initializes a ScreenConfig object.
+
+        Parameters:
+            capture_size (tuple of ints): The width, height of captured frames.
+            display_size (tuple of ints): The width, height the UI is rendered
+                                          at (None for the capture size).
+        """
+
+        # Defining class attributes with constructor args
+        self.capture_width, self.capture_height = capture_size
+        self.width, self.height = display_size or capture_size
+
+        # Factors from the reference layout to the display
+        self.scale_x = self.width / REFERENCE_WIDTH
+        self.scale_y = self.height / REFERENCE_HEIGHT
+        self.scale = min(self.scale_x, self.scale_y)
+
+        # Factors from capture row, col positions to display row, col positions
+        self.capture_to_display = np.array([self.height / self.capture_height, self.width / self.capture_width])
+        self.same_size = (self.width, self.height) == (self.capture_width, self.capture_height)
+
+        # Preallocated display frame (used only for frames that don't match the display size)
+        self.frame_buf = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+
+    @classmethod
+    def from_capture(cls, cap, capture_size=(REFERENCE_WIDTH, REFERENCE_HEIGHT), display_size=None):
+        """
+        Requests a capture resolution from a camera and builds the config from
+        the resolution the camera actually delivers.
+
+        Parameters:
+            cap (cv2.VideoCapture): The opened webcam stream.
+            capture_size (tuple of ints): The requested width, height.
+            display_size (tuple of ints): The width, height the UI is rendered
+                                          at (None for the negotiated capture
+                                          size).
+
+        Returns:
+            (ScreenConfig): The config.
+        """
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, capture_size[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, capture_size[1])
+
+        # Cameras fall back to the nearest mode they support (0 means the backend can't tell)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or capture_size[0]
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or capture_size[1]
+
+        return cls((width, height), display_size)
+
+    def rows(self, rows):
+        """
+        Scales a reference row count or position to the display.
+
+        Parameters:
+            rows (int): The rows at the reference resolution.
+
+        Returns:
+            (int): The rows at the display resolution.
+        """
+        return int(round(rows * self.scale_y))
+
+    def cols(self, cols):
+        """
+        Scales a reference column count or position to the display.
+
+        Parameters:
+            cols (int): The columns at the reference resolution.
+
+        Returns:
+            (int): The columns at the display resolution.
+        """
+        return int(round(cols * self.scale_x))
+
+    def point(self, point):
+        """
+        Scales a reference row, col position or size to the display.
+
+        Parameters:
+            point (tuple of ints): The row, col at the reference resolution.
+
+        Returns:
+            (tuple of ints): The row, col at the display resolution.
+        """
+        return self.rows(point[0]), self.cols(point[1])
+
+    def length(self, length):
+        """
+        Scales a reference length that must keep its aspect (line widths,
+        cursor sizes, radii) to the display.
+
+        Parameters:
+            length (float): The length at the reference resolution.
+
+        Returns:
+            (int): The length at the display resolution (at least 1).
+        """
+        return max(1, int(round(length * self.scale)))
+
+    def font_scale(self, font_scale):
+        """
+        Scales a reference font scale to the display.
+
+        Parameters:
+            font_scale (float): The font scale at the reference resolution.
+
+        Returns:
+            (float): The font scale at the display resolution.
+        """
+        return font_scale * self.scale
+
+    def to_display(self, pos_array):
+        """
+        Converts landmark positions from capture to display pixels.
+
+        Parameters:
+            pos_array (numpy array): Row, col positions with shape (..., 2).
+
+        Returns:
+            (numpy array): The positions at the display resolution.
+        """
+        if self.same_size:
+            return pos_array
+        return np.rint(pos_array * self.capture_to_display).astype(pos_array.dtype)
+
+    def to_display_frame(self, frame):
+        """
+        Resizes a captured frame to the display resolution.
+
+        Parameters:
+            frame (3d numpy array): The captured frame.
+
+        Returns:
+            (3d numpy array): The frame itself if the sizes match, otherwise
+                              the preallocated display frame.
+        """
+        if frame.shape[1] == self.width and frame.shape[0] == self.height:
+            return frame
+        cv2.resize(frame, (self.width, self.height), dst=self.frame_buf, interpolation=cv2.INTER_LINEAR)
+        return self.frame_buf
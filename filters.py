@@ -0,0 +1,128 @@
+import math
+
+import numpy as np
+
+
+def smoothing_factor(cutoff, dt):
+    """
+    Computes the exponential smoothing factor for a cutoff frequency.
+
+    Parameters:
+        cutoff (float or numpy array): The cutoff frequency in Hz.
+        dt (float or numpy array): The time since the last sample in seconds.
+
+    Returns:
+        (float or numpy array): The smoothing factor (0 to 1).
+    """
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """Class filtering and predicting the landmarks of several tracked hands.
+
+    Implements the One-Euro filter (a low-pass filter whose cutoff rises with
+    speed, so slow movements are smoothed and fast ones don't lag) over all
+    21 points of all hands at once.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.02, d_cutoff=1.0):
+        """
+        Initializes a OneEuroFilter object.
+
+        Parameters:
+            min_cutoff (float): Cutoff frequency in Hz when landmarks are
+                                still. Lower means less jitter.
+            beta (float): How quickly the cutoff rises with speed. Higher
+                          means less lag.
+            d_cutoff (float): Cutoff frequency in Hz for the speed estimate.
+        """
+
+        # Defining class attributes with constructor args
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+
+        # Track id -> [filtered positions, filtered velocity (per second), time]
+        self.states = {}
+
+    def update(self, track_ids, pos_array, t):
+        """
+        Filters new landmark positions.
+
+        Parameters:
+            track_ids (list of ints): The track id of each hand.
+            pos_array (3d numpy array): The (n_hands, 21, 2) raw positions.
+            t (float): The time of the positions in seconds.
+
+        Returns:
+            (3d numpy array): The (n_hands, 21, 2) filtered positions.
+        """
+
+        pos = np.asarray(pos_array, dtype=np.float64)
+        filtered = pos.copy()
+
+        # Hands with filter state (new hands start at their raw position)
+        known = [h for h, track_id in enumerate(track_ids) if track_id in self.states]
+        if known:
+
+            # Gathering state of all known hands
+            x_prev = np.stack([self.states[track_ids[h]][0] for h in known])
+            dx_prev = np.stack([self.states[track_ids[h]][1] for h in known])
+            dt = np.array([max(t - self.states[track_ids[h]][2], 1e-6) for h in known])[:, None, None]
+
+            # Filtered velocity and speed dependent cutoff
+            dx = (pos[known] - x_prev) / dt
+            a_d = smoothing_factor(self.d_cutoff, dt)
+            dx_hat = a_d * dx + (1 - a_d) * dx_prev
+            cutoff = self.min_cutoff + self.beta * np.linalg.norm(dx_hat, axis=2, keepdims=True)
+
+            # Filtered positions
+            a = smoothing_factor(cutoff, dt)
+            filtered[known] = a * pos[known] + (1 - a) * x_prev
+
+            # Storing state of known hands
+            for i, h in enumerate(known):
+                self.states[track_ids[h]] = [filtered[h], dx_hat[i], t]
+
+        # Storing state of new hands
+        for h, track_id in enumerate(track_ids):
+            if track_id not in self.states:
+                self.states[track_id] = [filtered[h], np.zeros((21, 2)), t]
+
+        # Dropping state of hands that are gone
+        for track_id in list(self.states):
+            if track_id not in track_ids:
+                del self.states[track_id]
+
+        return filtered
+
+    def predict(self, track_ids, t):
+        """
+        Predicts landmark positions from the last filtered positions and
+        velocities (used on frames where detection is skipped).
+
+        Parameters:
+            track_ids (list of ints): The track id of each hand.
+            t (float): The time to predict positions for in seconds.
+
+        Returns:
+            (3d numpy array): The (n_hands, 21, 2) predicted positions.
+        """
+        if not track_ids:
+            return np.zeros((0, 21, 2))
+        x = np.stack([self.states[track_id][0] for track_id in track_ids])
+        dx = np.stack([self.states[track_id][1] for track_id in track_ids])
+        dt = np.array([t - self.states[track_id][2] for track_id in track_ids])[:, None, None]
+        return x + dx * dt
+
+    def max_speed(self):
+        """
+        Finds the fastest filtered landmark speed of all hands.
+
+        Returns:
+            (float): The speed in pixels per second (0 if nothing is tracked).
+        """
+        if not self.states:
+            return 0.0
+        return float(max(np.linalg.norm(state[1], axis=1).max() for state in self.states.values()))
@@ -0,0 +1,389 @@
+import numpy as np
+
+# Landmark indices of the fingertips (thumb first) and of the three joints below each non-thumb tip
+TIP_INDICES = np.array([4, 8, 12, 16, 20])
+FINGER_JOINT_INDICES = np.array([[7, 6, 5], [11, 10, 9], [15, 14, 13], [19, 18, 17]])
+
+# Thumb counts as extended when both of its joints are this straight (degrees) and its tip reaches this far out
+THUMB_ANGLE_RANGE = (150, 195)
+THUMB_MIN_REACH = 1.2
+
+# Hands whose palm (wrist to middle finger base) is shorter than this many pixels are degenerate
+MIN_PALM_SIZE = 1.0
+
+
+class HandFeatures:
+    """Class holding the feature vectors of every hand in one frame.
+
+    All features are computed for all hands at once in a few numpy passes
+    over the landmarks. Gestures only read these arrays, so registering more
+    gestures adds no passes over the landmarks. Distances are normalized by
+    palm size, so features don't depend on the resolution or on how far the
+    hand is from the camera.
+    """
+
+    def __init__(self, pos_array):
+        """
+        Initializes a HandFeatures object.
+
+        Parameters:
+            pos_array (3d numpy array): The (n_hands, 21, 2) row, col position
+                                        of each landmark of each hand.
+        """
+
+        pos = np.asarray(pos_array, dtype=np.float64)
+        self.n_hands = len(pos)
+
+        # Distance of every landmark to the wrist
+        self.wrist_dist = np.linalg.norm(pos - pos[:, :1], axis=2)
+
+        # Palm size used to normalize distances
+        self.palm_size = self.wrist_dist[:, 9]
+        self.valid = self.palm_size > MIN_PALM_SIZE
+        palm_size = np.maximum(self.palm_size, MIN_PALM_SIZE)
+
+        # Thumb joint angles in degrees at landmarks 3 and 2 (between the neighboring landmarks)
+        a = pos[:, [4, 3]] - pos[:, [3, 2]]
+        b = pos[:, [2, 1]] - pos[:, [3, 2]]
+        cos_angles = (a * b).sum(axis=2) / (np.linalg.norm(a, axis=2) * np.linalg.norm(b, axis=2) + 1e-6)
+        self.thumb_angles = np.degrees(np.arccos(np.clip(cos_angles, -1.0, 1.0)))
+
+        # Thumb tip to pinky base distance relative to wrist to index base distance
+        self.thumb_reach = (np.linalg.norm(pos[:, 4] - pos[:, 17], axis=1) /
+                            (self.wrist_dist[:, 5] + 1e-6))
+
+        # Normalized fingertip to wrist distances (thumb first) and thumb tip to index tip distance
+        self.tip_dist = self.wrist_dist[:, TIP_INDICES] / palm_size[:, None]
+        self.pinch_dist = np.linalg.norm(pos[:, 4] - pos[:, 8], axis=1) / palm_size
+
+    def extended(self):
+        """
+        Checks which fingers are extended.
+
+        Returns:
+            (2d numpy array): A (n_hands, 5) array of bools representing
+                              whether or not each finger (thumb first) is
+                              extended.
+        """
+
+        # Non-thumb fingers: tip must be further away from wrist than all other landmarks on finger
+        tip_dist = self.wrist_dist[:, TIP_INDICES[1:]]
+        joint_dist = self.wrist_dist[:, FINGER_JOINT_INDICES]
+        fingers_extended = (tip_dist[:, :, None] > joint_dist).all(axis=2)
+
+        # Thumb: both joints straight and tip far enough from the hand
+        thumb_extended = (((self.thumb_angles >= THUMB_ANGLE_RANGE[0]) &
+                           (self.thumb_angles <= THUMB_ANGLE_RANGE[1])).all(axis=1) &
+                          (self.thumb_reach > THUMB_MIN_REACH))
+
+        return np.concatenate((thumb_extended[:, None], fingers_extended), axis=1)
+
+
+def classify_extended(pos_array):
+    """
+    Checks which fingers are extended for any number of hands at once.
+
+    Parameters:
+        pos_array (3d numpy array): The (n_hands, 21, 2) row, col position of
+                                    each landmark of each hand.
+
+    Returns:
+        (2d numpy array): A (n_hands, 5) array of bools representing whether
+                          or not each finger (thumb first) is extended.
+    """
+    return HandFeatures(pos_array).extended()
+
+
+def thumb_score(features, extended_array):
+    """
+    Scores the toggle pose (thumb extended) from how straight the thumb is and
+    how far its tip reaches.
+
+    Parameters:
+        features (HandFeatures): The features of every hand.
+        extended_array (2d numpy array): The (n_hands, 5) extended fingers.
+
+    Returns:
+        (1d numpy array): The score of each hand (1 where the thumb is just
+                          straight and far out enough to count as extended).
+    """
+    straightness = features.thumb_angles.min(axis=1) / THUMB_ANGLE_RANGE[0]
+    reach = features.thumb_reach / THUMB_MIN_REACH
+    return np.where(features.valid, np.minimum(straightness, reach), 0.0)
+
+
+def pan_score(features, extended_array):
+    """
+    Scores the two-finger pan pose (only index and middle fingers extended,
+    thumb ignored).
+
+    Parameters:
+        features (HandFeatures): The features of every hand.
+        extended_array (2d numpy array): The (n_hands, 5) extended fingers.
+
+    Returns:
+        (1d numpy array): The score of each hand.
+    """
+    return (extended_array[:, 1] & extended_array[:, 2] &
+            ~extended_array[:, 3] & ~extended_array[:, 4]).astype(np.float64)
+
+
+def pinch_score(features, extended_array):
+    """
+    Scores the pinch pose (thumb and index fingertips together with some of
+    the other fingers extended, so closing into a fist never pinches).
+
+    Parameters:
+        features (HandFeatures): The features of every hand.
+        extended_array (2d numpy array): The (n_hands, 5) extended fingers.
+
+    Returns:
+        (1d numpy array): The score of each hand (1 minus the normalized
+                          fingertip distance).
+    """
+    open_hand = features.valid & extended_array[:, 2:].any(axis=1)
+    return np.where(open_hand, 1.0 - features.pinch_dist, 0.0)
+
+
+def fist_score(features, extended_array):
+    """
+    Scores the fist pose (every non-thumb finger curled towards the wrist).
+
+    Parameters:
+        features (HandFeatures): The features of every hand.
+        extended_array (2d numpy array): The (n_hands, 5) extended fingers.
+
+    Returns:
+        (1d numpy array): The score of each hand (higher the closer the
+                          fingertips are to the wrist).
+    """
+    curled = features.valid & ~extended_array[:, 1:].any(axis=1)
+    return np.where(curled, 2.0 - features.tip_dist[:, 1:].mean(axis=1), 0.0)
+
+
+class Gesture:
+    """Class describing a gesture as a debounced state machine with hysteresis.
+
+    Every frame the gesture scores each hand (higher means more in the pose).
+    A hand enters the gesture once its score has been at least enter for
+    enter_frames frames in a row, and leaves it once its score has been below
+    exit for exit_frames frames in a row. An exit threshold below the enter
+    threshold keeps a hand near the boundary from flickering in and out.
+    """
+
+    def __init__(self, name, score, enter=1.0, exit=1.0, enter_frames=1, exit_frames=1):
+        """
+        Initializes a Gesture object.
+
+        Parameters:
+            name (str): The gesture name.
+            score (function): Function taking the HandFeatures and the
+                              (n_hands, 5) extended fingers and returning the
+                              (n_hands,) score of each hand.
+            enter (float): The score needed to enter the gesture.
+            exit (float): The score below which the gesture is left.
+            enter_frames (int): Frames in a row the enter score is needed.
+            exit_frames (int): Frames in a row the exit score is needed.
+        """
+
+        # Defining class attributes with constructor args
+        self.name = name
+        self.score = score
+        self.enter = enter
+        self.exit = exit
+        self.enter_frames = enter_frames
+        self.exit_frames = exit_frames
+
+
+def default_gestures():
+    """
+    Creates the sketchpad's gestures.
+
+    Returns:
+        (list of Gestures): Thumb toggle, two-finger pan, pinch, and fist.
+    """
+    return [Gesture("toggle", thumb_score, enter=1.0, exit=0.9, enter_frames=2, exit_frames=2),
+            Gesture("pan", pan_score, exit_frames=2),
+            Gesture("pinch", pinch_score, enter=0.7, exit=0.55, enter_frames=3, exit_frames=3),
+            Gesture("fist", fist_score, enter=0.8, exit=0.6, enter_frames=30, exit_frames=3)]
+
+
+class GestureFrame:
+    """Class holding the gesture states of every hand after one frame."""
+
+    def __init__(self, names, features, extended_array, active, started, ended):
+        """
+        Initializes a GestureFrame object.
+
+        Parameters:
+            names (dict): Gesture name -> column index.
+            features (HandFeatures): The features of every hand.
+            extended_array (2d numpy array): The (n_hands, 5) extended fingers.
+            active (2d numpy array): The (n_hands, n_gestures) bools
+                                     representing whether or not each hand is
+                                     in each gesture.
+            started (2d numpy array): The (n_hands, n_gestures) bools
+                                      representing which gestures each hand
+                                      entered this frame.
+            ended (2d numpy array): The (n_hands, n_gestures) bools
+                                    representing which gestures each hand left
+                                    this frame.
+        """
+        self.names = names
+        self.features = features
+        self.extended_array = extended_array
+        self.active_array = active
+        self.started_array = started
+        self.ended_array = ended
+
+    def active(self, name):
+        """
+        Looks up which hands are in a gesture.
+
+        Parameters:
+            name (str): The gesture name.
+
+        Returns:
+            (1d numpy array): Whether or not each hand is in the gesture.
+        """
+        return self.active_array[:, self.names[name]]
+
+    def started(self, name):
+        """
+        Looks up which hands entered a gesture this frame.
+
+        Parameters:
+            name (str): The gesture name.
+
+        Returns:
+            (1d numpy array): Whether or not each hand entered the gesture
+                              this frame.
+        """
+        return self.started_array[:, self.names[name]]
+
+    def ended(self, name):
+        """
+        Looks up which hands left a gesture this frame.
+
+        Parameters:
+            name (str): The gesture name.
+
+        Returns:
+            (1d numpy array): Whether or not each hand left the gesture this
+                              frame.
+        """
+        return self.ended_array[:, self.names[name]]
+
+
+class GestureEngine:
+    """Class running registered gestures on every tracked hand.
+
+    The features of all hands are computed once per frame, then every
+    gesture scores all hands from them and the state machines of all hands
+    and gestures advance together in a few array operations.
+    """
+
+    def __init__(self, gestures=None, max_missing=30):
+        """
+        Initializes a GestureEngine object.
+
+        Parameters:
+            gestures (list of Gestures): The gestures to register (None for
+                                         none).
+            max_missing (int): The number of updates a hand's gesture states
+                               are kept after the hand was last seen.
+        """
+
+        # Registered gestures, their column indices, and thresholds as arrays
+        self.gestures = []
+        self.names = {}
+        self.enter = np.zeros(0)
+        self.exit = np.zeros(0)
+        self.enter_frames = np.zeros(0, dtype=np.int32)
+        self.exit_frames = np.zeros(0, dtype=np.int32)
+
+        # Track id -> [active (n_gestures,), frames in a row past threshold (n_gestures,), update count last seen]
+        self.states = {}
+        self.max_missing = max_missing
+        self.update_count = 0
+
+        for gesture in gestures or []:
+            self.register(gesture)
+
+    def register(self, gesture):
+        """
+        Adds a gesture.
+
+        Parameters:
+            gesture (Gesture): The gesture.
+        """
+        if gesture.name in self.names:
+            raise ValueError("Gesture {!r} is already registered".format(gesture.name))
+        self.names[gesture.name] = len(self.gestures)
+        self.gestures.append(gesture)
+        self.enter = np.append(self.enter, gesture.enter)
+        self.exit = np.append(self.exit, gesture.exit)
+        self.enter_frames = np.append(self.enter_frames, gesture.enter_frames)
+        self.exit_frames = np.append(self.exit_frames, gesture.exit_frames)
+
+        # Hands already being tracked start outside the new gesture
+        for state in self.states.values():
+            state[0] = np.append(state[0], False)
+            state[1] = np.append(state[1], 0)
+
+    def update(self, track_ids, pos_array, extended_array=None):
+        """
+        Advances the gesture states of every hand by one frame.
+
+        Parameters:
+            track_ids (list of ints): The track id of each hand.
+            pos_array (3d numpy array): The (n_hands, 21, 2) row, col position
+                                        of each landmark of each hand.
+            extended_array (2d numpy array): The (n_hands, 5) extended fingers
+                                             (None to classify them from the
+                                             features).
+
+        Returns:
+            (GestureFrame): The gesture states of every hand.
+        """
+
+        self.update_count += 1
+        n_gestures = len(self.gestures)
+
+        # Features of every hand (the only pass over the landmarks)
+        features = HandFeatures(pos_array)
+        if extended_array is None:
+            extended_array = features.extended()
+
+        # Score of every hand for every gesture
+        scores = np.empty((len(track_ids), n_gestures))
+        for j, gesture in enumerate(self.gestures):
+            scores[:, j] = gesture.score(features, extended_array)
+
+        # Gathering the states of every hand (new hands start outside every gesture)
+        for track_id in track_ids:
+            if track_id not in self.states:
+                self.states[track_id] = [np.zeros(n_gestures, dtype=bool), np.zeros(n_gestures, dtype=np.int32), 0]
+        active = np.array([self.states[track_id][0] for track_id in track_ids], dtype=bool).reshape(-1, n_gestures)
+        counts = np.array([self.states[track_id][1] for track_id in track_ids],
+                          dtype=np.int32).reshape(-1, n_gestures)
+
+        # Count frames in a row past the threshold that would change the state, and switch once there are enough
+        past = np.where(active, scores < self.exit, scores >= self.enter)
+        counts = np.where(past, counts + 1, 0)
+        switch = counts >= np.where(active, self.exit_frames, self.enter_frames)
+        started = switch & ~active
+        ended = switch & active
+        active = active ^ switch
+        counts[switch] = 0
+
+        # Storing the states of every hand
+        for h, track_id in enumerate(track_ids):
+            self.states[track_id] = [active[h], counts[h], self.update_count]
+
+        # Dropping states of hands that are gone
+        for track_id in list(self.states):
+            if self.update_count - self.states[track_id][2] > self.max_missing:
+                del self.states[track_id]
+
+        return GestureFrame(self.names, features, extended_array, active, started, ended)
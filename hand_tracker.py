@@ -1,14 +1,100 @@
+import threading
+import time
+
 import cv2
-import mediapipe as mp
 import numpy as np
-from math import dist
+from filters import OneEuroFilter
+from gestures import classify_extended
+from profiler import STARTUP, profiled
+
+
+class TrackAssigner:
+    """Class assigning stable track ids to hands across frames."""
+
+    def __init__(self, max_dist=200, max_missing=15):
+        """
+        Initializes a TrackAssigner object.
+
+        Parameters:
+            max_dist (float): The max distance in pixels a palm can move
+                              between frames and keep its track id.
+            max_missing (int): The number of frames a track is kept after its
+                               hand was last seen.
+        """
+
+        # Defining class attributes with constructor args
+        self.max_dist = max_dist
+        self.max_missing = max_missing
+
+        # Track id -> [handedness label, palm center, frames since last seen]
+        self.tracks = {}
+        self.next_id = 0
+
+    def assign(self, pos_array, labels):
+        """
+        Matches hands to existing tracks by handedness and nearest palm
+        center, starting new tracks for unmatched hands.
+
+        Parameters:
+            pos_array (3d numpy array): The (n_hands, 21, 2) landmark positions.
+            labels (list of strs): The handedness label of each hand.
+
+        Returns:
+            (list of ints): The track id of each hand.
+        """
+
+        n_hands = len(pos_array)
+        ids = [-1] * n_hands
+        track_ids = list(self.tracks)
+
+        # Palm center (wrist and finger bases) of each hand
+        centers = pos_array[:, [0, 5, 9, 13, 17]].mean(axis=1)
+
+        # Case for matching against existing tracks
+        if n_hands and track_ids:
+
+            # Distances between every hand and every track (only same handedness, within max_dist)
+            track_centers = np.array([self.tracks[t][1] for t in track_ids])
+            dists = np.linalg.norm(centers[:, None] - track_centers[None], axis=2)
+            same_hand = np.array([[labels[h] == self.tracks[t][0] for t in track_ids] for h in range(n_hands)])
+            dists[~same_hand | (dists > self.max_dist)] = np.inf
+
+            # Greedy matching in order of increasing distance
+            for flat_ind in np.argsort(dists, axis=None):
+                h, t = divmod(int(flat_ind), len(track_ids))
+                if not np.isfinite(dists[h, t]):
+                    break
+                if ids[h] == -1 and track_ids[t] not in ids:
+                    ids[h] = track_ids[t]
+
+        # Start new tracks for unmatched hands
+        for h in range(n_hands):
+            if ids[h] == -1:
+                ids[h] = self.next_id
+                self.next_id += 1
+
+        # Age tracks that were not seen and drop old ones
+        for t in track_ids:
+            if t not in ids:
+                self.tracks[t][2] += 1
+                if self.tracks[t][2] > self.max_missing:
+                    del self.tracks[t]
+
+        # Update matched and new tracks
+        for h, t in enumerate(ids):
+            self.tracks[t] = [labels[h], centers[h], 0]
+
+        return ids
 
 
 class HandTracker:
     """Class for tracking hand movements and recognizing gestures."""
 
     def __init__(self, static_mode=False, max_hands=2,
-                 min_detect_conf=0.7, min_track_conf=0.5):
+                 min_detect_conf=0.7, min_track_conf=0.5,
+                 roi_mode=False, roi_margin=0.5, roi_refresh=30, search_scale=0.5,
+                 target_latency=None, min_scale=0.3, max_scale=1.0,
+                 smoothing=False, detect_every=1, adaptive_skip=False, fast_speed=1500.0, lazy=False):
         """
         Initializes a HandTracker object.
 
@@ -21,6 +107,32 @@ class HandTracker:
                                      hand.
             min_track_conf (float): Minimum confidence required to track a
                                     hand.
+            roi_mode (bool): Whether or not to run inference on a crop around
+                             the last known hands instead of the full frame.
+            roi_margin (float): Margin added around the hands' bounding box,
+                                as a fraction of its larger side.
+            roi_refresh (int): Number of cropped frames between full-frame
+                               searches (so new hands are found).
+            search_scale (float): Inference resolution scale of the
+                                  full-frame search after tracking is lost
+                                  in roi mode (also its largest scale when
+                                  adapting to target_latency).
+            target_latency (float): Inference time budget in seconds. The
+                                    inference resolution is adjusted to stay
+                                    within it (None keeps full resolution).
+            min_scale (float): Smallest inference resolution scale.
+            max_scale (float): Largest inference resolution scale.
+            smoothing (bool): Whether or not track() returns One-Euro
+                              filtered landmarks.
+            detect_every (int): track() runs detection on every Nth frame
+                                and predicts landmarks in between.
+            adaptive_skip (bool): Whether or not to detect more often (down to
+                                  every frame) when hands move fast.
+            fast_speed (float): Landmark speed in pixels per second at which
+                                adaptive skipping detects every frame.
+            lazy (bool): Whether or not to load and warm up MediaPipe on a
+                         background thread. track() finds no hands until it
+                         is ready.
         """
 
         # Defining class attributes with constructor args
@@ -28,21 +140,134 @@ class HandTracker:
         self.max_hands = max_hands
         self.min_detect_conf = min_detect_conf
         self.min_track_conf = min_track_conf
-
-        # Setting up MediaPipe hand model
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(static_image_mode=self.static_mode,
-                                         max_num_hands=self.max_hands,
-                                         min_detection_confidence=self.min_detect_conf,
-                                         min_tracking_confidence=self.min_track_conf)
-
-        # Adding MediaPipe's drawing utilities for drawing hand landmarks
-        self.mp_draw = mp.solutions.drawing_utils
+        self.roi_mode = roi_mode
+        self.roi_margin = roi_margin
+        self.roi_refresh = roi_refresh
+        self.search_scale = search_scale
+        self.target_latency = target_latency
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+
+        # Crop (x0, y0, x1, y1) around the last known hands and frames since last full-frame search
+        self.roi = None
+        self.frames_since_search = 0
+
+        # Inference resolution scale and smoothed inference time of each kind of window ("crop" around the
+        # hands, full "frame", and full-frame "search" after tracking was lost), adapted separately
+        initial_scale = max_scale if target_latency is not None else 1.0
+        self.scales = {"crop": initial_scale, "frame": initial_scale, "search": search_scale}
+        self.inference_times = {"crop": None, "frame": None, "search": None}
+
+        # Landmark filtering and detection frame-skipping
+        self.smoothing = smoothing
+        self.detect_every = detect_every
+        self.adaptive_skip = adaptive_skip
+        self.fast_speed = fast_speed
+        self.landmark_filter = OneEuroFilter()
+        self.frames_until_detect = 0
+        self.track_ids = []
 
         # Empty lists for keeping track of hand landmarks and positions
         self.landmarks = []
+        self.hand_landmarks = []
+        self.handedness = []
         self.pos_list = []
 
+        # Stable ids for hands across frames
+        self.track_assigner = TrackAssigner()
+
+        # Reusable buffers for landmark positions of all hands
+        self.norm_pos = np.zeros((self.max_hands, 21, 2), dtype=np.float64)
+        self.pos_array = np.zeros((self.max_hands, 21, 2), dtype=np.int32)
+        self.track_pos = np.zeros((self.max_hands, 21, 2), dtype=np.int32)
+        self.n_hands = 0
+
+        # Setting up MediaPipe hand model now, or on a background thread so startup isn't blocked by it
+        self.ready = threading.Event()
+        self.load_error = None
+        self.startup_timings = {}
+        if lazy:
+            self.loader = threading.Thread(target=self.load_model, daemon=True)
+            self.loader.start()
+        else:
+            self.load_model(warm_up=False)
+
+    def load_model(self, warm_up=True):
+        """
+        Imports MediaPipe and builds the hand model, timing each phase.
+
+        Parameters:
+            warm_up (bool): Whether or not to run one inference on a blank
+                            image so the first real frame isn't slowed down
+                            by model initialization.
+        """
+        try:
+
+            # Importing MediaPipe (here so landmark-only tools don't need it)
+            start = time.perf_counter()
+            import mediapipe as mp
+            imported = time.perf_counter()
+
+            # Setting up MediaPipe hand model and drawing utilities for drawing hand landmarks
+            self.mp_hands = mp.solutions.hands
+            self.hands = self.mp_hands.Hands(static_image_mode=self.static_mode,
+                                             max_num_hands=self.max_hands,
+                                             min_detection_confidence=self.min_detect_conf,
+                                             min_tracking_confidence=self.min_track_conf)
+            self.mp_draw = mp.solutions.drawing_utils
+            built = time.perf_counter()
+
+            # Running the model once
+            if warm_up:
+                self.hands.process(np.zeros((256, 256, 3), dtype=np.uint8))
+            warmed = time.perf_counter()
+
+            self.startup_timings = {"import_mediapipe": imported - start,
+                                    "build_model": built - imported,
+                                    "warm_up": warmed - built}
+            self.ready.set()
+            STARTUP.event("tracking_ready")
+
+        # Errors on the background thread are kept so the app can report them instead of dying silently
+        except Exception as error:
+            if not self.loader_is_current_thread():
+                raise
+            self.load_error = error
+            print("Hand tracking failed to load: {}".format(error))
+
+    def loader_is_current_thread(self):
+        """
+        Checks if the caller is the background loader thread.
+
+        Returns:
+            (bool): Whether or not the model is being loaded lazily on this
+                    thread.
+        """
+        return getattr(self, "loader", None) is threading.current_thread()
+
+    def status(self):
+        """
+        Describes a hand model that is not tracking yet.
+
+        Returns:
+            (str): The status text (None once tracking is ready).
+        """
+        if self.ready.is_set():
+            return None
+        if self.load_error is not None:
+            return "Tracking failed to load"
+        return "Tracking not ready"
+
+    def is_ready(self):
+        """
+        Checks if the hand model is loaded.
+
+        Returns:
+            (bool): Whether or not track() runs hand detection.
+        """
+        return self.ready.is_set()
+
+    @profiled("hand_tracker.detect_hands")
     def detect_hands(self, img, visible_landmarks=True):
         """
         Detects hands in a given image.
@@ -56,107 +281,329 @@ class HandTracker:
             (3d numpy array): The input image (with landmarks drawn if true).
         """
 
-        # Converting image from bgr to rgb and determining rows and columns
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self.img_h, self.img_w, _ = img_rgb.shape
-
-        # Applying hand model to rgb image
+        # Determining rows and columns and the part of the image to run inference on
+        self.img_h, self.img_w = img.shape[:2]
+        x0, y0, x1, y1 = self.get_inference_window()
+        inference_img = img[y0:y1, x0:x1]
+
+        # Kind of window (a full-frame search for lost hands runs downscaled)
+        if (x0, y0, x1, y1) != (0, 0, self.img_w, self.img_h):
+            kind = "crop"
+        elif self.roi_mode and self.roi is None:
+            kind = "search"
+        else:
+            kind = "frame"
+
+        # Downscaling to the current inference resolution of this kind of window
+        scale = self.scales[kind]
+        if scale < 1.0:
+            inference_img = cv2.resize(inference_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        # Converting image from bgr to rgb
+        img_rgb = cv2.cvtColor(inference_img, cv2.COLOR_BGR2RGB)
+
+        # Applying hand model to rgb image (timed for the resolution adjustment)
+        start = time.perf_counter()
         self.results = self.hands.process(img_rgb)
+        self.adapt_scale(kind, time.perf_counter() - start)
 
         # Case for if hands are detected
         if self.results.multi_hand_landmarks:
 
-            # Update landmarks (only for first hand that was detected)
-            self.landmarks = self.results.multi_hand_landmarks[len(self.results.multi_hand_landmarks) - 1]
+            # Map landmarks from the crop back to full-frame coordinates
+            if (x0, y0, x1, y1) != (0, 0, self.img_w, self.img_h):
+                for hand_landmarks in self.results.multi_hand_landmarks:
+                    for landmark in hand_landmarks.landmark:
+                        landmark.x = (x0 + landmark.x * (x1 - x0)) / self.img_w
+                        landmark.y = (y0 + landmark.y * (y1 - y0)) / self.img_h
+
+            # Update landmarks (self.landmarks is the drawing hand, the last one detected)
+            self.hand_landmarks = list(self.results.multi_hand_landmarks)
+            self.landmarks = self.hand_landmarks[-1]
+
+            # Update handedness label ("Left" or "Right") of each hand
+            self.handedness = [handedness.classification[0].label
+                               for handedness in self.results.multi_handedness]
+
+            # Crop around the detected hands for the next frame
+            if self.roi_mode:
+                self.update_roi()
 
             # Case for drawing landmarks
             if visible_landmarks:
-                self.mp_draw.draw_landmarks(img,
-                                            self.landmarks,
-                                            self.mp_hands.HAND_CONNECTIONS)
+                self.draw_landmarks(img, self.hand_landmarks)
+
+        # Tracking lost: forget the last hands (so they expire downstream) and search the full frame next time
+        else:
+            self.hand_landmarks = []
+            self.landmarks = []
+            self.handedness = []
+            self.pos_list = []
+            self.n_hands = 0
+            self.roi = None
 
         return img
 
-    def get_pos(self):
+    @profiled("hand_tracker.track")
+    def track(self, img, visible_landmarks=True, t=None):
         """
-        Finds the row, col positions of all landmarks.
+        Finds the landmark positions and track ids of all hands in a frame.
+        Detection may be skipped and replaced by predicted positions (see
+        detect_every). Extended fingers are left to the gesture engine, which
+        classifies them from the features it computes anyway.
+
+        Parameters:
+            img (3d numpy array): The image being checked.
+            visible_landmarks (bool): Whether or not to draw landmarks on
+                                      detected hands.
+            t (float): Time of the frame in seconds (defaults to now).
 
         Returns:
-            (list of tuples): A list tuples representing the row, col position
-                              of each hand landmark.
+            (3d numpy array), (list of ints): The (n_hands, 21, 2) row, col
+                                              positions (a reused buffer) and
+                                              the track id of each hand.
         """
 
-        # Defining empty list
-        pos_list = []
+        if t is None:
+            t = time.perf_counter()
 
-        # Case for updating positions (only executes if self.landmarks is not empty)
-        if self.landmarks:
+        # Case for a hand model that is still loading (no hands)
+        if not self.ready.is_set():
+            return self.track_pos[:0], []
 
-            # Looping through each landmark
-            for landmark in self.landmarks.landmark:
+        use_filter = self.smoothing or self.detect_every > 1
 
-                # Converting landmark x, y coordiates to row, col and adding to position list
-                row, col = int(landmark.y * self.img_h), int(landmark.x * self.img_w)
-                pos_list.append((row, col))
+        # Case for skipping detection and predicting positions
+        if use_filter and self.frames_until_detect > 0 and self.track_ids:
+            self.frames_until_detect -= 1
+            pos = self.landmark_filter.predict(self.track_ids, t)
+            pos = np.clip(pos, 0, (self.img_h - 1, self.img_w - 1))
 
-        # Updating position list
-        self.pos_list = pos_list
+            # Landmarks of the last detection
+            if visible_landmarks:
+                self.draw_landmarks(img)
 
-        return pos_list
+        # Case for running detection
+        else:
+            self.detect_hands(img, visible_landmarks)
+            pos = self.get_pos_array()
+            self.track_ids = self.get_track_ids()
 
-    def get_extended_fingers(self):
+            # Filtering positions (filter state is also what skipped frames are predicted from)
+            if use_filter:
+                filtered = self.landmark_filter.update(self.track_ids, pos, t)
+                if self.smoothing:
+                    pos = filtered
+
+            self.frames_until_detect = self.get_skip_count()
+
+        # Copying positions into the output buffer
+        n_hands = len(self.track_ids)
+        np.copyto(self.track_pos[:n_hands], np.rint(pos), casting='unsafe')
+        track_pos = self.track_pos[:n_hands]
+
+        return track_pos, list(self.track_ids)
+
+    def get_skip_count(self):
         """
-        Checks if fingers are extended.
+        Decides how many frames to skip before the next detection.
 
         Returns:
-            (list of bools): A list boolean values representing whether or not
-                             each finger is extended.
+            (int): The number of frames to predict instead of detecting.
+        """
+
+        # Case for detecting every frame
+        if self.detect_every <= 1:
+            return 0
+
+        # Detect more often the faster the hands move
+        n_frames = self.detect_every
+        if self.adaptive_skip:
+            speed_ratio = min(self.landmark_filter.max_speed() / self.fast_speed, 1.0)
+            n_frames = max(1, int(round(self.detect_every * (1 - speed_ratio))))
+
+        return n_frames - 1
+
+    def get_inference_window(self):
+        """
+        Chooses the part of the frame to run inference on.
+
+        Returns:
+            (tuple of ints): The x0, y0, x1, y1 pixel bounds of the window.
+        """
+
+        # Case for using the crop around the last known hands
+        if self.roi_mode and self.roi is not None and self.frames_since_search < self.roi_refresh:
+            self.frames_since_search += 1
+            return self.roi
+
+        # Full-frame search
+        self.frames_since_search = 0
+        return 0, 0, self.img_w, self.img_h
+
+    def update_roi(self):
+        """Sets the crop to the bounding box of all detected hands plus a margin."""
+
+        # Bounding box of all landmarks in pixels
+        xs = [landmark.x for hand_landmarks in self.hand_landmarks for landmark in hand_landmarks.landmark]
+        ys = [landmark.y for hand_landmarks in self.hand_landmarks for landmark in hand_landmarks.landmark]
+        left, right = min(xs) * self.img_w, max(xs) * self.img_w
+        top, bottom = min(ys) * self.img_h, max(ys) * self.img_h
+
+        # Square-ish crop with margin, clipped to the frame
+        margin = self.roi_margin * max(right - left, bottom - top)
+        x0 = int(max(0, left - margin))
+        y0 = int(max(0, top - margin))
+        x1 = int(min(self.img_w, right + margin))
+        y1 = int(min(self.img_h, bottom + margin))
+
+        # Case for a degenerate crop
+        if x1 - x0 < 32 or y1 - y0 < 32:
+            self.roi = None
+            return
+
+        self.roi = (x0, y0, x1, y1)
+
+    def adapt_scale(self, kind, seconds):
+        """
+        Adjusts the inference resolution of one kind of window to stay within
+        the latency budget.
+
+        Parameters:
+            kind (str): The kind of window ("crop", "frame", or "search").
+            seconds (float): The duration of the last inference.
+        """
+
+        # Smoothed inference time (crops and full frames take very different times, so each has its own)
+        inference_time = self.inference_times[kind]
+        if inference_time is None:
+            inference_time = seconds
+        else:
+            inference_time = 0.8 * inference_time + 0.2 * seconds
+        self.inference_times[kind] = inference_time
+
+        # Case for no budget
+        if self.target_latency is None:
+            return
+
+        # Shrink quickly when over budget, grow slowly when well under it (searches stay downscaled)
+        max_scale = self.search_scale if kind == "search" else self.max_scale
+        if inference_time > self.target_latency:
+            self.scales[kind] = max(self.min_scale, self.scales[kind] * 0.9)
+        elif inference_time < 0.7 * self.target_latency:
+            self.scales[kind] = min(max_scale, self.scales[kind] * 1.05)
+
+    def draw_landmarks(self, img, hand_landmarks=None):
+        """
+        Draws hand landmarks on a given image.
+
+        Parameters:
+            img (3d numpy array): The image to draw on.
+            hand_landmarks (list of MediaPipe landmark lists): The landmarks of
+                                                               each hand to
+                                                               draw. Uses the
+                                                               most recently
+                                                               detected hands
+                                                               if None.
+
+        Returns:
+            (3d numpy array): The input image with landmarks drawn.
+        """
+
+        # Default to most recently detected hands
+        if hand_landmarks is None:
+            hand_landmarks = self.hand_landmarks
+
+        # Drawing landmarks of each hand
+        for landmarks in hand_landmarks:
+            self.mp_draw.draw_landmarks(img,
+                                        landmarks,
+                                        self.mp_hands.HAND_CONNECTIONS)
+
+        return img
+
+    @profiled("hand_tracker.get_pos_array")
+    def get_pos_array(self):
+        """
+        Finds the row, col positions of all landmarks of all detected hands.
+
+        The returned array is a view of a buffer that is reused (overwritten)
+        on the next call.
+
+        Returns:
+            (3d numpy array): A (n_hands, 21, 2) array of row, col positions.
+                              The drawing hand is last.
         """
 
-        # Defining tip indices and empty list for bools
-        tip_indices = [4, 8, 12, 16, 20]
-        extend_list = []
+        n_hands = len(self.hand_landmarks)
+        self.n_hands = n_hands
 
-        # Case for checking if fingers are extended (only executes if self.pos_list is not empty)
-        if self.pos_list:
+        # Case for no hands detected yet
+        if n_hands == 0:
+            return self.pos_array[:0]
 
-            # Looping through each tip index
-            for i in tip_indices:
+        # Gathering normalized y, x coordinates of each hand
+        for h, hand_landmarks in enumerate(self.hand_landmarks):
+            self.norm_pos[h] = [(landmark.y, landmark.x) for landmark in hand_landmarks.landmark]
 
-                # Case for thumb
-                if i == 4:
+        # Converting to row, col for all hands at once (truncating like int())
+        np.copyto(self.pos_array[:n_hands],
+                  self.norm_pos[:n_hands] * (self.img_h, self.img_w),
+                  casting='unsafe')
+
+        return self.pos_array[:n_hands]
+
+    def get_pos(self):
+        """
+        Finds the row, col positions of all landmarks.
 
-                    # Calculate angles at joints
-                    a1 = np.array(self.pos_list[4]) - np.array(self.pos_list[3])
-                    b1 = np.array(self.pos_list[2]) - np.array(self.pos_list[3])
-                    cos_angle1 = np.dot(a1, b1) / (np.linalg.norm(a1) * np.linalg.norm(b1) + 1e-6)
-                    angle_2_3_4 = np.degrees(np.arccos(np.clip(cos_angle1, -1.0, 1.0)))
-                    a2 = np.array(self.pos_list[3]) - np.array(self.pos_list[2])
-                    b2 = np.array(self.pos_list[1]) - np.array(self.pos_list[2])
-                    cos_angle2 = np.dot(a2, b2) / (np.linalg.norm(a2) * np.linalg.norm(b2) + 1e-6)
-                    angle_1_2_3 = np.degrees(np.arccos(np.clip(cos_angle2, -1.0, 1.0)))
+        Returns:
+            (list of tuples): A list tuples representing the row, col position
+                              of each hand landmark.
+        """
 
-                    # Calculate normalized distance to landmark 17
-                    thumb_tip_dist = dist(self.pos_list[4], self.pos_list[17])
-                    hand_base_dist = dist(self.pos_list[0], self.pos_list[5])
+        # Viewing the drawing hand of the position array as a list of tuples
+        pos_array = self.get_pos_array()
+        pos_list = [tuple(pos) for pos in pos_array[-1].tolist()] if len(pos_array) else []
 
-                    # Check if thumb is extended
-                    thumb_extended = (
-                        150 <= angle_2_3_4 <= 195 and
-                        150 <= angle_1_2_3 <= 195 and
-                        thumb_tip_dist > 1.2 * hand_base_dist
-                    )
+        # Updating position list
+        self.pos_list = pos_list
 
-                    # Add bool to list
-                    extend_list.append(thumb_extended)
+        return pos_list
 
-                # Case for all other fingers
-                else:
+    def get_track_ids(self):
+        """
+        Assigns stable track ids to the hands from the last call to
+        get_pos_array. Should be called once per frame.
+
+        Returns:
+            (list of ints): The track id of each hand.
+        """
+        return self.track_assigner.assign(self.pos_array[:self.n_hands], self.handedness[:self.n_hands])
+
+    @profiled("hand_tracker.get_extended_array")
+    def get_extended_array(self):
+        """
+        Checks which fingers are extended on every hand from the last call to
+        get_pos_array.
+
+        Returns:
+            (2d numpy array): A (n_hands, 5) array of bools.
+        """
+        return classify_extended(self.pos_array[:self.n_hands])
+
+    @profiled("hand_tracker.get_extended_fingers")
+    def get_extended_fingers(self):
+        """
+        Checks if fingers are extended.
+
+        Returns:
+            (list of bools): A list boolean values representing whether or not
+                             each finger is extended.
+        """
 
-                    # Check if tip position is further away from wrist than all other landmarks on finger
-                    extend_list.append(
-                        dist(self.pos_list[i], self.pos_list[0]) > dist(self.pos_list[i - 1], self.pos_list[0])
-                        and dist(self.pos_list[i], self.pos_list[0]) > dist(self.pos_list[i - 2], self.pos_list[0])
-                        and dist(self.pos_list[i], self.pos_list[0]) > dist(self.pos_list[i - 3], self.pos_list[0]))
+        # Case for no hand positions
+        if not self.pos_list:
+            return []
 
-        return extend_list
+        return self.get_extended_array()[-1].tolist()
@@ -0,0 +1,185 @@
+from collections import deque
+
+import numpy as np
+
+
+class TileHistory:
+    """Class keeping undo/redo history of a canvas as tile snapshots.
+
+    The canvas is split into square tiles. An entry stores only the tiles an
+    action touched, as they were before the action. Undoing swaps the stored
+    tiles with the canvas, which turns the entry into its redo entry (and the
+    other way around). Old entries are evicted once the history uses more
+    than max_bytes.
+    """
+
+    def __init__(self, canvas, tile_size=64, max_bytes=64 * 1024 * 1024):
+        """
+        Initializes a TileHistory object.
+
+        Parameters:
+            canvas (Canvas or TiledCanvas): The canvas to keep history of.
+            tile_size (int): The tile side length in pixels.
+            max_bytes (int): Memory cap for all stored tiles.
+        """
+
+        # Defining class attributes with constructor args
+        self.canvas = canvas
+        self.tile_size = tile_size
+        self.max_bytes = max_bytes
+
+        # Entries are dicts with "tiles" ((tile row, tile col) -> (image, mask)), "bytes", and "info"
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.current = None
+        self.bytes = 0
+
+        # Tiles changed by the last undo or redo
+        self.swapped = []
+
+    def begin(self, info=None):
+        """
+        Opens a new entry (does nothing if one is already open).
+
+        Parameters:
+            info (dict): Data returned by undo and redo for this entry.
+        """
+        if self.current is None:
+            self.current = {"tiles": {}, "bytes": 0, "info": info}
+
+    def info(self):
+        """
+        Returns the info of the open entry.
+
+        Returns:
+            (dict): The info (None if no entry is open).
+        """
+        return self.current["info"] if self.current is not None else None
+
+    def is_open(self):
+        """
+        Checks if an entry is open.
+
+        Returns:
+            (bool): Whether or not an entry is open.
+        """
+        return self.current is not None
+
+    def snapshot(self, keys):
+        """
+        Saves tiles into the open entry before they are changed. Tiles that
+        were already saved in the entry keep their first snapshot.
+
+        Parameters:
+            keys (iterable of tuples): The tile row, tile col of each tile.
+        """
+        for key in keys:
+            if key in self.current["tiles"] or not self.canvas.tile_in_bounds(key, self.tile_size):
+                continue
+            image, mask = self.canvas.read_tile(key, self.tile_size)
+            self.current["tiles"][key] = (image, mask)
+            self.current["bytes"] += image.nbytes + mask.nbytes
+
+    def snapshot_lines(self, lines, widths):
+        """
+        Saves the tiles that line segments are about to touch.
+
+        Parameters:
+            lines (2d numpy array): The (n, 4) x0, y0, x1, y1 of each segment.
+            widths (1d numpy array): The line thickness of each segment.
+        """
+
+        # Bounding box of each segment including its thickness, in tiles
+        half = widths // 2 + 1
+        x_min = (np.minimum(lines[:, 0], lines[:, 2]) - half) // self.tile_size
+        x_max = (np.maximum(lines[:, 0], lines[:, 2]) + half) // self.tile_size
+        y_min = (np.minimum(lines[:, 1], lines[:, 3]) - half) // self.tile_size
+        y_max = (np.maximum(lines[:, 1], lines[:, 3]) + half) // self.tile_size
+
+        keys = {(row, col)
+                for r0, r1, c0, c1 in zip(y_min.tolist(), y_max.tolist(), x_min.tolist(), x_max.tolist())
+                for row in range(r0, r1 + 1)
+                for col in range(c0, c1 + 1)}
+        self.snapshot(keys)
+
+    def snapshot_ink(self):
+        """Saves every tile that holds ink (e.g. before a clear)."""
+        self.snapshot(self.canvas.ink_tiles(self.tile_size))
+
+    def commit(self):
+        """
+        Closes the open entry and pushes it onto the undo stack. Any redo
+        history is dropped.
+
+        Returns:
+            (dict): The info of the entry (None if nothing was open).
+        """
+
+        # Case for nothing open
+        if self.current is None:
+            return None
+
+        entry = self.current
+        self.current = None
+
+        # Case for an entry that changed nothing
+        if not entry["tiles"]:
+            return entry["info"]
+
+        # New actions drop the redo history
+        for dropped in self.redo_stack:
+            self.bytes -= dropped["bytes"]
+        self.redo_stack = []
+
+        self.undo_stack.append(entry)
+        self.bytes += entry["bytes"]
+        self.evict()
+
+        return entry["info"]
+
+    def evict(self):
+        """Drops the oldest entries until the history fits in max_bytes."""
+        while self.bytes > self.max_bytes and self.undo_stack:
+            self.bytes -= self.undo_stack.popleft()["bytes"]
+
+    def swap(self, entry):
+        """
+        Exchanges the tiles of an entry with the canvas.
+
+        Parameters:
+            entry (dict): The entry.
+        """
+        for key, (image, mask) in entry["tiles"].items():
+            entry["tiles"][key] = self.canvas.read_tile(key, self.tile_size)
+            self.canvas.write_tile(key, self.tile_size, image, mask)
+        self.swapped = list(entry["tiles"])
+
+    def undo(self):
+        """
+        Restores the canvas to before the last entry.
+
+        Returns:
+            (dict): The info of the undone entry (None if nothing to undo).
+        """
+        self.commit()
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.swap(entry)
+        self.redo_stack.append(entry)
+        return entry["info"]
+
+    def redo(self):
+        """
+        Reapplies the last undone entry.
+
+        Returns:
+            (dict): The info of the redone entry (None if nothing to redo).
+        """
+        self.commit()
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.swap(entry)
+        self.undo_stack.append(entry)
+        return entry["info"]
@@ -0,0 +1,98 @@
+import numpy as np
+
+
+class Layout:
+    """Class mapping pixels to controls through a precomputed label image."""
+
+    def __init__(self, width, height):
+        """
+        Initializes a Layout object.
+
+        Parameters:
+            width (int): The width of the frame in pixels.
+            height (int): The height of the frame in pixels.
+        """
+
+        # Defining class attributes with constructor args
+        self.width = width
+        self.height = height
+
+        # Controls in drawing order (later controls win where they overlap)
+        self.controls = []
+
+        # Label image: 0 is no control, i + 1 is self.controls[i]
+        self.label_map = np.zeros((height, width), dtype=np.uint8)
+        self.dirty = True
+
+    def add(self, region):
+        """
+        Adds a control.
+
+        Parameters:
+            region (Region): The control. Its action names what it does.
+        """
+        if len(self.controls) >= np.iinfo(self.label_map.dtype).max:
+            raise ValueError("Too many controls for the label map")
+        self.controls.append(region)
+        self.dirty = True
+
+    def remove(self, region):
+        """
+        Removes a control.
+
+        Parameters:
+            region (Region): The control.
+        """
+        self.controls.remove(region)
+        self.dirty = True
+
+    def invalidate(self):
+        """Marks the label map for rebuilding (call after moving or resizing a control)."""
+        self.dirty = True
+
+    def build(self):
+        """Rasterizes every control into the label map."""
+        self.label_map[:] = 0
+        for i, region in enumerate(self.controls):
+            region.rasterize(self.label_map, i + 1)
+        self.dirty = False
+
+    def lookup(self, points):
+        """
+        Finds the label under any number of points with a single array read.
+
+        Parameters:
+            points (numpy array): Row, col points with shape (..., 2).
+
+        Returns:
+            (numpy array of ints): The label under each point (0 for none or
+                                   for points outside the frame).
+        """
+
+        # Rebuild only when the layout changed
+        if self.dirty:
+            self.build()
+
+        points = np.asarray(points)
+        rows = points[..., 0]
+        cols = points[..., 1]
+
+        # Points outside the frame are read from (0, 0) and then masked out
+        inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+        labels = self.label_map[np.where(inside, rows, 0), np.where(inside, cols, 0)]
+
+        return np.where(inside, labels, 0)
+
+    def control(self, label):
+        """
+        Returns the control with a label.
+
+        Parameters:
+            label (int): The label from lookup.
+
+        Returns:
+            (Region): The control, or None for label 0.
+        """
+        if label == 0:
+            return None
+        return self.controls[label - 1]
@@ -0,0 +1,317 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+from pipeline import FramePacket, LatencyStats, LatestQueue
+from profiler import PROFILER, STARTUP
+
+# Track ids of different sources are kept apart by giving each source its own range
+TRACK_ID_STRIDE = 1000000
+
+# Frame slots per source (one being tracked while the next one is filled)
+SLOTS_PER_SOURCE = 2
+
+# Fingertip marker colors of each source
+SOURCE_COLORS = [(0, 255, 0), (255, 0, 255), (0, 255, 255), (255, 128, 0)]
+
+
+def inference_worker(source, shm_name, shape, jobs, results, stop_event, tracker_kwargs):
+    """
+    Runs a HandTracker on the frames of one source in a separate process.
+
+    Frames are read straight from shared memory; only slot numbers go in and
+    landmark arrays come out, so frames are never pickled.
+
+    Parameters:
+        source (int): The source index.
+        shm_name (str): Name of the shared memory holding the frame slots.
+        shape (tuple of ints): The (slots, height, width, 3) slot array shape.
+        jobs (multiprocessing.Queue): (slot, frame id, capture time) of each
+                                      frame to track.
+        results (multiprocessing.Queue): Queue receiving (source, slot, frame
+                                         id, capture time, positions, track
+                                         ids).
+        stop_event (multiprocessing.Event): Event used to stop all workers.
+        tracker_kwargs (dict): Keyword arguments for HandTracker.
+    """
+
+    # Imported here so only the worker processes load MediaPipe
+    from hand_tracker import HandTracker
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    hand_tracker = HandTracker(**tracker_kwargs)
+
+    try:
+        while not stop_event.is_set():
+
+            # Wait for the next frame (wake up periodically to check for stop)
+            try:
+                slot, frame_id, capture_time = jobs.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            # Hand detection, position update, and track assignment
+            pos_array, track_ids = hand_tracker.track(frames[slot], visible_landmarks=False, t=capture_time)
+            results.put((source, slot, frame_id, capture_time, pos_array.copy(), track_ids))
+    finally:
+        del frames
+        shm.close()
+
+
+class SourceCapture(threading.Thread):
+    """Thread that reads one camera into shared memory frame slots."""
+
+    def __init__(self, source, cap, frames, jobs, display_queue, stop_event):
+        """
+        Initializes a SourceCapture object.
+
+        Parameters:
+            source (int): The source index.
+            cap (cv2.VideoCapture): The opened camera.
+            frames (4d numpy array): The (slots, height, width, 3) shared
+                                     memory frame slots of this source.
+            jobs (multiprocessing.Queue): Queue of frames for the worker.
+            display_queue (LatestQueue): Queue receiving frames to show (None
+                                         for sources that are not shown).
+            stop_event (multiprocessing.Event): Event used to stop all threads
+                                                and workers.
+        """
+        super().__init__(daemon=True)
+        self.source = source
+        self.cap = cap
+        self.frames = frames
+        self.jobs = jobs
+        self.display_queue = display_queue
+        self.stop_event = stop_event
+
+        # Slots the worker is not reading (returned by release)
+        self.free_slots = queue.Queue()
+        for slot in range(len(frames)):
+            self.free_slots.put(slot)
+        self.dropped = 0
+
+    def release(self, slot):
+        """
+        Returns a slot once the worker is done with it.
+
+        Parameters:
+            slot (int): The slot index.
+        """
+        self.free_slots.put(slot)
+
+    def run(self):
+        """Reads, mirrors and hands off frames until stopped."""
+
+        frame_id = 0
+        height, width = self.frames.shape[1:3]
+
+        while not self.stop_event.is_set() and self.cap.isOpened():
+
+            # Read a frame; stop everything if the camera fails
+            success, frame = self.cap.read()
+            if not success:
+                print("Empty camera frame from source {}.".format(self.source))
+                self.stop_event.set()
+                break
+            capture_time = time.perf_counter()
+            if frame.shape[:2] != (height, width):
+                frame = cv2.resize(frame, (width, height))
+
+            # Frames are dropped while both slots wait for the worker (queued slots are tracked in capture order)
+            try:
+                slot = self.free_slots.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                slot = None
+
+            # Mirror straight into shared memory
+            if slot is not None:
+                cv2.flip(frame, 1, dst=self.frames[slot])
+                self.jobs.put((slot, frame_id, capture_time))
+                if self.display_queue is not None:
+                    self.display_queue.put(FramePacket(frame_id, capture_time, self.frames[slot].copy()))
+            elif self.display_queue is not None:
+                self.display_queue.put(FramePacket(frame_id, capture_time, cv2.flip(frame, 1)))
+
+            frame_id += 1
+
+
+class MultiCamera:
+    """Class running hand tracking for several cameras in a pool of processes.
+
+    Every camera gets a capture thread and a worker process with its own
+    HandTracker (trackers keep per-camera state, so each one stays on its
+    camera). Frames go through shared memory, so inference for different
+    cameras runs in parallel on separate cores instead of sharing one GIL.
+    Landmarks of all cameras are scaled to the first camera's resolution and
+    feed a single sketchpad.
+    """
+
+    def __init__(self, caps, tracker_kwargs=None):
+        """
+        Initializes a MultiCamera object.
+
+        Parameters:
+            caps (list of cv2.VideoCaptures): The opened cameras (the first one
+                                              is shown and sets the canvas
+                                              resolution).
+            tracker_kwargs (dict): Keyword arguments for every HandTracker.
+        """
+
+        # Defining class attributes with constructor args
+        self.caps = caps
+        self.tracker_kwargs = tracker_kwargs or {}
+
+        # Resolution of each camera and factors to the first camera's row, col positions
+        self.sizes = [(int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 720, int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 1280)
+                      for cap in caps]
+        self.scales = [np.array(self.sizes[0]) / np.array(size) for size in self.sizes]
+
+        # Shared state (set up by start)
+        self.context = mp.get_context("spawn")
+        self.stop_event = self.context.Event()
+        self.results = self.context.Queue()
+        self.display_queue = LatestQueue(maxsize=1)
+
+        # Source -> (positions, track ids) of the newest result, so every update sees the hands of every source
+        self.latest = {}
+        self.shms = []
+        self.captures = []
+        self.workers = []
+
+    def start(self):
+        """Allocates shared frame slots and starts the capture threads and worker processes."""
+        for source, (cap, (height, width)) in enumerate(zip(self.caps, self.sizes)):
+            shape = (SLOTS_PER_SOURCE, height, width, 3)
+            shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+            frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+            jobs = self.context.Queue()
+
+            worker = self.context.Process(target=inference_worker,
+                                          args=(source, shm.name, shape, jobs, self.results, self.stop_event,
+                                                self.tracker_kwargs),
+                                          daemon=True)
+            capture = SourceCapture(source, cap, frames, jobs, self.display_queue if source == 0 else None,
+                                    self.stop_event)
+
+            self.shms.append(shm)
+            self.workers.append(worker)
+            self.captures.append(capture)
+            worker.start()
+            capture.start()
+
+    def collect(self):
+        """
+        Takes every result that arrived and updates the newest hands of each
+        source in latest (positions in the first camera's pixels and track
+        ids unique across sources).
+
+        Returns:
+            (bool): Whether or not any source had a new result.
+        """
+        newest = {}
+        while True:
+            try:
+                source, slot, frame_id, capture_time, pos_array, track_ids = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            # The slot can be refilled now
+            self.captures[source].release(slot)
+            if source in newest and newest[source][0] > frame_id:
+                continue
+            newest[source] = (frame_id, pos_array, track_ids)
+
+        for source, (_, pos_array, track_ids) in newest.items():
+            if source:
+                pos_array = np.rint(pos_array * self.scales[source]).astype(pos_array.dtype)
+            self.latest[source] = (pos_array, [source * TRACK_ID_STRIDE + i for i in track_ids])
+
+        return bool(newest)
+
+    def stop(self):
+        """Stops the capture threads and workers and frees shared memory."""
+        self.stop_event.set()
+        for capture in self.captures:
+            capture.join()
+            capture.frames = None
+        for worker in self.workers:
+            worker.join(timeout=2.0)
+            if worker.is_alive():
+                worker.terminate()
+        for shm in self.shms:
+            shm.close()
+            shm.unlink()
+
+
+def run_multicam(multicam, sketchpad, window_name='Interactive Sketchpad'):
+    """
+    Runs the sketchpad with several cameras drawing on one canvas.
+
+    Parameters:
+        multicam (MultiCamera): The started cameras and workers.
+        sketchpad (Sketchpad): The sketchpad state to update and render.
+        window_name (str): Name of the display window.
+
+    Returns:
+        (LatencyStats): Capture-to-display latency samples of the shown camera.
+    """
+
+    latency = LatencyStats()
+    markers = np.zeros((0, 2), dtype=np.int32)
+    marker_sources = []
+
+    # Workers load their hand models in their own processes; the first result means tracking is up
+    sketchpad.status_text = "Tracking not ready"
+
+    while not multicam.stop_event.is_set():
+
+        # Wait for the newest frame of the shown camera
+        packet = multicam.display_queue.get(timeout=0.1)
+        if packet is None:
+            continue
+
+        # Apply the newest hands of every source in one update whenever any source has a new result (sources
+        # without one keep their last hands, so their strokes aren't ended)
+        with PROFILER.stage("multicam.update"):
+            if multicam.collect():
+                results = multicam.latest
+                sketchpad.status_text = None
+                STARTUP.event("tracking_ready")
+                sources = sorted(results)
+                pos_array = np.concatenate([results[source][0] for source in sources])
+                track_ids = [track_id for source in sources for track_id in results[source][1]]
+                sketchpad.update(pos_array, None, track_ids)
+
+                # Index fingertips of every hand, to mark which camera each hand comes from
+                markers = sketchpad.config.to_display(pos_array[:, 8])
+                marker_sources = [source for source in sources for _ in results[source][1]]
+
+        # Draw UI and drawings
+        with PROFILER.stage("multicam.render"):
+            frame = sketchpad.render(packet.frame)
+            for (row, col), source in zip(markers.tolist(), marker_sources):
+                cv2.circle(frame, (col, row), 8, SOURCE_COLORS[source % len(SOURCE_COLORS)], 2)
+
+        # Draw profiling HUD and periodically log timings
+        if PROFILER.hud:
+            PROFILER.draw_hud(frame)
+        PROFILER.maybe_dump()
+
+        # Show the image
+        with PROFILER.stage("multicam.display"):
+            cv2.imshow(window_name, frame)
+            key = cv2.waitKey(1)
+        latency.add(time.perf_counter() - packet.capture_time)
+        STARTUP.mark_once("first_frame_shown")
+
+        # Case for exiting loop
+        if key == ord('q') or sketchpad.exit:
+            break
+
+    return latency
@@ -0,0 +1,360 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+from profiler import PROFILER, STARTUP
+
+
+class FramePacket:
+    """Class representing a captured webcam frame and when it was captured."""
+
+    def __init__(self, frame_id, capture_time, frame):
+        """
+        Initializes a FramePacket object.
+
+        Parameters:
+            frame_id (int): Sequential id of the frame.
+            capture_time (float): time.perf_counter() value when the frame was
+                                  read from the camera.
+            frame (3d numpy array): The (mirrored) webcam frame.
+        """
+
+        # Defining class attributes with constructor args
+        self.frame_id = frame_id
+        self.capture_time = capture_time
+        self.frame = frame
+
+
+class TrackingResult:
+    """Class representing the hand tracking output for a single frame."""
+
+    def __init__(self, frame_id, capture_time, pos_array, track_ids, hand_landmarks):
+        """
+        Initializes a TrackingResult object.
+
+        Parameters:
+            frame_id (int): Id of the frame the result was computed from.
+            capture_time (float): Capture time of that frame.
+            pos_array (3d numpy array): (n_hands, 21, 2) landmark positions.
+            track_ids (list of ints): Track id of each hand.
+            hand_landmarks (list of MediaPipe landmark lists): Raw landmarks,
+                                                               used for drawing
+                                                               on later frames.
+        """
+
+        # Defining class attributes with constructor args
+        self.frame_id = frame_id
+        self.capture_time = capture_time
+        self.pos_array = pos_array
+        self.track_ids = track_ids
+        self.hand_landmarks = hand_landmarks
+
+
+class LatestQueue:
+    """Bounded queue that drops the oldest item instead of blocking when full."""
+
+    def __init__(self, maxsize=1):
+        """
+        Initializes a LatestQueue object.
+
+        Parameters:
+            maxsize (int): The max number of items held at a time.
+        """
+
+        # Underlying thread safe queue and counter for dropped (stale) items
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, item):
+        """
+        Adds an item, discarding the oldest queued item if the queue is full.
+
+        Parameters:
+            item (object): The item to add.
+        """
+
+        # Keep trying until the item fits, throwing away stale items
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """
+        Removes and returns the oldest item.
+
+        Parameters:
+            timeout (float): Max number of seconds to wait for an item.
+
+        Returns:
+            (object): The item, or None if nothing arrived before the timeout.
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LatestValue:
+    """Thread safe slot holding the most recently published value."""
+
+    def __init__(self):
+        """Initializes a LatestValue object."""
+        self.lock = threading.Lock()
+        self.value = None
+
+    def publish(self, value):
+        """
+        Replaces the stored value.
+
+        Parameters:
+            value (object): The new value.
+        """
+        with self.lock:
+            self.value = value
+
+    def get(self):
+        """
+        Returns the stored value.
+
+        Returns:
+            (object): The most recent value, or None if nothing was published.
+        """
+        with self.lock:
+            return self.value
+
+
+class LatencyStats:
+    """Rolling window of latency samples."""
+
+    def __init__(self, window=300):
+        """
+        Initializes a LatencyStats object.
+
+        Parameters:
+            window (int): The number of most recent samples to keep.
+        """
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds):
+        """
+        Adds a latency sample.
+
+        Parameters:
+            seconds (float): The latency in seconds.
+        """
+        self.samples.append(seconds)
+
+    def summary(self):
+        """
+        Computes latency percentiles over the current window.
+
+        Returns:
+            (dict): Mean, p50, p95, p99 and max latency in milliseconds
+                    (empty if there are no samples).
+        """
+
+        # Case for no samples yet
+        if not self.samples:
+            return {}
+
+        # Converting samples to milliseconds
+        samples_ms = np.array(self.samples) * 1000.0
+
+        return {"mean": float(samples_ms.mean()),
+                "p50": float(np.percentile(samples_ms, 50)),
+                "p95": float(np.percentile(samples_ms, 95)),
+                "p99": float(np.percentile(samples_ms, 99)),
+                "max": float(samples_ms.max())}
+
+
+class CaptureThread(threading.Thread):
+    """Thread that reads frames from the webcam and hands them to consumers."""
+
+    def __init__(self, cap, outputs, stop_event):
+        """
+        Initializes a CaptureThread object.
+
+        Parameters:
+            cap (cv2.VideoCapture): The opened webcam stream.
+            outputs (list of LatestQueues): Queues that receive every frame.
+            stop_event (threading.Event): Event used to stop all threads.
+        """
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.outputs = outputs
+        self.stop_event = stop_event
+
+    def run(self):
+        """Reads, mirrors and timestamps frames until stopped."""
+
+        frame_id = 0
+
+        while not self.stop_event.is_set() and self.cap.isOpened():
+
+            # Read a frame from the webcam; stop the pipeline if frame is not returned
+            success, frame = self.cap.read()
+            if not success:
+                print("Empty camera frame.")
+                self.stop_event.set()
+                break
+
+            # Timestamp as soon as the frame is read so latency covers the whole chain
+            capture_time = time.perf_counter()
+
+            # Flip the frame horizontally for mirror view
+            frame = cv2.flip(frame, 1)
+
+            # Hand the frame to every consumer (stale frames are dropped)
+            packet = FramePacket(frame_id, capture_time, frame)
+            for output in self.outputs:
+                output.put(packet)
+
+            frame_id += 1
+
+
+class InferenceThread(threading.Thread):
+    """Thread that runs hand tracking on the newest available frame."""
+
+    def __init__(self, hand_tracker, inputs, results, stop_event):
+        """
+        Initializes an InferenceThread object.
+
+        Parameters:
+            hand_tracker (HandTracker): The tracker used for inference.
+            inputs (LatestQueue): Queue of frames to run inference on.
+            results (LatestValue): Slot where tracking results are published.
+            stop_event (threading.Event): Event used to stop all threads.
+        """
+        super().__init__(daemon=True)
+        self.hand_tracker = hand_tracker
+        self.inputs = inputs
+        self.results = results
+        self.stop_event = stop_event
+
+    def run(self):
+        """Runs hand detection and publishes results until stopped."""
+
+        while not self.stop_event.is_set():
+
+            # Wait for the next frame (wake up periodically to check for stop)
+            packet = self.inputs.get(timeout=0.1)
+            if packet is None:
+                continue
+
+            # Hand detection, position update, and track assignment
+            with PROFILER.stage("pipeline.inference"):
+                pos_array, track_ids = self.hand_tracker.track(packet.frame, visible_landmarks=False,
+                                                               t=packet.capture_time)
+
+            # Publish result for the render loop (positions are copied out of the tracker's reused buffer)
+            self.results.publish(TrackingResult(packet.frame_id,
+                                                packet.capture_time,
+                                                pos_array.copy(),
+                                                track_ids,
+                                                list(self.hand_tracker.hand_landmarks)))
+
+
+def run_pipelined(cap, hand_tracker, sketchpad, window_name='Interactive Sketchpad'):
+    """
+    Runs the sketchpad with capture, inference, and rendering on separate
+    threads joined by bounded queues.
+
+    The render loop always shows the newest captured frame and composites the
+    newest available landmarks, even if inference is running behind.
+
+    Parameters:
+        cap (cv2.VideoCapture): The opened webcam stream.
+        hand_tracker (HandTracker): The tracker used for inference.
+        sketchpad (Sketchpad): The sketchpad state to update and render.
+        window_name (str): Name of the display window.
+
+    Returns:
+        (LatencyStats): Capture-to-display latency samples.
+    """
+
+    # Queues holding only the newest frame for each consumer
+    display_queue = LatestQueue(maxsize=1)
+    inference_queue = LatestQueue(maxsize=1)
+    results = LatestValue()
+    stop_event = threading.Event()
+    latency = LatencyStats()
+
+    # Starting worker threads
+    capture_thread = CaptureThread(cap, [display_queue, inference_queue], stop_event)
+    inference_thread = InferenceThread(hand_tracker, inference_queue, results, stop_event)
+    capture_thread.start()
+    inference_thread.start()
+
+    # Id of the last tracking result applied to the sketchpad
+    last_result_id = -1
+    result = None
+
+    # Preallocated frame buffer the render loop draws into
+    frame = None
+
+    # Render loop
+    while not stop_event.is_set():
+
+        # Wait for the newest frame
+        packet = display_queue.get(timeout=0.1)
+        if packet is None:
+            continue
+
+        # Apply each tracking result exactly once so edge detection and strokes stay consistent
+        newest_result = results.get()
+        if newest_result is not None and newest_result.frame_id != last_result_id:
+            result = newest_result
+            last_result_id = result.frame_id
+            with PROFILER.stage("pipeline.update"):
+                sketchpad.update(result.pos_array, None, result.track_ids)
+
+        # Copy frame into the render buffer so drawing does not race with the inference thread reading it
+        if frame is None or frame.shape != packet.frame.shape:
+            frame = np.empty_like(packet.frame)
+        np.copyto(frame, packet.frame)
+
+        # Draw the newest landmarks onto the newest frame
+        if result is not None:
+            hand_tracker.draw_landmarks(frame, result.hand_landmarks)
+
+        # Show whether the hand model is still loading
+        sketchpad.status_text = hand_tracker.status()
+
+        # Draw UI and drawings (at the display resolution)
+        with PROFILER.stage("pipeline.render"):
+            display_frame = sketchpad.render(frame)
+
+        # Draw profiling HUD and periodically log timings
+        if PROFILER.hud:
+            PROFILER.draw_hud(display_frame)
+        PROFILER.maybe_dump()
+
+        # Show the image
+        with PROFILER.stage("pipeline.display"):
+            cv2.imshow(window_name, display_frame)
+            key = cv2.waitKey(1)
+
+        # Record capture-to-display latency
+        latency.add(time.perf_counter() - packet.capture_time)
+        STARTUP.mark_once("first_frame_shown")
+
+        # Case for exiting loop
+        if key == ord('q') or sketchpad.exit:
+            break
+
+    # Stop and wait for worker threads
+    stop_event.set()
+    capture_thread.join()
+    inference_thread.join()
+
+    return latency
@@ -0,0 +1,345 @@
+import functools
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-size buffer of the most recent float samples."""
+
+    def __init__(self, size):
+        """
+        Initializes a RingBuffer object.
+
+        Parameters:
+            size (int): The number of samples kept.
+        """
+        self.values = np.zeros(size, dtype=np.float64)
+        self.index = 0
+        self.count = 0
+
+    def append(self, value):
+        """
+        Adds a sample, overwriting the oldest one if the buffer is full.
+
+        Parameters:
+            value (float): The sample.
+        """
+        self.values[self.index] = value
+        self.index = (self.index + 1) % len(self.values)
+        self.count = min(self.count + 1, len(self.values))
+
+    def percentiles(self, q):
+        """
+        Computes percentiles of the stored samples.
+
+        Parameters:
+            q (list of floats): The percentiles to compute (0 to 100).
+
+        Returns:
+            (numpy array): The percentile values.
+        """
+        return np.percentile(self.values[:self.count], q)
+
+
+class Stage:
+    """Context manager timing one run of a profiled stage."""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        """
+        Initializes a Stage object.
+
+        Parameters:
+            profiler (Profiler): The profiler the timing is recorded in.
+            name (str): The stage name.
+        """
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class NullStage:
+    """Context manager that does nothing (used while profiling is disabled)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+# Shared no-op stage so disabled profiling allocates nothing
+NULL_STAGE = NullStage()
+
+
+class Profiler:
+    """Class collecting rolling per-stage timings."""
+
+    def __init__(self, enabled=False, window=240, hud=False, log_path=None, dump_interval=5.0):
+        """
+        Initializes a Profiler object.
+
+        Parameters:
+            enabled (bool): Whether or not timings are recorded.
+            window (int): The number of most recent samples kept per stage.
+            hud (bool): Whether or not draw_hud should be called by the main
+                        loop.
+            log_path (str): JSON lines file that summaries are appended to
+                            (None to disable).
+            dump_interval (float): Seconds between summaries written to
+                                   log_path.
+        """
+        self.lock = threading.Lock()
+        self.buffers = {}
+        self.log_file = None
+        self.configure(enabled, window, hud, log_path, dump_interval)
+
+    def configure(self, enabled=False, window=240, hud=False, log_path=None, dump_interval=5.0):
+        """
+        Changes the profiler settings and clears recorded timings.
+
+        Parameters:
+            enabled (bool): Whether or not timings are recorded.
+            window (int): The number of most recent samples kept per stage.
+            hud (bool): Whether or not draw_hud should be called by the main
+                        loop.
+            log_path (str): JSON lines file that summaries are appended to
+                            (None to disable).
+            dump_interval (float): Seconds between summaries written to
+                                   log_path.
+        """
+        self.close()
+        self.enabled = enabled
+        self.window = window
+        self.hud = hud
+        self.log_path = log_path
+        self.dump_interval = dump_interval
+        self.last_dump = time.monotonic()
+        with self.lock:
+            self.buffers = {}
+
+    def stage(self, name):
+        """
+        Returns a context manager timing a stage.
+
+        Parameters:
+            name (str): The stage name.
+
+        Returns:
+            (Stage or NullStage): The context manager.
+        """
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def record(self, name, seconds):
+        """
+        Records one timing sample.
+
+        Parameters:
+            name (str): The stage name.
+            seconds (float): The duration of the stage.
+        """
+        with self.lock:
+            buffer = self.buffers.get(name)
+            if buffer is None:
+                buffer = self.buffers[name] = RingBuffer(self.window)
+            buffer.append(seconds)
+
+    def summary(self):
+        """
+        Computes rolling percentiles of every stage.
+
+        Returns:
+            (dict): Stage name -> p50, p95, and p99 in milliseconds and the
+                    number of samples.
+        """
+        with self.lock:
+            buffers = list(self.buffers.items())
+
+        summary = {}
+        for name, buffer in buffers:
+            if buffer.count:
+                p50, p95, p99 = buffer.percentiles([50, 95, 99]) * 1000.0
+                summary[name] = {"p50": float(p50), "p95": float(p95), "p99": float(p99), "count": buffer.count}
+
+        return summary
+
+    def draw_hud(self, frame, pos=(10, 130), font_scale=0.5):
+        """
+        Draws the per-stage percentiles onto a frame.
+
+        Parameters:
+            frame (3d numpy array): The frame to draw on.
+            pos (tuple of ints): The x, y position of the first line.
+            font_scale (float): Scale for text size.
+        """
+        lines = ["{:<24} p50 {:6.2f}  p95 {:6.2f}  p99 {:6.2f} ms".format(name, s["p50"], s["p95"], s["p99"])
+                 for name, s in self.summary().items()]
+        for i, line in enumerate(lines):
+            text_pos = (pos[0], pos[1] + i * int(22 * font_scale / 0.5))
+
+            # Dark outline first so the text stays readable on any background
+            cv2.putText(frame, line, text_pos, cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), 3)
+            cv2.putText(frame, line, text_pos, cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 255, 0), 1)
+
+    def maybe_dump(self):
+        """Appends a summary to the JSON lines log if the dump interval has passed."""
+
+        # Case for nothing to do
+        if not self.enabled or self.log_path is None:
+            return
+        now = time.monotonic()
+        if now - self.last_dump < self.dump_interval:
+            return
+        self.last_dump = now
+
+        # Appending one JSON object per line
+        if self.log_file is None:
+            self.log_file = open(self.log_path, "a")
+        self.log_file.write(json.dumps({"time": time.time(), "stages": self.summary()}) + "\n")
+        self.log_file.flush()
+
+    def close(self):
+        """Closes the JSON lines log."""
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+
+class StartupTimer:
+    """Class recording how long each phase of startup takes."""
+
+    def __init__(self):
+        """Initializes a StartupTimer object."""
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Starts timing from now and forgets recorded phases."""
+        with self.lock:
+            self.start = time.perf_counter()
+            self.last = self.start
+            self.phases = {}
+
+    def mark(self, name):
+        """
+        Ends a phase that started at the previous mark (or at reset).
+
+        Parameters:
+            name (str): The phase name.
+        """
+        now = time.perf_counter()
+        with self.lock:
+            self.phases[name] = {"ms": (now - self.last) * 1000.0, "at_ms": (now - self.start) * 1000.0}
+            self.last = now
+
+    def mark_once(self, name):
+        """
+        Marks a phase only the first time it is reached (cheap to call every
+        frame).
+
+        Parameters:
+            name (str): The phase name.
+        """
+        if name not in self.phases:
+            self.mark(name)
+
+    def event(self, name):
+        """
+        Records when something happened without ending a phase (safe to call
+        from background threads).
+
+        Parameters:
+            name (str): The event name.
+        """
+        now = time.perf_counter()
+        with self.lock:
+            self.phases.setdefault(name, {"ms": None, "at_ms": (now - self.start) * 1000.0})
+
+    def record(self, name, seconds):
+        """
+        Records a phase timed elsewhere (e.g. on a background thread).
+
+        Parameters:
+            name (str): The phase name.
+            seconds (float): The phase duration.
+        """
+        with self.lock:
+            self.phases[name] = {"ms": seconds * 1000.0, "at_ms": None}
+
+    def report(self):
+        """
+        Formats the recorded phases.
+
+        Returns:
+            (str): One line per phase with its duration and when it ended.
+        """
+        with self.lock:
+            phases = list(self.phases.items())
+        lines = ["Startup timings:"]
+        for name, phase in phases:
+            duration = "" if phase["ms"] is None else "{:8.1f} ms".format(phase["ms"])
+            at = "" if phase["at_ms"] is None else "  (at {:8.1f} ms)".format(phase["at_ms"])
+            lines.append("  {:<24} {:>11}{}".format(name, duration, at))
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """
+        Appends the recorded phases to a JSON lines file.
+
+        Parameters:
+            path (str): The file.
+        """
+        with self.lock:
+            phases = dict(self.phases)
+        with open(path, "a") as f:
+            f.write(json.dumps({"time": time.time(), "startup": phases}) + "\n")
+
+
+# Global profiler used by the sketchpad modules (disabled unless configured)
+PROFILER = Profiler()
+
+# Global startup timer (reset at the start of main)
+STARTUP = StartupTimer()
+
+
+def profiled(name):
+    """
+    Decorator timing every call of a function with the global profiler.
+
+    Parameters:
+        name (str): The stage name.
+
+    Returns:
+        (function): The decorator.
+    """
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+
+            # Case for disabled profiling (a single attribute check)
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+
+            with Stage(PROFILER, name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
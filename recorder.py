@@ -0,0 +1,190 @@
+import collections
+import threading
+
+import cv2
+import numpy as np
+from profiler import PROFILER
+
+# What to do with a new frame when every ring slot is waiting to be encoded
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+BLOCK = "block"
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+# What gets recorded
+RECORD_FRAME = "frame"
+RECORD_CANVAS = "canvas"
+
+
+class VideoRecorder(threading.Thread):
+    """Thread encoding session video from a bounded, preallocated ring of frames.
+
+    The render thread copies each frame into a free slot of the ring (or
+    composites the canvas straight into it) and the encoder thread writes
+    filled slots with cv2.VideoWriter, so encoding never adds latency to the
+    render loop. When the encoder falls behind and every slot is full, the
+    drop policy decides between overwriting the oldest waiting frame,
+    dropping the new one, or waiting for the encoder.
+    """
+
+    def __init__(self, path, size, fps=30.0, mode=RECORD_FRAME, capacity=8, drop_policy=DROP_OLDEST,
+                 fourcc="mp4v"):
+        """
+        Initializes a VideoRecorder object.
+
+        Parameters:
+            path (str): The video file to write.
+            size (tuple of ints): The width, height of every frame.
+            fps (float): The frame rate stored in the video.
+            mode (str): RECORD_FRAME for composited frames or RECORD_CANVAS
+                        for the drawings alone on black.
+            capacity (int): The number of ring slots.
+            drop_policy (str): DROP_OLDEST, DROP_NEWEST, or BLOCK.
+            fourcc (str): The four character code of the video codec.
+        """
+        super().__init__(daemon=True)
+
+        if mode not in (RECORD_FRAME, RECORD_CANVAS):
+            raise ValueError("Unknown recording mode {!r}".format(mode))
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError("Unknown drop policy {!r} (expected one of {})".format(drop_policy,
+                                                                                    ", ".join(DROP_POLICIES)))
+
+        # Defining class attributes with constructor args
+        self.path = path
+        self.width, self.height = size
+        self.fps = fps
+        self.mode = mode
+        self.drop_policy = drop_policy
+
+        # Opening the writer up front so a bad path or codec fails before the session starts
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (self.width, self.height))
+        if not self.writer.isOpened():
+            raise RuntimeError("Could not open {} for recording".format(path))
+
+        # Ring slots, slots free to fill, and filled slots in the order they are encoded
+        self.slots = np.zeros((capacity, self.height, self.width, 3), dtype=np.uint8)
+        self.free = collections.deque(range(capacity))
+        self.filled = collections.deque()
+        self.condition = threading.Condition()
+        self.stopped = False
+
+        # Statistics
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def acquire(self):
+        """
+        Takes a slot to fill, applying the drop policy if none is free.
+
+        Returns:
+            (int): The slot index (None if the frame is dropped).
+        """
+        with self.condition:
+            self.submitted += 1
+
+            # Waiting for the encoder to free a slot
+            if self.drop_policy == BLOCK:
+                while not self.free and not self.stopped:
+                    self.condition.wait()
+
+            if self.free:
+                return self.free.popleft()
+
+            # Overwriting the oldest frame still waiting to be encoded
+            if self.drop_policy == DROP_OLDEST and self.filled:
+                self.dropped += 1
+                return self.filled.popleft()
+
+            self.dropped += 1
+            return None
+
+    def publish(self, slot):
+        """
+        Queues a filled slot for encoding.
+
+        Parameters:
+            slot (int): The slot index from acquire.
+        """
+        with self.condition:
+            self.filled.append(slot)
+            self.max_depth = max(self.max_depth, len(self.filled))
+            self.condition.notify_all()
+
+    def submit(self, frame, canvas=None):
+        """
+        Records one rendered frame (called from the render thread).
+
+        Parameters:
+            frame (3d numpy array): The composited display frame.
+            canvas (Canvas or TiledCanvas): The canvas, composited onto black
+                                            instead of the frame in canvas
+                                            mode.
+
+        Returns:
+            (bool): Whether or not the frame was queued.
+        """
+        with PROFILER.stage("recorder.submit"):
+            slot = self.acquire()
+            if slot is None:
+                return False
+
+            # Copying into the ring (the render thread keeps drawing into its own buffers)
+            image = self.slots[slot]
+            if self.mode == RECORD_CANVAS:
+                image.fill(0)
+                canvas.composite(image)
+            elif frame.shape[:2] == image.shape[:2]:
+                np.copyto(image, frame)
+            else:
+                cv2.resize(frame, (self.width, self.height), dst=image)
+
+            self.publish(slot)
+            return True
+
+    def run(self):
+        """Encodes queued frames until stopped and every queued frame is written."""
+        while True:
+
+            # Waiting for the next filled slot
+            with self.condition:
+                while not self.filled and not self.stopped:
+                    self.condition.wait()
+                if not self.filled:
+                    break
+                slot = self.filled.popleft()
+
+            # Encoding outside the lock so the render thread can keep filling other slots
+            self.writer.write(self.slots[slot])
+
+            # Returning the slot
+            with self.condition:
+                self.written += 1
+                self.free.append(slot)
+                self.condition.notify_all()
+
+        self.writer.release()
+
+    def stop(self):
+        """Writes the frames still queued, closes the video, and waits for the thread."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.join()
+
+    def stats(self):
+        """
+        Returns recording statistics.
+
+        Returns:
+            (dict): Frames submitted, written, and dropped, and the current
+                    and deepest queue depth.
+        """
+        with self.condition:
+            return {"submitted": self.submitted,
+                    "written": self.written,
+                    "dropped": self.dropped,
+                    "queued": len(self.filled),
+                    "max_depth": self.max_depth}
@@ -1,11 +1,12 @@
 import cv2
 import numpy as np
+from profiler import profiled
 
 
 class Region:
     """Class representing regions of the sketchpad."""
 
-    def __init__(self, pos, size, color, text="", transparency=0.9):
+    def __init__(self, pos, size, color, text="", transparency=0.9, action=None):
         """
         Initializes a Region object.
 
@@ -18,6 +19,8 @@ class Region:
             text (str): The text to be displayed on the region.
             transparency (float): How transparent the region should be. 0 is
                                   fully transparent and 1 is opaque.
+            action (str): Name of the action triggered when the region is
+                          touched (None for regions that are not controls).
         """
 
         # Defining class attributes with constructor args
@@ -26,7 +29,9 @@ class Region:
         self.color = color
         self.text = text
         self.transparency = transparency
+        self.action = action
 
+    @profiled("region.draw")
     def draw(self, img, text_color=(255, 255, 255), font=cv2.FONT_HERSHEY_SIMPLEX, font_scale=0.8, thickness=2):
         """
         Draws a region.
@@ -68,6 +73,81 @@ class Region:
             # Adding text to image
             cv2.putText(img, self.text, text_pos, font, font_scale, text_color, thickness)
 
+    @profiled("region.draw_layer")
+    def draw_layer(self, color_layer, alpha_mask, text_color=(255, 255, 255), font=cv2.FONT_HERSHEY_SIMPLEX,
+                   font_scale=0.8, thickness=2):
+        """
+        Draws a region onto a pre-rendered UI layer instead of blending it
+        onto a frame. The layer is blended onto frames later in a single pass
+        (see UILayer).
+
+        Parameters:
+            color_layer (3d numpy array): The bgr color layer.
+            alpha_mask (2d numpy array): The float32 opacity of each pixel of
+                                         the color layer.
+            text_color (tuple of ints): The bgr color code for the region text.
+            font (int): The text font.
+            font_scale (float): Scale for text size. 1.0 is normal size and
+                                2.0 is double the size.
+            thickness (int): Line thickness for text.
+        """
+
+        # Writing region color and opacity (fully transparent regions leave what is underneath)
+        if self.transparency > 0:
+            self.fill(color_layer, self.color)
+            self.fill(alpha_mask, self.transparency)
+
+        # Case for adding text
+        if self.text:
+
+            # Finding text size and position based on text, font, font size, and thickness
+            text_size = cv2.getTextSize(self.text, font, font_scale, thickness)
+            text_pos = (int(self.pos[1] + self.size[1] / 2 - text_size[0][0] / 2),
+                        int(self.pos[0] + self.size[0] / 2 + text_size[0][1] / 2))
+
+            # Adding opaque text to layer
+            cv2.putText(color_layer, self.text, text_pos, font, font_scale, text_color, thickness)
+            cv2.putText(alpha_mask, self.text, text_pos, font, font_scale, 1.0, thickness)
+
+    def fill(self, img, value):
+        """
+        Fills the area of a region with a value.
+
+        Parameters:
+            img (numpy array): The image to fill.
+            value (tuple or number): The color (or single channel value).
+        """
+        img[self.pos[0]:self.pos[0] + self.size[0],
+            self.pos[1]:self.pos[1] + self.size[1]] = value
+
+    def rasterize(self, label_map, label):
+        """
+        Writes a label into every pixel that contains() accepts.
+
+        Parameters:
+            label_map (2d numpy array): The label image.
+            label (int): The label of the region.
+        """
+
+        # Edges are inclusive to match contains()
+        label_map[max(self.pos[0], 0):self.pos[0] + self.size[0] + 1,
+                  max(self.pos[1], 0):self.pos[1] + self.size[1] + 1] = label
+
+    def draw_outline(self, img, color, thickness):
+        """
+        Draws the border of a region.
+
+        Parameters:
+            img (numpy array): The image to draw on.
+            color (tuple or number): The color (or single channel value).
+            thickness (int): Line thickness of the border.
+        """
+        cv2.rectangle(img,
+                      (self.pos[1], self.pos[0]),
+                      (self.pos[1] + self.size[1], self.pos[0] + self.size[0]),
+                      color,
+                      thickness)
+
     def contains(self, point):
         """
         Checks if a region contains a point.
@@ -80,3 +160,199 @@ class Region:
         """
         return (self.pos[0] <= point[0] <= self.pos[0] + self.size[0] and
                 self.pos[1] <= point[1] <= self.pos[1] + self.size[1])
+
+    def contains_array(self, points):
+        """
+        Checks which of several points a region contains.
+
+        Parameters:
+            points (numpy array): Row, col points with shape (..., 2).
+
+        Returns:
+            (numpy array of bools): Whether or not each point is in the region.
+        """
+        rows = points[..., 0]
+        cols = points[..., 1]
+        return ((self.pos[0] <= rows) & (rows <= self.pos[0] + self.size[0]) &
+                (self.pos[1] <= cols) & (cols <= self.pos[1] + self.size[1]))
+
+
+class ShapedRegion(Region):
+    """Base class for non-rectangular regions.
+
+    Subclasses implement fill, draw_outline, and contains_array. pos and size
+    describe the bounding box, which is used to center the text.
+    """
+
+    @profiled("region.draw")
+    def draw(self, img, text_color=(255, 255, 255), font=cv2.FONT_HERSHEY_SIMPLEX, font_scale=0.8, thickness=2):
+        """
+        Draws a region.
+
+        Parameters:
+            img (3d numpy array): The input image where the region is drawn.
+            text_color (tuple of ints): The bgr color code for the region text.
+            font (int): The text font.
+            font_scale (float): Scale for text size. 1.0 is normal size and
+                                2.0 is double the size.
+            thickness (int): Line thickness for text.
+        """
+
+        # Blending the region color into the shape only
+        overlay = img.copy()
+        self.fill(overlay, self.color)
+        mask = np.zeros(img.shape[:2], dtype=np.uint8)
+        self.fill(mask, 255)
+        blended = cv2.addWeighted(overlay, self.transparency, img, 1 - self.transparency, 0)
+        cv2.copyTo(blended, mask, img)
+
+        # Finding text size and position based on text, font, font size, and thickness
+        text_size = cv2.getTextSize(self.text, font, font_scale, thickness)
+        text_pos = (int(self.pos[1] + self.size[1] / 2 - text_size[0][0] / 2),
+                    int(self.pos[0] + self.size[0] / 2 + text_size[0][1] / 2))
+
+        # Adding text to image
+        cv2.putText(img, self.text, text_pos, font, font_scale, text_color, thickness)
+
+    def rasterize(self, label_map, label):
+        """
+        Writes a label into every pixel of the shape.
+
+        Parameters:
+            label_map (2d numpy array): The label image.
+            label (int): The label of the region.
+        """
+        self.fill(label_map, label)
+
+    def contains(self, point):
+        """
+        Checks if a region contains a point.
+
+        Parameters:
+            point (tuple of ints): The point of interest to check.
+
+        Returns:
+            (bool): Whether or not the point is in the region
+        """
+        return bool(self.contains_array(np.array(point)))
+
+
+class CircleRegion(ShapedRegion):
+    """Class representing circular regions of the sketchpad."""
+
+    def __init__(self, center, radius, color, text="", transparency=0.9, action=None):
+        """
+        Initializes a CircleRegion object.
+
+        Parameters:
+            center (tuple of ints): The row, col position of the center.
+            radius (int): The circle radius.
+            color (tuple of ints): The bgr color code for the region.
+            text (str): The text to be displayed on the region.
+            transparency (float): How transparent the region should be. 0 is
+                                  fully transparent and 1 is opaque.
+            action (str): Name of the action triggered when the region is
+                          touched.
+        """
+        super().__init__((center[0] - radius, center[1] - radius), (2 * radius, 2 * radius),
+                         color, text, transparency, action)
+        self.center = center
+        self.radius = radius
+
+    def fill(self, img, value):
+        """
+        Fills the circle with a value.
+
+        Parameters:
+            img (numpy array): The image to fill.
+            value (tuple or number): The color (or single channel value).
+        """
+        cv2.circle(img, (self.center[1], self.center[0]), self.radius, value, -1)
+
+    def draw_outline(self, img, color, thickness):
+        """
+        Draws the border of the circle.
+
+        Parameters:
+            img (numpy array): The image to draw on.
+            color (tuple or number): The color (or single channel value).
+            thickness (int): Line thickness of the border.
+        """
+        cv2.circle(img, (self.center[1], self.center[0]), self.radius, color, thickness)
+
+    def contains_array(self, points):
+        """
+        Checks which of several points the circle contains.
+
+        Parameters:
+            points (numpy array): Row, col points with shape (..., 2).
+
+        Returns:
+            (numpy array of bools): Whether or not each point is in the circle.
+        """
+        d_rows = points[..., 0] - self.center[0]
+        d_cols = points[..., 1] - self.center[1]
+        return d_rows * d_rows + d_cols * d_cols <= self.radius * self.radius
+
+
+class PolygonRegion(ShapedRegion):
+    """Class representing polygonal regions of the sketchpad."""
+
+    def __init__(self, points, color, text="", transparency=0.9, action=None):
+        """
+        Initializes a PolygonRegion object.
+
+        Parameters:
+            points (list of tuples): The row, col position of each vertex.
+            color (tuple of ints): The bgr color code for the region.
+            text (str): The text to be displayed on the region.
+            transparency (float): How transparent the region should be. 0 is
+                                  fully transparent and 1 is opaque.
+            action (str): Name of the action triggered when the region is
+                          touched.
+        """
+        vertices = np.array(points, dtype=np.int32)
+        top_left = vertices.min(axis=0)
+        bottom_right = vertices.max(axis=0)
+        super().__init__(tuple(top_left.tolist()), tuple((bottom_right - top_left).tolist()),
+                         color, text, transparency, action)
+
+        # Vertices as x, y for OpenCV drawing
+        self.points = vertices[:, ::-1].copy()
+
+    def fill(self, img, value):
+        """
+        Fills the polygon with a value.
+
+        Parameters:
+            img (numpy array): The image to fill.
+            value (tuple or number): The color (or single channel value).
+        """
+        cv2.fillPoly(img, [self.points], value)
+
+    def draw_outline(self, img, color, thickness):
+        """
+        Draws the border of the polygon.
+
+        Parameters:
+            img (numpy array): The image to draw on.
+            color (tuple or number): The color (or single channel value).
+            thickness (int): Line thickness of the border.
+        """
+        cv2.polylines(img, [self.points], True, color, thickness)
+
+    def contains_array(self, points):
+        """
+        Checks which of several points the polygon contains.
+
+        Parameters:
+            points (numpy array): Row, col points with shape (..., 2).
+
+        Returns:
+            (numpy array of bools): Whether or not each point is in the polygon.
+        """
+        points = np.asarray(points)
+        flat = points.reshape(-1, 2)
+        inside = np.array([cv2.pointPolygonTest(self.points, (float(col), float(row)), False) >= 0
+                           for row, col in flat], dtype=bool)
+        return inside.reshape(points.shape[:-1])
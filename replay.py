@@ -0,0 +1,399 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from hand_tracker import TrackAssigner
+from pipeline import LatencyStats
+from sketchpad import Sketchpad
+
+# Stages timed by run_headless, in order
+STAGES = ("capture", "inference", "gestures", "render", "total")
+
+
+def save_landmarks(path, frames, frame_size):
+    """
+    Saves recorded per-frame hand landmarks to a JSON or NPZ file.
+
+    Parameters:
+        path (str): The output path. Files ending in .json are saved as JSON,
+                    everything else as compressed NPZ.
+        frames (list of tuples): (pos_array, handedness labels) of each frame,
+                                 where pos_array is (n_hands, 21, 2) row, col.
+        frame_size (tuple of ints): The rows, cols of the recorded frames.
+    """
+
+    # Case for JSON
+    if path.endswith(".json"):
+        data = {"frame_size": list(frame_size),
+                "frames": [{"hands": np.asarray(pos_array).tolist(), "handedness": list(labels)}
+                           for pos_array, labels in frames]}
+        with open(path, "w") as f:
+            json.dump(data, f)
+        return
+
+    # NPZ stores all hands back to back plus the number of hands in each frame
+    counts = np.array([len(pos_array) for pos_array, _ in frames], dtype=np.int32)
+    positions = (np.concatenate([pos_array for pos_array, _ in frames]) if counts.sum()
+                 else np.zeros((0, 21, 2), dtype=np.int32))
+    handedness = np.array([label for _, labels in frames for label in labels], dtype=str)
+    np.savez_compressed(path,
+                        positions=positions.astype(np.int32),
+                        counts=counts,
+                        handedness=handedness,
+                        frame_size=np.array(frame_size, dtype=np.int32))
+
+
+def load_landmarks(path, frame_size=(720, 1280)):
+    """
+    Loads per-frame hand landmarks saved by save_landmarks.
+
+    Parameters:
+        path (str): The JSON or NPZ file.
+        frame_size (tuple of ints): The rows, cols positions are scaled to.
+
+    Returns:
+        (list of tuples): (pos_array, handedness labels) of each frame.
+    """
+
+    frames = []
+
+    # Case for JSON
+    if path.endswith(".json"):
+        with open(path) as f:
+            data = json.load(f)
+        recorded_size = data["frame_size"]
+        for frame in data["frames"]:
+            pos_array = np.array(frame["hands"], dtype=np.float64).reshape(-1, 21, 2)
+            frames.append((pos_array, list(frame["handedness"])))
+
+    # Case for NPZ
+    else:
+        with np.load(path) as data:
+            recorded_size = data["frame_size"].tolist()
+            positions = data["positions"].astype(np.float64)
+            handedness = data["handedness"].tolist()
+            counts = data["counts"]
+        starts = np.concatenate(([0], np.cumsum(counts)))
+        for start, end in zip(starts[:-1], starts[1:]):
+            frames.append((positions[start:end], handedness[start:end]))
+
+    # Scaling positions to the requested frame size
+    scale = np.array(frame_size, dtype=np.float64) / np.array(recorded_size, dtype=np.float64)
+    return [((pos_array * scale).astype(np.int32), labels) for pos_array, labels in frames]
+
+
+class VideoSource:
+    """Frame source reading a video file and running MediaPipe on it."""
+
+    def __init__(self, path, frame_size=(720, 1280), mirror=True, hand_tracker=None):
+        """
+        Initializes a VideoSource object.
+
+        Parameters:
+            path (str): The video file.
+            frame_size (tuple of ints): The rows, cols frames are resized to.
+            mirror (bool): Whether or not to flip frames horizontally like the
+                           webcam feed.
+            hand_tracker (HandTracker): The tracker used for inference. A new
+                                        one is created if None.
+        """
+
+        # Imported here so landmark-only replays never load MediaPipe
+        from hand_tracker import HandTracker
+
+        # Defining class attributes with constructor args
+        self.cap = cv2.VideoCapture(path)
+        self.frame_size = frame_size
+        self.mirror = mirror
+        self.hand_tracker = hand_tracker if hand_tracker is not None else HandTracker()
+
+    def read(self):
+        """
+        Reads the next frame.
+
+        Returns:
+            (3d numpy array): The frame, or None at the end of the video.
+        """
+        success, frame = self.cap.read()
+        if not success:
+            return None
+
+        # Matching the sketchpad size and the webcam mirror view
+        if frame.shape[:2] != tuple(self.frame_size):
+            frame = cv2.resize(frame, (self.frame_size[1], self.frame_size[0]))
+        if self.mirror:
+            frame = cv2.flip(frame, 1)
+
+        return frame
+
+    def track(self, frame):
+        """
+        Runs hand detection on a frame.
+
+        Parameters:
+            frame (3d numpy array): The frame.
+
+        Returns:
+            (3d numpy array), (list of strs): The (n_hands, 21, 2) landmark
+                                              positions and handedness labels.
+        """
+        self.hand_tracker.detect_hands(frame, visible_landmarks=False)
+        pos_array = self.hand_tracker.get_pos_array()
+        return pos_array, self.hand_tracker.handedness[:len(pos_array)]
+
+    def release(self):
+        """Closes the video file."""
+        self.cap.release()
+
+
+class LandmarkSource:
+    """Frame source replaying recorded landmarks over a blank background."""
+
+    def __init__(self, path, frame_size=(720, 1280)):
+        """
+        Initializes a LandmarkSource object.
+
+        Parameters:
+            path (str): The JSON or NPZ landmark file.
+            frame_size (tuple of ints): The rows, cols of the replayed frames.
+        """
+        self.frames = load_landmarks(path, frame_size)
+        self.index = 0
+
+        # Blank background and a reusable frame buffer
+        self.background = np.zeros((frame_size[0], frame_size[1], 3), dtype=np.uint8)
+        self.frame = np.empty_like(self.background)
+
+    def read(self):
+        """
+        Returns the next (blank) frame.
+
+        Returns:
+            (3d numpy array): The frame, or None after the last recorded frame.
+        """
+        if self.index >= len(self.frames):
+            return None
+        np.copyto(self.frame, self.background)
+        return self.frame
+
+    def track(self, frame):
+        """
+        Returns the recorded landmarks of the current frame.
+
+        Parameters:
+            frame (3d numpy array): The frame (unused).
+
+        Returns:
+            (3d numpy array), (list of strs): The (n_hands, 21, 2) landmark
+                                              positions and handedness labels.
+        """
+        pos_array, labels = self.frames[self.index]
+        self.index += 1
+        return pos_array, labels
+
+    def release(self):
+        """Nothing to close for recorded landmarks."""
+
+
+def run_headless(source, sketchpad=None, max_frames=None, record=None):
+    """
+    Runs the full gesture, draw, and composite pipeline without a window.
+
+    Parameters:
+        source (VideoSource or LandmarkSource): Where frames and landmarks
+                                                come from.
+        sketchpad (Sketchpad): The sketchpad to drive. A new one is created
+                               if None.
+        max_frames (int): Stop after this many frames (None for all).
+        record (list): If given, (pos_array, handedness labels) of each frame
+                       are appended to it.
+
+    Returns:
+        (Sketchpad), (dict): The sketchpad with the final canvas, and a report
+                             of per-stage throughput and latency percentiles.
+    """
+
+    if sketchpad is None:
+        sketchpad = Sketchpad()
+
+    # Track ids and per stage timings
+    track_assigner = TrackAssigner()
+    stages = {name: LatencyStats(window=1000000) for name in STAGES}
+    n_frames = 0
+    start = time.perf_counter()
+
+    while max_frames is None or n_frames < max_frames:
+
+        # Capture
+        t0 = time.perf_counter()
+        frame = source.read()
+        if frame is None:
+            break
+        t1 = time.perf_counter()
+
+        # Inference (or recorded landmarks)
+        pos_array, labels = source.track(frame)
+        t2 = time.perf_counter()
+
+        # Gestures and drawing (extended fingers are classified from the gesture features)
+        track_ids = track_assigner.assign(pos_array, labels)
+        sketchpad.update(pos_array, None, track_ids)
+        t3 = time.perf_counter()
+
+        # UI and compositing
+        sketchpad.render(frame)
+        t4 = time.perf_counter()
+
+        # Recording timings (and landmarks if requested)
+        for name, seconds in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t4 - t0)):
+            stages[name].add(seconds)
+        if record is not None:
+            record.append((np.array(pos_array), list(labels)))
+        n_frames += 1
+
+        # Stop if the exit button was pressed
+        if sketchpad.exit:
+            break
+
+    elapsed = time.perf_counter() - start
+
+    # Building report
+    report = {"frames": n_frames,
+              "elapsed_s": elapsed,
+              "fps": n_frames / elapsed if elapsed > 0 else 0.0,
+              "stages": {}}
+    for name, stats in stages.items():
+        summary = stats.summary()
+        if summary:
+            summary["fps"] = 1000.0 / summary["mean"] if summary["mean"] > 0 else float("inf")
+        report["stages"][name] = summary
+
+    return sketchpad, report
+
+
+def compare_with_golden(image, golden_path, tolerance=0):
+    """
+    Compares a canvas with a golden image.
+
+    Parameters:
+        image (3d numpy array): The canvas image.
+        golden_path (str): The golden image file.
+        tolerance (int): Max per channel difference still counted as equal.
+
+    Returns:
+        (float): The fraction of pixels that differ.
+    """
+
+    golden = cv2.imread(golden_path)
+    if golden is None:
+        raise FileNotFoundError(golden_path)
+    if golden.shape != image.shape:
+        return 1.0
+
+    diff = cv2.absdiff(image, golden)
+    return float((diff.max(axis=2) > tolerance).mean())
+
+
+def print_report(report):
+    """
+    Prints a replay report as a table.
+
+    Parameters:
+        report (dict): The report from run_headless.
+    """
+    print("{} frames in {:.2f} s ({:.1f} fps)".format(report["frames"], report["elapsed_s"], report["fps"]))
+    print("{:<10} {:>9} {:>9} {:>9} {:>9} {:>9}".format("stage", "fps", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+    for name, summary in report["stages"].items():
+        if summary:
+            print("{:<10} {:>9.1f} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f}".format(
+                name, summary["fps"], summary["p50"], summary["p95"], summary["p99"], summary["max"]))
+
+
+def parse_args():
+    """
+    Parses command line arguments.
+
+    Returns:
+        (argparse.Namespace): The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Headless Interactive Sketchpad replay and benchmark")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="video file to run hand tracking on")
+    source.add_argument("--landmarks", help="recorded landmark file (.json or .npz); skips MediaPipe")
+    parser.add_argument("--no-mirror", action="store_true", help="don't flip video frames horizontally")
+    parser.add_argument("--max-frames", type=int, help="stop after this many frames")
+    parser.add_argument("--record-landmarks", help="save the per-frame landmarks to this .json or .npz file")
+    parser.add_argument("--canvas-out", help="save the final canvas to this image file")
+    parser.add_argument("--strokes-out", help="save the vector strokes to this .npz file")
+    parser.add_argument("--svg-out", help="export the vector strokes to this .svg file")
+    parser.add_argument("--render-scale", type=float,
+                        help="re-render the strokes at this scale and save them next to --canvas-out")
+    parser.add_argument("--golden", help="golden canvas image to compare the final canvas with")
+    parser.add_argument("--tolerance", type=int, default=0, help="per channel difference still counted as equal")
+    parser.add_argument("--max-mismatch", type=float, default=0.0,
+                        help="max fraction of differing pixels before the comparison fails")
+    parser.add_argument("--report", help="save the report to this JSON file")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Replays a video or landmark file headlessly and reports timings.
+
+    Returns:
+        (int): Process exit code (1 if the golden comparison failed).
+    """
+
+    args = parse_args()
+
+    # Setting up the frame source
+    if args.video:
+        source = VideoSource(args.video, mirror=not args.no_mirror)
+    else:
+        source = LandmarkSource(args.landmarks)
+
+    # Running the replay
+    record = [] if args.record_landmarks else None
+    sketchpad, report = run_headless(source, max_frames=args.max_frames, record=record)
+    source.release()
+    print_report(report)
+
+    # Saving outputs
+    if record is not None:
+        save_landmarks(args.record_landmarks, record, sketchpad.canvas.image.shape[:2])
+    if args.canvas_out:
+        cv2.imwrite(args.canvas_out, sketchpad.canvas.image)
+    if args.canvas_out and args.render_scale:
+        height, width = sketchpad.canvas.image.shape[:2]
+        rendered = sketchpad.strokes.rasterize(int(width * args.render_scale), int(height * args.render_scale),
+                                               args.render_scale)
+        root, ext = os.path.splitext(args.canvas_out)
+        cv2.imwrite("{}_x{:g}{}".format(root, args.render_scale, ext), rendered.image)
+    if args.strokes_out:
+        sketchpad.strokes.save(args.strokes_out)
+    if args.svg_out:
+        height, width = sketchpad.canvas.image.shape[:2]
+        sketchpad.strokes.export_svg(args.svg_out, width, height)
+
+    # Comparing with golden image
+    exit_code = 0
+    if args.golden:
+        mismatch = compare_with_golden(sketchpad.canvas.image, args.golden, args.tolerance)
+        report["golden_mismatch"] = mismatch
+        print("Golden mismatch: {:.4%}".format(mismatch))
+        if mismatch > args.max_mismatch:
+            exit_code = 1
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,442 @@
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+from canvas import Canvas
+from profiler import PROFILER
+
+# Kinds of stroke log records
+SEGMENT = 0
+CLEAR = 1
+HIDE = 2
+SHOW = 3
+UNDO_CLEAR = 4
+REDO_CLEAR = 5
+
+# One fixed-size binary record per event (38 bytes, little endian). Segments use every field. Hide and show
+# store the segment range in coords[0:2], clear and redo clear store the segment count in coords[0].
+RECORD_DTYPE = np.dtype([("kind", "u1"),
+                         ("color", "u1", 3),
+                         ("width", "<u2"),
+                         ("hand", "<i4"),
+                         ("stroke", "<i4"),
+                         ("coords", "<i4", 4),
+                         ("time", "<f8")])
+
+# Header at the start of every stroke log
+LOG_MAGIC = b"SKLOG01\n"
+
+# Files making up a saved session
+SESSION_FILES = ("strokes.log", "canvas.npy", "checkpoint.json")
+
+
+def pack_segments(strokes, start, end):
+    """
+    Packs a range of segments into log records.
+
+    Parameters:
+        strokes (StrokeStore): The strokes holding the segments.
+        start (int): The first segment.
+        end (int): One past the last segment.
+
+    Returns:
+        (numpy array): The records.
+    """
+    stroke = strokes.segment_stroke[start:end]
+    records = np.zeros(end - start, dtype=RECORD_DTYPE)
+    records["kind"] = SEGMENT
+    records["color"] = strokes.stroke_color[stroke]
+    records["width"] = strokes.stroke_width[stroke]
+    records["hand"] = strokes.stroke_hand[stroke]
+    records["stroke"] = stroke
+    records["coords"] = strokes.segments[start:end]
+    records["time"] = strokes.segment_time[start:end]
+    return records
+
+
+def read_log(path):
+    """
+    Reads every complete record of a stroke log.
+
+    Parameters:
+        path (str): The log file.
+
+    Returns:
+        (numpy array): The records (empty if the file does not exist).
+    """
+
+    # Case for no log
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=RECORD_DTYPE)
+
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(LOG_MAGIC):
+        raise ValueError("{} is not a stroke log".format(path))
+
+    # A crash can leave a partial record at the end, which is dropped
+    n_records = (len(data) - len(LOG_MAGIC)) // RECORD_DTYPE.itemsize
+    return np.frombuffer(data, dtype=RECORD_DTYPE, count=n_records, offset=len(LOG_MAGIC))
+
+
+class AutosaveThread(threading.Thread):
+    """Thread that writes stroke log records and canvas snapshots to disk."""
+
+    def __init__(self, session_dir, jobs):
+        """
+        Initializes an AutosaveThread object.
+
+        Parameters:
+            session_dir (str): The session directory.
+            jobs (queue.Queue): Jobs from the render loop, in order (None
+                                stops the thread).
+        """
+        super().__init__(daemon=True)
+        self.session_dir = session_dir
+        self.jobs = jobs
+
+        # Log file and memory-mapped canvas (opened on first use)
+        self.log_file = None
+        self.canvas_map = None
+
+    def open_log(self):
+        """Opens the stroke log for appending, writing the header if it is new."""
+        path = os.path.join(self.session_dir, "strokes.log")
+        self.log_file = open(path, "ab")
+        if self.log_file.tell() == 0:
+            self.log_file.write(LOG_MAGIC)
+        else:
+
+            # Drop a partial record left by a crash so new records stay aligned
+            size = self.log_file.tell() - len(LOG_MAGIC)
+            self.log_file.truncate(len(LOG_MAGIC) + size - size % RECORD_DTYPE.itemsize)
+            self.log_file.seek(0, os.SEEK_END)
+
+    def open_canvas_map(self, shape):
+        """
+        Maps the canvas file, creating it if it is missing or a different size.
+
+        Parameters:
+            shape (tuple of ints): The (height, width, 4) bgr and mask shape.
+        """
+        path = os.path.join(self.session_dir, "canvas.npy")
+        if os.path.exists(path):
+            canvas_map = np.load(path, mmap_mode="r+")
+            if canvas_map.shape == shape and canvas_map.dtype == np.uint8:
+                self.canvas_map = canvas_map
+                return
+            del canvas_map
+        self.canvas_map = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=shape)
+
+    def write_checkpoint(self, n_records, shape):
+        """
+        Records which log prefix the mapped canvas matches (written atomically).
+
+        Parameters:
+            n_records (int): The number of log records drawn on the canvas.
+            shape (tuple of ints): The canvas shape.
+        """
+        path = os.path.join(self.session_dir, "checkpoint.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump({"records": n_records, "shape": list(shape), "time": time.time()}, f)
+        os.replace(path + ".tmp", path)
+
+    def run(self):
+        """Writes jobs until a None job arrives."""
+
+        self.open_log()
+
+        while True:
+            job = self.jobs.get()
+
+            # Case for stopping
+            if job is None:
+                break
+
+            # Appending records
+            if job[0] == "records":
+                self.log_file.write(job[1].tobytes())
+                continue
+
+            # Writing changed canvas rows after all records before them, then the checkpoint
+            _, top, rows, shape, n_records = job
+            self.log_file.flush()
+            os.fsync(self.log_file.fileno())
+            if self.canvas_map is None or self.canvas_map.shape != shape:
+                self.open_canvas_map(shape)
+            self.canvas_map[top:top + len(rows)] = rows
+            self.canvas_map.flush()
+            self.write_checkpoint(n_records, shape)
+
+        # Cleanup
+        self.log_file.close()
+        self.canvas_map = None
+
+
+class Session:
+    """Class saving a sketchpad session as it is drawn so it can be resumed.
+
+    Every segment, clear, undo, and redo is appended to a binary stroke log.
+    Rows of the canvas that changed are periodically copied to a memory-mapped
+    file together with a checkpoint naming the log prefix they match. All disk
+    writes happen on a background thread; the render loop only packs records
+    and copies changed rows. Resuming maps the canvas back in and draws only
+    the log records after the checkpoint.
+    """
+
+    def __init__(self, session_dir, snapshot_interval=2.0):
+        """
+        Initializes a Session object.
+
+        Parameters:
+            session_dir (str): The directory holding the session files
+                               (created if missing).
+            snapshot_interval (float): Seconds between canvas snapshots.
+        """
+
+        # Defining class attributes with constructor args
+        self.session_dir = session_dir
+        self.snapshot_interval = snapshot_interval
+        os.makedirs(session_dir, exist_ok=True)
+
+        # Number of segments and log records written so far, and the records covered by the last snapshot
+        self.logged_segments = 0
+        self.n_records = 0
+        self.snapshot_records = -1
+        self.last_snapshot = time.monotonic()
+
+        # Background writer
+        self.jobs = queue.Queue()
+        self.thread = None
+
+    def path(self, name):
+        """
+        Returns the path of a session file.
+
+        Parameters:
+            name (str): The file name.
+
+        Returns:
+            (str): The path.
+        """
+        return os.path.join(self.session_dir, name)
+
+    def has_saved(self):
+        """
+        Checks if the directory holds a previous session.
+
+        Returns:
+            (bool): Whether or not any session file exists.
+        """
+        return any(os.path.exists(self.path(name)) for name in SESSION_FILES)
+
+    def reset(self):
+        """
+        Moves the files of a previous session aside (to start a new drawing),
+        keeping them as .bak files until the next reset. Must be called before
+        start.
+        """
+        for name in SESSION_FILES:
+            if os.path.exists(self.path(name)):
+                os.replace(self.path(name), self.path(name + ".bak"))
+
+    def start(self):
+        """Starts the background writer."""
+        self.thread = AutosaveThread(self.session_dir, self.jobs)
+        self.thread.start()
+
+    def resume(self, sketchpad):
+        """
+        Restores the strokes and canvas of a saved session. Must be called
+        before start.
+
+        Parameters:
+            sketchpad (Sketchpad): A new sketchpad to restore into.
+
+        Returns:
+            (int): The number of log records drawn onto the canvas (fewer than
+                   the log holds when the mapped canvas could be used).
+        """
+
+        records = read_log(self.path("strokes.log"))
+        strokes = sketchpad.strokes
+        canvas = sketchpad.canvas
+
+        # Rebuilding the vector strokes (segments in bulk, events in order)
+        segments = records[records["kind"] == SEGMENT]
+        stroke_ids, first = np.unique(segments["stroke"], return_index=True)
+        for stroke, index in zip(stroke_ids.tolist(), first.tolist()):
+            if stroke != strokes.n_strokes:
+                raise ValueError("Stroke log is missing stroke {}".format(strokes.n_strokes))
+            record = segments[index]
+            strokes.start_stroke(int(record["hand"]), tuple(record["color"].tolist()), int(record["width"]),
+                                 float(record["time"]))
+        for name in ("segments", "segment_stroke", "segment_time", "segment_hidden"):
+            strokes.grow(name, len(segments))
+        strokes.segments[:len(segments)] = segments["coords"]
+        strokes.segment_stroke[:len(segments)] = segments["stroke"]
+        strokes.segment_time[:len(segments)] = segments["time"]
+        strokes.n_segments = len(segments)
+        for record in records[records["kind"] != SEGMENT]:
+            kind, coords = int(record["kind"]), record["coords"].tolist()
+            if kind in (HIDE, SHOW):
+                strokes.set_hidden(coords[0], coords[1], kind == HIDE)
+            elif kind == UNDO_CLEAR:
+                strokes.clears.pop()
+            else:
+                strokes.clears.append(coords[0])
+
+        # Segment index of every record (segments before it), to find where the log tail starts
+        segments_before = np.cumsum(records["kind"] == SEGMENT) - (records["kind"] == SEGMENT)
+        checkpoint = self.load_canvas(canvas, len(records))
+        tail = records[checkpoint:]
+
+        # Without a usable snapshot the whole mapped file is rewritten by the next snapshot
+        if checkpoint == 0 and isinstance(canvas, Canvas):
+            canvas.mark_changed(0, canvas.height)
+
+        # Drawing only the tail on top of the mapped canvas (from its last clear if it has one)
+        if not np.isin(tail["kind"], (HIDE, SHOW, UNDO_CLEAR, REDO_CLEAR)).any():
+            clears = np.flatnonzero(tail["kind"] == CLEAR)
+            if len(clears):
+                canvas.clear()
+                strokes.rasterized = int(tail["coords"][clears[-1], 0])
+            else:
+                strokes.rasterized = int(segments_before[checkpoint]) if checkpoint < len(records) else len(segments)
+            drawn = len(tail)
+
+        # Undo and redo in the tail can change anything, so everything visible is redrawn
+        else:
+            canvas.clear()
+            strokes.rasterized = strokes.visible_start()
+            drawn = len(records)
+        strokes.rasterize_new(canvas)
+
+        # New records continue the log
+        self.logged_segments = strokes.n_segments
+        self.n_records = len(records)
+
+        return drawn
+
+    def load_canvas(self, canvas, n_records):
+        """
+        Copies the mapped canvas snapshot into a canvas if it can be used.
+
+        Parameters:
+            canvas (Canvas or TiledCanvas): The canvas to restore.
+            n_records (int): The number of records in the log.
+
+        Returns:
+            (int): The number of log records the restored canvas matches (0
+                   if the snapshot could not be used).
+        """
+
+        # Case for no snapshot or a canvas without a fixed size
+        if not isinstance(canvas, Canvas) or not os.path.exists(self.path("checkpoint.json")):
+            return 0
+        with open(self.path("checkpoint.json")) as f:
+            checkpoint = json.load(f)
+        shape = (canvas.height, canvas.width, 4)
+        if tuple(checkpoint["shape"]) != shape or checkpoint["records"] > n_records:
+            return 0
+
+        # Mapping the snapshot and copying it in
+        canvas_map = np.load(self.path("canvas.npy"), mmap_mode="r")
+        if canvas_map.shape != shape:
+            return 0
+        canvas.image[:] = canvas_map[:, :, :3]
+        canvas.mask[:] = canvas_map[:, :, 3]
+
+        # Rows holding ink
+        rows = np.flatnonzero(canvas.mask.any(axis=1))
+        if len(rows):
+            canvas.mark_dirty(int(rows[0]), int(rows[-1]) + 1)
+        canvas.take_changed()
+
+        return checkpoint["records"]
+
+    def log_segments(self, strokes):
+        """
+        Queues the segments added since the last call.
+
+        Parameters:
+            strokes (StrokeStore): The strokes of the sketchpad.
+        """
+
+        # Case for nothing new
+        start, end = self.logged_segments, strokes.n_segments
+        if end <= start:
+            return
+
+        # Packing all new segments at once
+        self.put_records(pack_segments(strokes, start, end))
+        self.logged_segments = end
+
+    def log_event(self, kind, a=0, b=0):
+        """
+        Queues a clear, undo, or redo.
+
+        Parameters:
+            kind (int): The record kind.
+            a (int): The first segment or segment count of the event.
+            b (int): One past the last segment of the event.
+        """
+        record = np.zeros(1, dtype=RECORD_DTYPE)
+        record["kind"] = kind
+        record["coords"][0, :2] = (a, b)
+        record["time"] = time.time()
+        self.put_records(record)
+
+    def put_records(self, records):
+        """
+        Hands records to the background writer.
+
+        Parameters:
+            records (numpy array): The records.
+        """
+        self.jobs.put(("records", records))
+        self.n_records += len(records)
+
+    def maybe_snapshot(self, canvas, force=False):
+        """
+        Queues the changed rows of the canvas if the snapshot interval passed.
+
+        Parameters:
+            canvas (Canvas or TiledCanvas): The canvas (tiled canvases are
+                                            only saved through the log).
+            force (bool): Whether or not to ignore the interval.
+        """
+
+        # Case for nothing to do
+        if not isinstance(canvas, Canvas):
+            return
+        now = time.monotonic()
+        if not force and now - self.last_snapshot < self.snapshot_interval:
+            return
+        self.last_snapshot = now
+
+        # Copying only the changed rows (image and mask side by side) so the writer never reads the live canvas
+        with PROFILER.stage("session.snapshot"):
+            top, bottom = canvas.take_changed()
+            if top == bottom and self.n_records == self.snapshot_records:
+                return
+            self.snapshot_records = self.n_records
+            rows = np.empty((bottom - top, canvas.width, 4), dtype=np.uint8)
+            rows[:, :, :3] = canvas.image[top:bottom]
+            rows[:, :, 3] = canvas.mask[top:bottom]
+        self.jobs.put(("snapshot", top, rows, (canvas.height, canvas.width, 4), self.n_records))
+
+    def close(self, canvas):
+        """
+        Writes a final snapshot and waits for the background writer.
+
+        Parameters:
+            canvas (Canvas or TiledCanvas): The canvas.
+        """
+        self.maybe_snapshot(canvas, force=True)
+        self.jobs.put(None)
+        if self.thread is not None:
+            self.thread.join()
@@ -1,10 +1,27 @@
+import argparse
+import time
+
 import cv2
 import numpy as np
+from broadcast import BroadcastServer
+from canvas import Canvas
+from config import ScreenConfig, parse_size
+from gestures import TIP_INDICES, GestureEngine, default_gestures
 from hand_tracker import HandTracker
+from history import TileHistory
+from layout import Layout
+from multicam import MultiCamera, run_multicam
+from pipeline import LatencyStats, run_pipelined
+from profiler import PROFILER, STARTUP
+from recorder import DROP_OLDEST, DROP_POLICIES, RECORD_CANVAS, RECORD_FRAME, VideoRecorder
 from region import Region
+from session import CLEAR, HIDE, REDO_CLEAR, SHOW, UNDO_CLEAR, Session
+from strokes import StrokeStore
+from tiled_canvas import TiledCanvas
+from ui_layer import UILayer
 
 
-def create_buttons(starting_pos=(0, 0), button_size=(100, 100)):
+def create_buttons(starting_pos=(0, 0), button_size=(100, 100), frame_width=1280):
     """
     Creates a list of region objects representing buttons.
 
@@ -12,6 +29,8 @@ def create_buttons(starting_pos=(0, 0), button_size=(100, 100)):
         starting_pos (tuple of ints): The row, col position of the first
                                       button's top left pixel.
         button_size (tuple of ints): The button sizes in # of rows, # of cols.
+        frame_width (int): The frame width in pixels (the Exit button sits at
+                           the right edge).
 
     Returns:
         (list of regions): List of sketchpad buttons.
@@ -21,22 +40,24 @@ def create_buttons(starting_pos=(0, 0), button_size=(100, 100)):
     starting_row = starting_pos[0]
     starting_col = starting_pos[1]
 
-    # Creating buttons
-    button_list = [Region(starting_pos, button_size, (0, 0, 255)),
-                   Region((starting_row, starting_col + 1*button_size[1]), button_size, (255, 0, 0)),
-                   Region((starting_row, starting_col + 2*button_size[1]), button_size, (0, 255, 0)),
-                   Region((starting_row, starting_col + 3*button_size[1]), button_size, (0, 255, 255)),
-                   Region((starting_row, starting_col + 4*button_size[1]), button_size, (132, 42, 78)),
-                   Region((starting_row, starting_col + 5*button_size[1]), button_size, (255, 255, 255)),
-                   Region((starting_row, starting_col + 6*button_size[1]), button_size, (1, 1, 1)),
-                   Region((starting_row, starting_col + 7*button_size[1]), button_size, (128, 128, 128), text="Eraser"),
-                   Region((starting_row, starting_col + 8*button_size[1]), button_size, (128, 128, 128), text="Clear"),
-                   Region((starting_row, 1280 - button_size[1]), button_size, (0, 0, 128), text="Exit")]
+    # Creating buttons (named actions decide what a button does)
+    button_list = [Region(starting_pos, button_size, (0, 0, 255), action="color"),
+                   Region((starting_row, starting_col + 1*button_size[1]), button_size, (255, 0, 0), action="color"),
+                   Region((starting_row, starting_col + 2*button_size[1]), button_size, (0, 255, 0), action="color"),
+                   Region((starting_row, starting_col + 3*button_size[1]), button_size, (0, 255, 255), action="color"),
+                   Region((starting_row, starting_col + 4*button_size[1]), button_size, (132, 42, 78), action="color"),
+                   Region((starting_row, starting_col + 5*button_size[1]), button_size, (255, 255, 255), action="color"),
+                   Region((starting_row, starting_col + 6*button_size[1]), button_size, (1, 1, 1), action="color"),
+                   Region((starting_row, starting_col + 7*button_size[1]), button_size, (128, 128, 128), text="Eraser",
+                          action="eraser"),
+                   Region((starting_row, starting_col + 8*button_size[1]), button_size, (128, 128, 128), text="Clear",
+                          action="clear"),
+                   Region((starting_row, frame_width - button_size[1]), button_size, (0, 0, 128), text="Exit", action="exit")]
 
     return button_list
 
 
-def slider_map(pos, lower_col=960, upper_col=1120, min_size=5, max_size=40):
+def slider_map(pos, lower_col, upper_col, min_size=5, max_size=40):
     """
     Adjusts cursor size and slider position based on fingertip position.
 
@@ -60,218 +81,889 @@ def slider_map(pos, lower_col=960, upper_col=1120, min_size=5, max_size=40):
     # Find index of column closest to fingertip position
     closest_ind = np.abs(cols - pos[1]).argmin()
 
-    return closest_ind + 5, cols[closest_ind]
-
-
-def main():
-    """
-    Main function that launches the interactive sketchpad.
-
-    Captures video from the webcam, tracks hand gestures using MediaPipe,
-    and allows drawing on a virtual canvas.
-    """
-
-    # Defining HandTracker and Region objects
-    hand_tracker = HandTracker()
-    buttons = create_buttons()
-    sketchpad = Region((100, 0), (720 - 100, 1280), (255, 255, 255), transparency=0.0)
-    slider = Region((0, 900), (100, 280), (255, 255, 255), transparency=0.0)
-
-    # Setting up empty image for drawings
-    sketch_img = np.zeros((720, 1280, 3), dtype=np.uint8)
-
-    # Initial cursor size and slider position
-    cursor_size = 5
-    slider_x = slider.pos[1] + 60
-
-    # Initial conditions for toggle, color, previous landmark positions, thumb state, and exiting
-    cursor_on = False
-    current_color_button = buttons[5]
-    current_color = current_color_button.color
-    prev_pos_list = [(0, 0)] * 4
-    prev_thumb_state = False
-    exit = False
-
-    # Set up webcam feed
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-
-    # Loop for running the sketchpad
-    while cap.isOpened():
-
-        # Read a frame from the webcam; end the loop if frame is not returned
-        success, frame = cap.read()
-        if not success:
-            print("Empty camera frame.")
-            break
-
-        # Flip the frame horizontally for mirror view
-        frame = cv2.flip(frame, 1)
+    return closest_ind + min_size, cols[closest_ind]
+
+
+class HandState:
+    """Class holding the drawing state of a single tracked hand."""
+
+    def __init__(self, color_button, cursor_size, slider_x):
+        """
+        Initializes a HandState object.
+
+        Parameters:
+            color_button (Region): The initially selected color button.
+            cursor_size (int): The initial cursor size.
+            slider_x (int): The slider position matching the cursor size.
+        """
+
+        # Initial conditions for toggle, color, cursor size, and previous fingertip positions
+        self.cursor_on = False
+        self.current_color_button = color_button
+        self.current_color = color_button.color
+        self.cursor_size = cursor_size
+        self.slider_x = slider_x
+        self.prev_tips = np.zeros((4, 2), dtype=np.int32)
+
+        # x, y screen position between the index and middle fingertips while panning (None otherwise)
+        self.pan_center = None
+
+        # Update count when the hand was last seen
+        self.last_seen = 0
+
+
+class Sketchpad:
+    """Class holding the drawing state and per-frame logic of the sketchpad."""
+
+    def __init__(self, max_missing=30, infinite=False, config=None, session=None):
+        """
+        Initializes a Sketchpad object.
+
+        Parameters:
+            max_missing (int): The number of updates a hand's state is kept
+                               after the hand was last seen.
+            infinite (bool): Whether or not to draw on an unbounded tiled
+                             canvas that can be panned and zoomed.
+            config (ScreenConfig): The capture and display resolutions (None
+                                   for 1280x720). All geometry is scaled to the
+                                   display resolution.
+            session (Session): Autosave that every change is logged to (None
+                               to disable).
+        """
+
+        # Resolutions the layout is derived from
+        self.config = config if config is not None else ScreenConfig()
+        width, height = self.config.width, self.config.height
+        toolbar_height = self.config.rows(100)
+
+        # Defining Region objects
+        self.buttons = create_buttons(button_size=self.config.point((100, 100)), frame_width=width)
+        self.sketchpad = Region((toolbar_height, 0), (height - toolbar_height, width), (255, 255, 255),
+                                transparency=0.0)
+        self.slider = Region(self.config.point((0, 900)), self.config.point((100, 280)), (255, 255, 255),
+                             transparency=0.0, action="slider")
+        self.history_buttons = [Region(self.config.point((0, 900)), self.config.point((50, 55)), (128, 128, 128),
+                                       text="Undo", action="undo"),
+                                Region(self.config.point((50, 900)), self.config.point((50, 55)), (128, 128, 128),
+                                       text="Redo", action="redo")]
+
+        # Slider bar columns and the cursor sizes they map to
+        self.slider_cols = (self.slider.pos[1] + self.config.cols(60),
+                            self.slider.pos[1] + self.slider.size[1] - self.config.cols(60))
+        self.cursor_sizes = (self.config.length(5), self.config.length(40))
+
+        # Label map for looking up the control under any fingertip (history buttons sit over the slider's left end)
+        self.layout = Layout(width, height)
+        for region in self.buttons + [self.slider] + self.history_buttons:
+            self.layout.add(region)
+
+        # Handlers for control actions (called with the control and the state of the hand touching it)
+        self.actions = {"color": self.select_color,
+                        "eraser": self.select_eraser,
+                        "clear": self.clear,
+                        "exit": self.request_exit,
+                        "slider": self.move_slider,
+                        "undo": self.undo,
+                        "redo": self.redo}
+
+        # Actions that repeat while a fingertip stays on the control (others fire once on entry)
+        self.continuous_actions = {"slider"}
+
+        # Actions that only fire when the fingertip comes from outside every control (the history buttons sit
+        # next to each other and the slider, so sliding off a neighbor must not undo or redo)
+        self.guarded_actions = {"undo", "redo"}
+
+        # Gesture state machines of every hand, and actions fired when a hand with its cursor off enters a gesture
+        self.gestures = GestureEngine(default_gestures(), max_missing=max_missing)
+        self.gesture_actions = {"pinch": self.undo,
+                                "fist": self.clear}
+
+        # Setting up empty canvas for drawings and the vector strokes it is rendered from
+        self.infinite = infinite
+        if infinite:
+            self.canvas = TiledCanvas((self.sketchpad.pos[0], self.sketchpad.pos[1],
+                                       self.sketchpad.pos[0] + self.sketchpad.size[0],
+                                       self.sketchpad.pos[1] + self.sketchpad.size[1]))
+        else:
+            self.canvas = Canvas(width, height)
+        self.strokes = StrokeStore()
 
-        # Hand detection, position update, and extended finger check
-        hand_tracker.detect_hands(frame)
-        hand_landmark_pos = hand_tracker.get_pos()
-        extended_fingers = hand_tracker.get_extended_fingers()
-        extended_ind = np.where(np.array(extended_fingers))[0]
+        # Undo/redo history of canvas tiles (sharing the tiles of a tiled canvas)
+        if infinite:
+            self.history = TileHistory(self.canvas, tile_size=self.canvas.tile_size)
+        else:
+            self.history = TileHistory(self.canvas)
 
-        # Toggle for turning cursor on/off using thumb
-        if 0 in extended_ind and not prev_thumb_state:
+        # Cursor size and slider position shown on the slider (of the hand that last used it)
+        self.cursor_size = self.cursor_sizes[0]
+        self.slider_x = self.slider_cols[0]
 
-            # Change cursor state and update previous thumb state
-            cursor_on = not cursor_on
-            prev_thumb_state = True
+        # Drawing state of each hand keyed by track id
+        self.hand_states = {}
+        self.max_missing = max_missing
+        self.update_count = 0
 
-        elif 0 in extended_ind:
+        # Autosave of strokes and canvas
+        self.session = session
 
-            # Update previous thumb state
-            prev_thumb_state = True
+        # Server streaming canvas deltas to remote viewers (set once the canvas exists, None to disable)
+        self.broadcaster = None
 
-        else:
+        # Background video recorder of rendered frames or the canvas alone (None to disable)
+        self.recorder = None
 
-            # Update previous thumb state
-            prev_thumb_state = False
+        # Initial condition for exiting
+        self.exit = False
 
-        # Case if cursor is on
-        if cursor_on:
+        # Pre-rendered UI overlay covering the toolbar band (plus room for borders)
+        ui_height = max(region.pos[0] + region.size[0] for region in self.buttons + [self.slider]) + 4
+        self.ui_layer = UILayer(width, ui_height)
 
-            # Add text to frame if cursor is on
-            text_size = cv2.getTextSize("Cursor On", cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)
-            text_pos = (int(1280 - text_size[0][0]), int(720 - text_size[0][1]))
-            cv2.putText(frame, "Cursor On", text_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        # Text sizes scaled to the display
+        self.font_scale = self.config.font_scale(0.8)
+        self.small_font_scale = self.config.font_scale(0.5)
+        self.text_thickness = self.config.length(2)
 
-            # Loop through extended fingers and draw
-            for i in extended_ind:
+        # Measuring "Cursor On" text once
+        text_size = cv2.getTextSize("Cursor On", cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, self.text_thickness)
+        self.cursor_text_pos = (int(width - text_size[0][0]), int(height - text_size[0][1]))
 
-                # Get fingertip position of extended finger
-                pos = hand_landmark_pos[4 * (i + 1)]
+        # Status shown in the bottom left corner (e.g. while hand tracking loads; None for nothing)
+        self.status_text = None
+        self.status_text_pos = (self.config.cols(10), int(height - text_size[0][1]))
 
-                # Check if drawing should occur
-                if i != 0 and sketchpad.contains(pos) and sketchpad.contains(prev_pos_list[i - 1]) and (prev_pos_list[i - 1] != (0, 0)):
+    def build_ui_layer(self, key):
+        """
+        Rebuilds the UI overlay (buttons, borders, and slider).
 
-                    # Draw line between current and previous fingertip positions
-                    cv2.line(sketch_img,
-                             (prev_pos_list[i - 1][1], prev_pos_list[i - 1][0]),
-                             (pos[1], pos[0]),
-                             current_color,
-                             cursor_size)
+        Parameters:
+            key (hashable): Description of the UI state being drawn.
+        """
 
-        # Check for button presses and update previous landmark positions (only executes if hand landmarks have been detected)
-        if hand_landmark_pos:
+        self.ui_layer.clear()
 
-            # Loop through each fingertip index
-            for i in range(8, 20 + 1, 4):
+        # Draw buttons and white borders
+        for button in self.buttons:
+            self.ui_layer.add_region(button, font_scale=self.font_scale, thickness=self.text_thickness)
+            self.ui_layer.add_outline(button, (255, 255, 255), self.config.length(2))
 
-                # Current fingertip position
-                pos = hand_landmark_pos[i]
+        # Draw cyan border around the selected color button of each hand
+        for j in key[0]:
+            self.ui_layer.add_outline(self.buttons[j], (255, 255, 0), self.config.length(6))
 
-                # Case for index finger
-                if i == 8:
+        # Draw slider region (Is currently transparent but can be adjusted)
+        self.ui_layer.add_region(self.slider)
 
-                    # Loop through each button in list
-                    for j in range(0, 10):
+        # Draw undo and redo buttons
+        for button in self.history_buttons:
+            self.ui_layer.add_region(button, font_scale=self.small_font_scale, thickness=1)
+            self.ui_layer.add_outline(button, (255, 255, 255), self.config.length(2))
 
-                        # Get current button
-                        button = buttons[j]
+        # Draw slider bar
+        self.ui_layer.add_rectangle((self.slider_cols[0], int(self.slider.pos[0] + self.slider.size[0] / 2 - 1)),
+                                    (self.slider_cols[1], int(self.slider.pos[0] + self.slider.size[0] / 2 + 1)),
+                                    (128, 128, 128),
+                                    -1)
 
-                        # Check if button is pressed
-                        if button.contains(pos) and not button.contains(prev_pos_list[int(i / 4) - 2]):
+        # Draw slider circle (same size as cursor)
+        self.ui_layer.add_circle((self.slider_x, int(self.slider.pos[0] + self.slider.size[0] / 2)),
+                                 int(self.cursor_size / 2),
+                                 (255, 255, 255),
+                                 -1)
 
-                            # Clear drawing if clear button is pressed
-                            if j == 8:
-                                sketch_img = np.zeros((720, 1280, 3), dtype=np.uint8)
-                                continue
+        # Add text to slider region
+        slider_text_size = cv2.getTextSize("Cursor Size", cv2.FONT_HERSHEY_SIMPLEX, self.font_scale,
+                                           self.text_thickness)
+        slider_text_pos = (int(self.slider.pos[1] + self.slider.size[1] / 2 - slider_text_size[0][0] / 2),
+                           int(self.slider.pos[0] + slider_text_size[0][1] + self.config.rows(5)))
+        self.ui_layer.add_text("Cursor Size", slider_text_pos, (255, 255, 255), font_scale=self.font_scale,
+                               thickness=self.text_thickness)
+
+        self.ui_layer.finish(key)
+
+    def get_hand_states(self, track_ids):
+        """
+        Looks up the state of each hand, creating state for new hands and
+        dropping state of hands that have not been seen for a while.
+
+        Parameters:
+            track_ids (list of ints): The track id of each hand.
+
+        Returns:
+            (list of HandStates): The state of each hand.
+        """
+
+        self.update_count += 1
+
+        # Creating or updating state of each visible hand
+        states = []
+        for track_id in track_ids:
+            if track_id not in self.hand_states:
+                self.hand_states[track_id] = HandState(self.buttons[5], self.cursor_sizes[0], self.slider_cols[0])
+            state = self.hand_states[track_id]
+            state.last_seen = self.update_count
+            states.append(state)
+
+        # Dropping state of hands that are gone
+        for track_id in list(self.hand_states):
+            if self.update_count - self.hand_states[track_id].last_seen > self.max_missing:
+                del self.hand_states[track_id]
+
+        return states
+
+    def update(self, pos_array, extended_array, track_ids):
+        """
+        Applies one frame of hand tracking output to the sketchpad state.
+
+        Handles gestures, drawing, button presses, and the slider for every
+        hand. Gestures are evaluated for all hands at once and all strokes of
+        the same color and size are drawn in one call.
+
+        Parameters:
+            pos_array (3d numpy array): The (n_hands, 21, 2) row, col position
+                                        of each hand landmark in capture
+                                        pixels.
+            extended_array (2d numpy array): The (n_hands, 5) bools
+                                             representing whether or not each
+                                             finger is extended (None to
+                                             classify them from the gesture
+                                             features).
+            track_ids (list of ints): The track id of each hand.
+        """
+
+        states = self.get_hand_states(track_ids)
+
+        # Advance the gesture state machines (features are computed on capture pixels, before scaling)
+        with PROFILER.stage("sketchpad.gestures"):
+            gestures = self.gestures.update(track_ids, pos_array, extended_array)
+        extended_array = gestures.extended_array
+
+        # Periodically hand changed canvas rows to the autosave, and send keyframes viewers asked for
+        if self.session is not None:
+            self.session.maybe_snapshot(self.canvas)
+        if self.broadcaster is not None:
+            self.broadcaster.poll()
+
+        # Landmarks in display pixels (the layout and canvas use the display resolution)
+        pos_array = self.config.to_display(pos_array)
+
+        # Case for no hands
+        if not states:
+            return
+
+        # Toggle for turning cursor on/off using thumb (when a hand enters the toggle gesture)
+        for h in np.flatnonzero(gestures.started("toggle")):
+            states[h].cursor_on = not states[h].cursor_on
+        cursor_on = np.array([state.cursor_on for state in states])
+
+        # Actions of gestures entered by hands with their cursor off (so drawing never fires them)
+        for name, action in self.gesture_actions.items():
+            for h in np.flatnonzero(gestures.started(name) & ~cursor_on):
+                action(None, states[h], None)
+
+        # Current and previous fingertip positions of index, middle, ring, and pinky fingers
+        tips = pos_array[:, TIP_INDICES[1:]]
+        prev_tips = np.stack([state.prev_tips for state in states])
+
+        # Check where drawing should occur for every finger of every hand at once
+        draw = (cursor_on[:, None] & extended_array[:, 1:] &
+                self.sketchpad.contains_array(tips) &
+                self.sketchpad.contains_array(prev_tips) &
+                prev_tips.any(axis=2))
+
+        # Pan and zoom the view of an infinite canvas
+        if self.infinite:
+            self.update_view(states, pos_array, gestures.active("pan"), tips, cursor_on)
+
+        # Segment ends in canvas x, y coordinates (world coordinates on an infinite canvas)
+        starts = prev_tips[..., ::-1]
+        ends = tips[..., ::-1]
+        if self.infinite:
+            starts = self.canvas.screen_to_world(starts)
+            ends = self.canvas.screen_to_world(ends)
+
+        # Store line segments between previous and current fingertip positions as vector strokes (a still
+        # fingertip keeps its stroke going without adding segments)
+        now = time.time()
+        drawing_keys = set()
+        for h, f in zip(*np.nonzero(draw)):
+            state = states[h]
+            width = int(state.cursor_size)
+            if self.infinite:
+                width = max(1, int(round(width / self.canvas.zoom)))
+            self.strokes.add_segment(track_ids[h], int(f),
+                                     tuple(starts[h, f].tolist()),
+                                     tuple(ends[h, f].tolist()),
+                                     state.current_color,
+                                     width,
+                                     now)
+            drawing_keys.add((track_ids[h], int(f)))
+        self.strokes.end_strokes(drawing_keys)
+
+        # Snapshot tiles under new segments into the undo entry (one entry per continuous drawing gesture)
+        if drawing_keys:
+            self.history.begin({"type": "draw", "start": self.strokes.rasterized})
+            self.history.snapshot_lines(*self.strokes.pending_lines())
+            self.history.info()["end"] = self.strokes.n_segments
+        else:
+            self.history.commit()
+
+        # Draw only the new segments (one call per run of the same color and size)
+        self.strokes.rasterize_new(self.canvas)
+
+        # Append new segments to the autosave log and send them to viewers
+        if self.session is not None:
+            self.session.log_segments(self.strokes)
+        if self.broadcaster is not None:
+            self.broadcaster.send_segments(self.strokes)
+
+        # Check for button presses with the index fingertip of each hand
+        with PROFILER.stage("sketchpad.buttons"):
+            self.update_buttons(states, tips, prev_tips)
+
+        # Update previous fingertip positions
+        for state, hand_tips in zip(states, tips):
+            state.prev_tips[:] = hand_tips
+
+    def update_view(self, states, pos_array, panning, tips, cursor_on):
+        """
+        Pans and zooms the infinite canvas with a two-finger gesture.
+
+        A hand with its cursor off in the pan gesture (only the index and
+        middle fingers extended, thumb ignored) over the sketchpad drags the
+        view. With two such hands, the change in distance between them zooms
+        about their midpoint.
+
+        Parameters:
+            states (list of HandStates): The state of each hand.
+            pos_array (3d numpy array): The (n_hands, 21, 2) row, col position
+                                        of each hand landmark.
+            panning (1d numpy array): Whether or not each hand is in the pan
+                                      gesture.
+            tips (3d numpy array): The (n_hands, 4, 2) current fingertip
+                                   positions.
+            cursor_on (1d numpy array): Whether or not each hand's cursor is on.
+        """
+
+        # Hands in the pan pose and the x, y point between their index and middle fingertips
+        pose = ~cursor_on & panning & self.sketchpad.contains_array(tips[:, 0])
+        centers = pos_array[:, TIP_INDICES[1:3]].mean(axis=1)[:, ::-1]
+
+        # Hands that were already panning last frame
+        moving = [h for h in np.flatnonzero(pose) if states[h].pan_center is not None]
+
+        # Two hands zoom about their midpoint, one hand drags
+        if len(moving) >= 2:
+            a, b = moving[:2]
+            prev_dist = np.linalg.norm(states[a].pan_center - states[b].pan_center)
+            dist = np.linalg.norm(centers[a] - centers[b])
+            factor = dist / prev_dist if prev_dist > 1.0 else 1.0
+            self.canvas.pan_zoom((states[a].pan_center + states[b].pan_center) / 2,
+                                 (centers[a] + centers[b]) / 2, factor)
+        elif moving:
+            self.canvas.pan_zoom(states[moving[0]].pan_center, centers[moving[0]])
+
+        # Remember pan positions for the next frame
+        for state, in_pose, center in zip(states, pose, centers):
+            state.pan_center = center if in_pose else None
+
+    def update_buttons(self, states, tips, prev_tips):
+        """
+        Handles button presses and the slider for every hand.
+
+        Parameters:
+            states (list of HandStates): The state of each hand.
+            tips (3d numpy array): The (n_hands, 4, 2) current fingertip
+                                   positions.
+            prev_tips (3d numpy array): The (n_hands, 4, 2) previous fingertip
+                                        positions.
+        """
+
+        # Look up the controls under the current and previous index fingertips of all hands
+        labels = self.layout.lookup(tips[:, 0])
+        prev_labels = self.layout.lookup(prev_tips[:, 0])
+
+        for h, state in enumerate(states):
+
+            # Case for no control under the fingertip
+            control = self.layout.control(labels[h])
+            if control is None:
+                continue
+
+            # Guarded buttons only fire when entered from outside every control
+            if control.action in self.guarded_actions and self.layout.control(prev_labels[h]) is not None:
+                continue
+
+            # Buttons fire when the fingertip enters them, continuous controls on every frame
+            if labels[h] != prev_labels[h] or control.action in self.continuous_actions:
+                self.actions[control.action](control, state, tuple(tips[h, 0].tolist()))
+
+            # Exit loop if exit variable has been updated
+            if self.exit:
+                break
+
+    def select_color(self, control, state, pos):
+        """
+        Selects the color of a color button.
+
+        Parameters:
+            control (Region): The pressed button.
+            state (HandState): The state of the hand that pressed it.
+            pos (tuple of ints): The row, col position of the fingertip.
+        """
+        state.current_color_button = control
+        state.current_color = control.color
+
+    def select_eraser(self, control, state, pos):
+        """
+        Selects the eraser (draws black, which removes ink).
+
+        Parameters:
+            control (Region): The pressed button.
+            state (HandState): The state of the hand that pressed it.
+            pos (tuple of ints): The row, col position of the fingertip.
+        """
+        state.current_color_button = control
+        state.current_color = (0, 0, 0)
+
+    def clear(self, control=None, state=None, pos=None):
+        """
+        Clears all drawings.
+
+        Parameters:
+            control (Region): The pressed button.
+            state (HandState): The state of the hand that pressed it.
+            pos (tuple of ints): The row, col position of the fingertip.
+        """
+
+        # Clearing is its own undo entry holding every tile with ink
+        self.history.commit()
+        self.history.begin({"type": "clear", "at": self.strokes.n_segments})
+        self.history.snapshot_ink()
+        self.strokes.clear()
+        self.canvas.clear()
+        self.history.commit()
+        if self.session is not None:
+            self.session.log_segments(self.strokes)
+            self.session.log_event(CLEAR, self.strokes.n_segments)
+        if self.broadcaster is not None:
+            self.broadcaster.send_segments(self.strokes)
+            self.broadcaster.send_clear()
+
+    def undo(self, control=None, state=None, pos=None):
+        """
+        Undoes the last drawing gesture or clear.
+
+        Parameters:
+            control (Region): The pressed button.
+            state (HandState): The state of the hand that pressed it.
+            pos (tuple of ints): The row, col position of the fingertip.
+        """
+        info = self.history.undo()
+
+        # Keep the vector strokes in step with the canvas
+        if info is None:
+            return
+        if info["type"] == "draw":
+            self.strokes.set_hidden(info["start"], info["end"], True)
+        else:
+            self.strokes.clears.pop()
+        self.strokes.end_strokes(set())
+        if self.session is not None:
+            if info["type"] == "draw":
+                self.session.log_event(HIDE, info["start"], info["end"])
+            else:
+                self.session.log_event(UNDO_CLEAR)
+        if self.broadcaster is not None:
+            self.broadcaster.send_tiles(self.history.swapped, self.history.tile_size)
+
+    def redo(self, control=None, state=None, pos=None):
+        """
+        Redoes the last undone drawing gesture or clear.
+
+        Parameters:
+            control (Region): The pressed button.
+            state (HandState): The state of the hand that pressed it.
+            pos (tuple of ints): The row, col position of the fingertip.
+        """
+        info = self.history.redo()
+
+        # Keep the vector strokes in step with the canvas
+        if info is None:
+            return
+        if info["type"] == "draw":
+            self.strokes.set_hidden(info["start"], info["end"], False)
+        else:
+            self.strokes.clears.append(info["at"])
+        self.strokes.end_strokes(set())
+        if self.session is not None:
+            if info["type"] == "draw":
+                self.session.log_event(SHOW, info["start"], info["end"])
+            else:
+                self.session.log_event(REDO_CLEAR, info["at"])
+        if self.broadcaster is not None:
+            self.broadcaster.send_tiles(self.history.swapped, self.history.tile_size)
+
+    def request_exit(self, control=None, state=None, pos=None):
+        """
+        Sets the exit variable so the main loop stops.
+
+        Parameters:
+            control (Region): The pressed button.
+            state (HandState): The state of the hand that pressed it.
+            pos (tuple of ints): The row, col position of the fingertip.
+        """
+        self.exit = True
+
+    def move_slider(self, control, state, pos):
+        """
+        Adjusts the cursor size of a hand from its fingertip position on the
+        slider.
+
+        Parameters:
+            control (Region): The slider.
+            state (HandState): The state of the hand on the slider.
+            pos (tuple of ints): The row, col position of the fingertip.
+        """
+        state.cursor_size, state.slider_x = slider_map(pos, *self.slider_cols, *self.cursor_sizes)
+        self.cursor_size, self.slider_x = state.cursor_size, state.slider_x
+
+    def render(self, frame):
+        """
+        Draws the UI and the drawings onto a frame.
+
+        Parameters:
+            frame (3d numpy array): The webcam frame to draw on.
+
+        Returns:
+            (3d numpy array): The frame with UI and drawings added (a
+                              preallocated display frame if the webcam frame
+                              had to be resized).
+        """
+
+        # Scale the frame to the display resolution
+        frame = self.config.to_display_frame(frame)
+
+        # Add text to frame if cursor is on for any hand
+        if any(state.cursor_on for state in self.hand_states.values()):
+            cv2.putText(frame, "Cursor On", self.cursor_text_pos, cv2.FONT_HERSHEY_SIMPLEX, self.font_scale,
+                        (0, 255, 0), self.text_thickness)
+
+        # Add status text
+        if self.status_text is not None:
+            cv2.putText(frame, self.status_text, self.status_text_pos, cv2.FONT_HERSHEY_SIMPLEX, self.font_scale,
+                        (0, 255, 255), self.text_thickness)
+
+        # Rebuild the UI overlay if the selected button or slider changed, then blend it in one pass
+        selected = {self.buttons.index(state.current_color_button) for state in self.hand_states.values()}
+        ui_key = (tuple(sorted(selected or {5})), self.slider_x, self.cursor_size)
+        with PROFILER.stage("sketchpad.ui"):
+            if self.ui_layer.needs_rebuild(ui_key):
+                self.build_ui_layer(ui_key)
+            self.ui_layer.apply(frame)
+
+        # Add drawings to frame (masked copy in place)
+        with PROFILER.stage("sketchpad.composite"):
+            self.canvas.composite(frame)
+
+        # Hand the frame (or the canvas alone) to the recorder thread
+        if self.recorder is not None:
+            self.recorder.submit(frame, self.canvas)
+
+        return frame
+
+
+def run_sequential(cap, hand_tracker, sketchpad, window_name='Interactive Sketchpad'):
+    """
+    Runs the sketchpad with capture, inference, and rendering one after
+    another on the calling thread.
 
-                            # Set exit variable to true if exit button is pressed
-                            if j == 9:
-                                exit = True
-                                break
+    Parameters:
+        cap (cv2.VideoCapture): The opened webcam stream.
+        hand_tracker (HandTracker): The tracker used for inference.
+        sketchpad (Sketchpad): The sketchpad state to update and render.
+        window_name (str): Name of the display window.
 
-                            # Update current color button
-                            current_color_button = button
+    Returns:
+        (LatencyStats): Capture-to-display latency samples.
+    """
 
-                            # Change color to black if eraser button is pressed
-                            if j == 7:
-                                current_color = (0, 0, 0)
+    latency = LatencyStats()
 
-                            # Update color for all other buttons
-                            else:
-                                current_color = current_color_button.color
+    # Loop for running the sketchpad
+    while cap.isOpened():
 
-                    # Check if fingertip is in slider region and update if so       
-                    if slider.contains(pos):
-                        cursor_size, slider_x = slider_map(pos)
+        # Read a frame from the webcam; end the loop if frame is not returned
+        with PROFILER.stage("main.capture"):
+            success, frame = cap.read()
+        if not success:
+            print("Empty camera frame.")
+            break
+        capture_time = time.perf_counter()
 
-                # Exit loop if exit variable has been updated
-                if exit:
-                    break
+        # Flip the frame horizontally for mirror view
+        frame = cv2.flip(frame, 1)
 
-                # Update previous fingertip positions
-                prev_pos_list[int(i / 4) - 2] = pos
+        # Hand detection, position update, and track assignment for all hands
+        with PROFILER.stage("main.inference"):
+            pos_array, track_ids = hand_tracker.track(frame, t=capture_time)
 
-        # Draw buttons and white borders
-        for button in buttons:
-            button.draw(frame)
-            cv2.rectangle(frame,
-                          (button.pos[1], button.pos[0]),
-                          (button.pos[1] + button.size[1], button.pos[0] + button.size[0]),
-                          (255, 255, 255),
-                          2)
-
-        # Draw cyan border around button for selected color
-        cv2.rectangle(frame,
-                      (current_color_button.pos[1], current_color_button.pos[0]),
-                      (current_color_button.pos[1] + current_color_button.size[1], current_color_button.pos[0] + current_color_button.size[0]),
-                      (255, 255, 0),
-                      6)
+        # Drawing keeps working without hands while the hand model loads
+        sketchpad.status_text = hand_tracker.status()
 
-        # Draw slider region (Is currently transparent but can be adjusted)
-        slider.draw(frame)
+        # Update sketchpad state (extended fingers come from the gesture features), then draw UI and drawings
+        with PROFILER.stage("main.update"):
+            sketchpad.update(pos_array, None, track_ids)
+        with PROFILER.stage("main.render"):
+            frame = sketchpad.render(frame)
 
-        # Draw slider bar
-        cv2.rectangle(frame,
-                      (slider.pos[1] + 60, int(slider.pos[0] + slider.size[0] / 2 - 1)),
-                      (slider.pos[1] + slider.size[1] - 60, int(slider.pos[0] + slider.size[0] / 2 + 1)),
-                      (128, 128, 128),
-                      -1)
+        # Draw profiling HUD and periodically log timings
+        if PROFILER.hud:
+            PROFILER.draw_hud(frame)
+        PROFILER.maybe_dump()
 
-        # Draw slider circle (same size as cursor)
-        cv2.circle(frame,
-                   (slider_x, int(slider.pos[0] + slider.size[0] / 2)),
-                   int(cursor_size / 2),
-                   (255, 255, 255),
-                   -1)
+        # Show the image and record capture-to-display latency
+        with PROFILER.stage("main.display"):
+            cv2.imshow(window_name, frame)
+            key = cv2.waitKey(1)
+        latency.add(time.perf_counter() - capture_time)
+        STARTUP.mark_once("first_frame_shown")
 
-        # Add text to slider region
-        slider_text_size = cv2.getTextSize("Cursor Size", cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)
-        slider_text_pos = (int(slider.pos[1] + slider.size[1] / 2 - slider_text_size[0][0] / 2),
-                    int(slider.pos[0] + slider_text_size[0][1] + 5))
-        cv2.putText(frame, "Cursor Size", slider_text_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        # Case for exiting loop
+        if key == ord('q') or sketchpad.exit:
+            break
 
-        # Convert drawings array to grayscale
-        sketch_img_gray = cv2.cvtColor(sketch_img, cv2.COLOR_BGR2GRAY)
+    return latency
 
-        # Find image inverse
-        _, inv_img = cv2.threshold(sketch_img_gray, 0, 255, cv2.THRESH_BINARY_INV)
 
-        # Convert inverse image to bgr
-        inv_img = cv2.cvtColor(inv_img, cv2.COLOR_GRAY2BGR)
+def main(pipelined=False, max_hands=2, profile=False, profile_log=None, roi_mode=False, target_latency=None,
+         smoothing=False, detect_every=1, adaptive_skip=False, infinite=False, capture_size=(1280, 720),
+         display_size=None, session_dir=None, resume=False, new_session=False, broadcast_port=None, cameras=(0,),
+         fast_start=False,
+         record_path=None, record_mode=RECORD_FRAME, record_fps=30.0, record_drop=DROP_OLDEST):
+    """
+    Main function that launches the interactive sketchpad.
 
-        # Add drawings to frame
-        frame = cv2.bitwise_and(frame, inv_img)
-        frame = cv2.bitwise_or(frame, sketch_img)
+    Captures video from the webcam, tracks hand gestures using MediaPipe,
+    and allows drawing on a virtual canvas.
 
-        # Show the image
-        cv2.imshow('Interactive Sketchpad', frame)
+    Parameters:
+        pipelined (bool): Whether or not to run capture, inference, and
+                          rendering on separate threads.
+        max_hands (int): The max number of hands that can draw at a time.
+        profile (bool): Whether or not to time each stage and show the
+                        timings on screen.
+        profile_log (str): JSON lines file that stage timings are
+                           periodically appended to (None to disable).
+        roi_mode (bool): Whether or not to run hand inference on a crop
+                         around the last known hands.
+        target_latency (float): Hand inference time budget in seconds that
+                                the inference resolution adapts to (None for
+                                full resolution).
+        smoothing (bool): Whether or not to One-Euro filter hand landmarks.
+        detect_every (int): Run hand detection every Nth frame and predict
+                            landmarks in between.
+        adaptive_skip (bool): Whether or not to detect more often when hands
+                              move fast.
+        infinite (bool): Whether or not to draw on an unbounded canvas that
+                         can be panned and zoomed.
+        capture_size (tuple of ints): The requested webcam width, height
+                                      (hand inference runs at this size).
+        display_size (tuple of ints): The width, height the UI is rendered at
+                                      (None for the capture size).
+        session_dir (str): Directory the drawing is autosaved to (None to
+                           disable autosave).
+        resume (bool): Whether or not to continue the drawing saved in
+                       session_dir.
+        new_session (bool): Whether or not to start a new drawing in a
+                            session_dir that already holds one (its files are
+                            kept as .bak files). Without it or resume, an
+                            existing session is never touched.
+        broadcast_port (int): Port that canvas deltas are streamed to remote
+                              viewers on (None to disable).
+        cameras (tuple of ints): The camera indices. With more than one,
+                                 every camera is tracked in its own process
+                                 and all hands draw on the first camera's
+                                 canvas.
+        fast_start (bool): Whether or not to open the camera and window
+                           right away and load the hand model on a
+                           background thread.
+        record_path (str): Video file the session is recorded to (None to
+                           disable recording).
+        record_mode (str): RECORD_FRAME to record the composited frames or
+                           RECORD_CANVAS to record the drawings alone.
+        record_fps (float): The frame rate stored in the recording.
+        record_drop (str): What to drop when the encoder falls behind (one
+                           of DROP_POLICIES).
+    """
 
-        # Case for exiting loop
-        if cv2.waitKey(1) == ord('q') or exit:
-            break
+    # Timing each phase of startup
+    STARTUP.reset()
+
+    # Refusing to overwrite a saved session (e.g. rerunning the same command after a crash)
+    session = Session(session_dir) if session_dir else None
+    if session is not None and not resume and not new_session and session.has_saved():
+        print("{} already holds a saved session. Use --resume to continue it or --new-session to start over "
+              "(the old files are kept as .bak files).".format(session_dir))
+        return
+
+    # Enabling per-stage profiling if requested
+    if profile or profile_log:
+        PROFILER.configure(enabled=True, hud=profile, log_path=profile_log)
+
+    # Set up webcam feeds and derive the layout from the resolution the first one delivers
+    caps = [cv2.VideoCapture(camera) for camera in cameras]
+    config = ScreenConfig.from_capture(caps[0], capture_size, display_size)
+    for cap in caps[1:]:
+        ScreenConfig.from_capture(cap, capture_size)
+    STARTUP.mark("open_cameras")
+
+    # Defining HandTracker (one per camera process with several cameras) and Sketchpad objects
+    tracker_kwargs = {"max_hands": max_hands, "roi_mode": roi_mode, "target_latency": target_latency,
+                      "smoothing": smoothing, "detect_every": detect_every, "adaptive_skip": adaptive_skip,
+                      "lazy": fast_start}
+    if len(caps) > 1:
+        multicam = MultiCamera(caps, tracker_kwargs)
+    else:
+        hand_tracker = HandTracker(**tracker_kwargs)
+    STARTUP.mark("create_tracker")
+    sketchpad = Sketchpad(infinite=infinite, config=config, session=session)
+    STARTUP.mark("create_sketchpad")
+
+    # Restore or start the autosaved drawing
+    if session is not None:
+        if resume:
+            start = time.perf_counter()
+            drawn = session.resume(sketchpad)
+            print("Resumed {} log records ({} redrawn) in {:.1f} ms"
+                  .format(session.n_records, drawn, (time.perf_counter() - start) * 1000.0))
+        else:
+            session.reset()
+        session.start()
+        STARTUP.mark("session")
+
+    # Shut everything down even if startup or the loop fails, so the autosave gets its final snapshot
+    try:
+
+        # Stream canvas deltas to remote viewers
+        if broadcast_port is not None:
+            broadcaster = BroadcastServer(sketchpad.canvas, host="0.0.0.0", port=broadcast_port)
+            broadcaster.start()
+            sketchpad.broadcaster = broadcaster
+            print("Broadcasting canvas on port {}".format(sketchpad.broadcaster.port))
+
+        # Record the session on a background encoder thread
+        if record_path is not None:
+            sketchpad.recorder = VideoRecorder(record_path, (config.width, config.height), fps=record_fps,
+                                               mode=record_mode, drop_policy=record_drop)
+            sketchpad.recorder.start()
+
+        STARTUP.mark("start_services")
+
+        # Run the sketchpad loop
+        if len(caps) > 1:
+            multicam.start()
+            latency = run_multicam(multicam, sketchpad)
+        elif pipelined:
+            latency = run_pipelined(caps[0], hand_tracker, sketchpad)
+        else:
+            latency = run_sequential(caps[0], hand_tracker, sketchpad)
+
+        # Report startup phases (including the hand model's own phases) and capture-to-display latency
+        if len(caps) == 1:
+            for name, seconds in hand_tracker.startup_timings.items():
+                STARTUP.record("tracker." + name, seconds)
+        print(STARTUP.report())
+        if profile_log:
+            STARTUP.dump(profile_log)
+        stats = latency.summary()
+        if stats:
+            print("Capture-to-display latency: p50 {:.1f} ms, p95 {:.1f} ms, max {:.1f} ms"
+                  .format(stats["p50"], stats["p95"], stats["max"]))
+
+    # Cleanup for camera workers, webcam streams, autosave, broadcast, recording, and profiling log
+    finally:
+        if len(caps) > 1:
+            multicam.stop()
+        for cap in caps:
+            cap.release()
+        cv2.destroyAllWindows()
+        if session is not None:
+            session.close(sketchpad.canvas)
+        if sketchpad.broadcaster is not None:
+            sketchpad.broadcaster.stop()
+        if sketchpad.recorder is not None:
+            sketchpad.recorder.stop()
+            stats = sketchpad.recorder.stats()
+            print("Recorded {} frames to {} ({} dropped, max queue depth {})"
+                  .format(stats["written"], record_path, stats["dropped"], stats["max_depth"]))
+        PROFILER.close()
+
+
+def parse_args():
+    """
+    Parses command line arguments.
 
-    # Cleanup for webcam stream
-    cap.release()
-    cv2.destroyAllWindows()
+    Returns:
+        (argparse.Namespace): The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Interactive Sketchpad")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="run capture, inference, and rendering on separate threads")
+    parser.add_argument("--max-hands", type=int, default=2,
+                        help="max number of hands that can draw at a time")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each stage and show the timings on screen")
+    parser.add_argument("--profile-log",
+                        help="periodically append stage timings to this JSON lines file")
+    parser.add_argument("--roi", action="store_true",
+                        help="run hand inference on a crop around the last known hands")
+    parser.add_argument("--target-latency", type=float,
+                        help="hand inference budget in milliseconds; inference resolution adapts to it")
+    parser.add_argument("--smooth", action="store_true",
+                        help="filter hand landmarks to reduce jitter")
+    parser.add_argument("--detect-every", type=int, default=1,
+                        help="run hand detection every Nth frame and predict landmarks in between")
+    parser.add_argument("--adaptive-skip", action="store_true",
+                        help="detect more often when hands move fast (with --detect-every)")
+    parser.add_argument("--infinite", action="store_true",
+                        help="draw on an unbounded canvas panned and zoomed with two fingers")
+    parser.add_argument("--session",
+                        help="directory the drawing is autosaved to")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the drawing autosaved in --session")
+    parser.add_argument("--new-session", action="store_true",
+                        help="start a new drawing even if --session holds one (its files are kept as .bak)")
+    parser.add_argument("--broadcast", type=int, metavar="PORT",
+                        help="stream canvas deltas to remote viewers (see viewer.py) on this port")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[0],
+                        help="camera indices; with several, each is tracked in its own process onto one canvas")
+    parser.add_argument("--fast-start", action="store_true",
+                        help="open the camera and window immediately and load hand tracking in the background")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record the session to this video file on a background thread")
+    parser.add_argument("--record-mode", choices=(RECORD_FRAME, RECORD_CANVAS), default=RECORD_FRAME,
+                        help="record the composited frames or the drawings alone")
+    parser.add_argument("--record-fps", type=float, default=30.0,
+                        help="frame rate stored in the recording")
+    parser.add_argument("--record-drop", choices=DROP_POLICIES, default=DROP_OLDEST,
+                        help="what to do when the encoder falls behind: overwrite the oldest queued frame, "
+                             "drop the new frame, or block the render loop")
+    parser.add_argument("--capture-size", type=parse_size, default=(1280, 720),
+                        help="webcam resolution that hand tracking runs at, e.g. 640x480")
+    parser.add_argument("--display-size", type=parse_size,
+                        help="resolution the UI is rendered at (defaults to the capture resolution)")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(pipelined=args.pipelined, max_hands=args.max_hands,
+         profile=args.profile, profile_log=args.profile_log, roi_mode=args.roi,
+         target_latency=args.target_latency / 1000.0 if args.target_latency else None,
+         smoothing=args.smooth, detect_every=args.detect_every, adaptive_skip=args.adaptive_skip,
+         infinite=args.infinite, capture_size=args.capture_size, display_size=args.display_size,
+         session_dir=args.session, resume=args.resume, new_session=args.new_session,
+         broadcast_port=args.broadcast, cameras=tuple(args.cameras), fast_start=args.fast_start,
+         record_path=args.record, record_mode=args.record_mode, record_fps=args.record_fps,
+         record_drop=args.record_drop)
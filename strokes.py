@@ -0,0 +1,332 @@
+import numpy as np
+from canvas import Canvas
+
+
+class StrokeStore:
+    """Class storing drawings as vector strokes in append-only arrays.
+
+    Every drawn line segment is appended with the stroke it belongs to. A
+    stroke is a chain of segments drawn by one finger of one hand with one
+    color and width. Only segments added since the last call to
+    rasterize_new are drawn onto the canvas, and the whole drawing can be
+    re-rendered at any resolution.
+    """
+
+    def __init__(self, capacity=4096):
+        """
+        Initializes a StrokeStore object.
+
+        Parameters:
+            capacity (int): The initial number of segments and strokes the
+                            arrays have room for (they grow as needed).
+        """
+
+        # Segment arrays: x0, y0, x1, y1, owning stroke, time, and whether it was undone
+        self.segments = np.zeros((capacity, 4), dtype=np.int32)
+        self.segment_stroke = np.zeros(capacity, dtype=np.int32)
+        self.segment_time = np.zeros(capacity, dtype=np.float64)
+        self.segment_hidden = np.zeros(capacity, dtype=bool)
+        self.n_segments = 0
+
+        # Stroke arrays: color, width, hand (track id), style id, and start time
+        self.stroke_color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.stroke_width = np.zeros(capacity, dtype=np.int32)
+        self.stroke_hand = np.zeros(capacity, dtype=np.int64)
+        self.stroke_style = np.zeros(capacity, dtype=np.int32)
+        self.stroke_time = np.zeros(capacity, dtype=np.float64)
+        self.n_strokes = 0
+
+        # (color, width) -> style id, so segments can be grouped into runs of the same style
+        self.styles = {}
+
+        # (hand, finger) -> [stroke currently being drawn, x, y end of its last segment]
+        self.active = {}
+
+        # Segment counts at each clear, and number of segments already on the canvas
+        self.clears = []
+        self.rasterized = 0
+
+    def grow(self, name, size):
+        """
+        Doubles the capacity of an array attribute until it fits a size.
+
+        Parameters:
+            name (str): The attribute name.
+            size (int): The number of rows needed.
+        """
+        array = getattr(self, name)
+        if size <= len(array):
+            return
+        new_len = len(array)
+        while new_len < size:
+            new_len *= 2
+        grown = np.zeros((new_len,) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        setattr(self, name, grown)
+
+    def start_stroke(self, hand, color, width, t):
+        """
+        Starts a new stroke.
+
+        Parameters:
+            hand (int): The track id of the drawing hand.
+            color (tuple of ints): The bgr color code of the stroke.
+            width (int): The line thickness of the stroke.
+            t (float): The start time in seconds.
+
+        Returns:
+            (int): The stroke index.
+        """
+        for name in ("stroke_color", "stroke_width", "stroke_hand", "stroke_style", "stroke_time"):
+            self.grow(name, self.n_strokes + 1)
+
+        style = self.styles.setdefault((tuple(color), width), len(self.styles))
+
+        stroke = self.n_strokes
+        self.stroke_color[stroke] = color
+        self.stroke_width[stroke] = width
+        self.stroke_hand[stroke] = hand
+        self.stroke_style[stroke] = style
+        self.stroke_time[stroke] = t
+        self.n_strokes += 1
+
+        return stroke
+
+    def add_segment(self, hand, finger, pt1, pt2, color, width, t):
+        """
+        Appends a line segment, continuing the finger's current stroke if the
+        segment starts where it ended with the same color and width.
+
+        Parameters:
+            hand (int): The track id of the drawing hand.
+            finger (int): The finger index.
+            pt1 (tuple of ints): The x, y position of the segment start.
+            pt2 (tuple of ints): The x, y position of the segment end.
+            color (tuple of ints): The bgr color code of the segment.
+            width (int): The line thickness of the segment.
+            t (float): The time in seconds.
+
+        Returns:
+            (bool): Whether or not a segment was stored (a still fingertip
+                    continuing its stroke adds nothing).
+        """
+
+        # Continue or start a stroke
+        key = (hand, finger)
+        active = self.active.get(key)
+        if (active is None
+                or active[1] != tuple(pt1)
+                or self.stroke_width[active[0]] != width
+                or tuple(self.stroke_color[active[0]].tolist()) != tuple(color)):
+            active = [self.start_stroke(hand, color, width, t), None]
+            self.active[key] = active
+
+        # Case for a zero-length segment continuing a stroke (only the first one is kept, so a tap leaves a dot)
+        elif tuple(pt1) == tuple(pt2):
+            return False
+        stroke = active[0]
+        active[1] = tuple(pt2)
+
+        # Append the segment
+        for name in ("segments", "segment_stroke", "segment_time", "segment_hidden"):
+            self.grow(name, self.n_segments + 1)
+        self.segments[self.n_segments] = (pt1[0], pt1[1], pt2[0], pt2[1])
+        self.segment_stroke[self.n_segments] = stroke
+        self.segment_time[self.n_segments] = t
+        self.n_segments += 1
+
+        return True
+
+    def end_strokes(self, drawing_keys):
+        """
+        Ends the strokes of fingers that did not draw this frame.
+
+        Parameters:
+            drawing_keys (set of tuples): (hand, finger) of fingers that drew.
+        """
+        for key in list(self.active):
+            if key not in drawing_keys:
+                del self.active[key]
+
+    def clear(self):
+        """Records a clear. Earlier segments are kept but no longer rendered."""
+        self.clears.append(self.n_segments)
+        self.active = {}
+        self.rasterized = self.n_segments
+
+    def set_hidden(self, start, end, hidden):
+        """
+        Hides (undo) or shows (redo) a range of segments.
+
+        Parameters:
+            start (int): The first segment.
+            end (int): One past the last segment.
+            hidden (bool): Whether or not the segments are hidden.
+        """
+        self.segment_hidden[start:end] = hidden
+
+    def pending_lines(self):
+        """
+        Returns the segments that rasterize_new will draw next.
+
+        Returns:
+            (2d numpy array), (1d numpy array): The (n, 4) x0, y0, x1, y1 and
+                                                the line thickness of each
+                                                segment.
+        """
+        strokes = self.segment_stroke[self.rasterized:self.n_segments]
+        return self.segments[self.rasterized:self.n_segments], self.stroke_width[strokes]
+
+    def visible_start(self):
+        """
+        Finds the first segment after the last clear.
+
+        Returns:
+            (int): The segment index.
+        """
+        return self.clears[-1] if self.clears else 0
+
+    def style_runs(self, start, end, scale=1.0, shift=0):
+        """
+        Splits a range of segments into runs of the same color and width.
+
+        Parameters:
+            start (int): The first segment.
+            end (int): One past the last segment.
+            scale (float): Factor applied to all coordinates.
+            shift (int): Number of fractional bits of the returned coordinates.
+
+        Yields:
+            (tuple of ints), (int), (list of 2d numpy arrays): The color, the
+            width, and the (2, 2) x, y start and end of each segment of a run.
+        """
+
+        # Case for nothing to split
+        if end <= start:
+            return
+
+        # Segments in the range that were not undone
+        index = np.flatnonzero(~self.segment_hidden[start:end]) + start
+        if len(index) == 0:
+            return
+
+        # Style of each segment and the indices where it changes
+        strokes = self.segment_stroke[index]
+        styles = self.stroke_style[strokes]
+        bounds = np.concatenate(([0], np.flatnonzero(np.diff(styles)) + 1, [len(index)]))
+
+        # Segment coordinates (fixed point if shift is used)
+        lines = self.segments[index].reshape(-1, 2, 2)
+        if scale != 1.0 or shift:
+            lines = np.rint(lines * (scale * (1 << shift))).astype(np.int32)
+
+        for run_start, run_end in zip(bounds[:-1], bounds[1:]):
+            stroke = strokes[run_start]
+            color = tuple(self.stroke_color[stroke].tolist())
+            width = int(self.stroke_width[stroke])
+            yield color, width, list(lines[run_start:run_end])
+
+    def rasterize_new(self, canvas):
+        """
+        Draws the segments added since the last call onto a canvas.
+
+        Parameters:
+            canvas (Canvas): The canvas to draw on.
+        """
+        for color, width, lines in self.style_runs(self.rasterized, self.n_segments):
+            canvas.draw_segments(lines, color, width)
+        self.rasterized = self.n_segments
+
+    def rasterize(self, width, height, scale=1.0):
+        """
+        Renders everything drawn since the last clear onto a new canvas.
+
+        Parameters:
+            width (int): The canvas width in pixels.
+            height (int): The canvas height in pixels.
+            scale (float): Factor applied to coordinates and line widths
+                           (e.g. 2.0 to render at twice the resolution).
+
+        Returns:
+            (Canvas): The rendered canvas.
+        """
+        canvas = Canvas(width, height)
+        shift = 4 if scale != 1.0 else 0
+        for color, line_width, lines in self.style_runs(self.visible_start(), self.n_segments, scale, shift):
+            canvas.draw_segments(lines, color, max(1, int(round(line_width * scale))), shift)
+        return canvas
+
+    def save(self, path):
+        """
+        Saves all strokes and segments to an NPZ file.
+
+        Parameters:
+            path (str): The output path.
+        """
+        np.savez_compressed(path,
+                            segments=self.segments[:self.n_segments],
+                            segment_stroke=self.segment_stroke[:self.n_segments],
+                            segment_time=self.segment_time[:self.n_segments],
+                            segment_hidden=self.segment_hidden[:self.n_segments],
+                            stroke_color=self.stroke_color[:self.n_strokes],
+                            stroke_width=self.stroke_width[:self.n_strokes],
+                            stroke_hand=self.stroke_hand[:self.n_strokes],
+                            stroke_time=self.stroke_time[:self.n_strokes],
+                            clears=np.array(self.clears, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads strokes saved by save.
+
+        Parameters:
+            path (str): The NPZ file.
+
+        Returns:
+            (StrokeStore): The loaded store (nothing is marked as rasterized).
+        """
+        store = cls()
+        with np.load(path) as data:
+            stroke_color = data["stroke_color"]
+            for stroke in range(len(stroke_color)):
+                store.start_stroke(int(data["stroke_hand"][stroke]), tuple(stroke_color[stroke].tolist()),
+                                   int(data["stroke_width"][stroke]), float(data["stroke_time"][stroke]))
+            n_segments = len(data["segments"])
+            for name in ("segments", "segment_stroke", "segment_time", "segment_hidden"):
+                store.grow(name, n_segments)
+                if name in data:
+                    getattr(store, name)[:n_segments] = data[name]
+            store.n_segments = n_segments
+            store.clears = data["clears"].tolist()
+        return store
+
+    def export_svg(self, path, width, height):
+        """
+        Exports everything drawn since the last clear as an SVG file (black
+        background, so eraser strokes stay black like on the canvas).
+
+        Parameters:
+            path (str): The output path.
+            width (int): The drawing width in pixels.
+            height (int): The drawing height in pixels.
+        """
+        start = self.visible_start()
+        visible = ~self.segment_hidden[start:self.n_segments]
+        lines = ['<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" viewBox="0 0 {0} {1}">'
+                 .format(width, height),
+                 '<rect width="100%" height="100%" fill="black"/>']
+
+        # One polyline per stroke (its segments are chained)
+        strokes = self.segment_stroke[start:self.n_segments]
+        for stroke in np.unique(strokes[visible]):
+            segments = self.segments[start:self.n_segments][(strokes == stroke) & visible]
+            points = np.concatenate((segments[:1, :2], segments[:, 2:]))
+            b, g, r = self.stroke_color[stroke].tolist()
+            lines.append('<polyline points="{}" fill="none" stroke="rgb({},{},{})" stroke-width="{}" '
+                         'stroke-linecap="round" stroke-linejoin="round"/>'
+                         .format(" ".join("{},{}".format(x, y) for x, y in points.tolist()),
+                                 r, g, b, int(self.stroke_width[stroke])))
+
+        lines.append("</svg>")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
@@ -0,0 +1,275 @@
+import cv2
+import numpy as np
+
+
+class TiledCanvas:
+    """Class representing an unbounded drawing canvas stored as sparse tiles.
+
+    The canvas is split into square tiles in world coordinates and a tile is
+    only allocated once ink lands on it. A view (offset and zoom) maps world
+    coordinates to the screen, and compositing only reads the tiles that
+    intersect the viewport, so the cost per frame does not grow with the size
+    of the drawing.
+    """
+
+    def __init__(self, viewport, tile_size=128, min_zoom=0.25, max_zoom=4.0):
+        """
+        Initializes a TiledCanvas object.
+
+        Parameters:
+            viewport (tuple of ints): The top, left, bottom, right screen
+                                      pixels the canvas is shown in.
+            tile_size (int): The tile side length in world pixels.
+            min_zoom (float): The smallest zoom (bounds the number of
+                              visible tiles).
+            max_zoom (float): The largest zoom.
+        """
+
+        # Defining class attributes with constructor args
+        self.viewport = viewport
+        self.tile_size = tile_size
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+
+        # Tile row, tile col -> [image, mask] of every tile with ink
+        self.tiles = {}
+
+        # World x, y shown at the screen origin and screen pixels per world pixel
+        self.offset = np.zeros(2, dtype=np.float64)
+        self.zoom = 1.0
+
+    def is_empty(self):
+        """
+        Checks if the canvas has no tiles.
+
+        Returns:
+            (bool): Whether or not nothing has been drawn since the last clear.
+        """
+        return not self.tiles
+
+    def screen_to_world(self, points):
+        """
+        Converts screen positions to world positions.
+
+        Parameters:
+            points (numpy array): x, y screen positions with shape (..., 2).
+
+        Returns:
+            (numpy array of ints): The x, y world positions.
+        """
+        return np.rint(np.asarray(points) / self.zoom + self.offset).astype(np.int32)
+
+    def pan_zoom(self, prev_center, center, factor=1.0):
+        """
+        Moves and scales the view so the world point that was under one
+        screen position ends up under another.
+
+        Parameters:
+            prev_center (tuple of floats): The previous x, y screen position.
+            center (tuple of floats): The current x, y screen position.
+            factor (float): The change in zoom.
+        """
+        anchor = np.asarray(prev_center, dtype=np.float64) / self.zoom + self.offset
+        self.zoom = float(np.clip(self.zoom * factor, self.min_zoom, self.max_zoom))
+        self.offset = anchor - np.asarray(center, dtype=np.float64) / self.zoom
+
+    def tile_keys(self, lines, thickness, shift=0):
+        """
+        Finds the tiles each line segment touches.
+
+        Parameters:
+            lines (list of 2d numpy arrays): (2, 2) int32 arrays holding the
+                                             x, y world start and end of each
+                                             segment.
+            thickness (int): The line thickness.
+            shift (int): Number of fractional bits in the coordinates.
+
+        Returns:
+            (dict): Tile row, tile col -> list of indices into lines.
+        """
+
+        # Bounding box of each segment including its thickness, in tiles
+        points = np.stack(lines) >> shift
+        half = thickness // 2 + 1
+        x_min = (points[:, :, 0].min(axis=1) - half) // self.tile_size
+        x_max = (points[:, :, 0].max(axis=1) + half) // self.tile_size
+        y_min = (points[:, :, 1].min(axis=1) - half) // self.tile_size
+        y_max = (points[:, :, 1].max(axis=1) + half) // self.tile_size
+
+        keys = {}
+        for i, (r0, r1, c0, c1) in enumerate(zip(y_min.tolist(), y_max.tolist(), x_min.tolist(), x_max.tolist())):
+            for row in range(r0, r1 + 1):
+                for col in range(c0, c1 + 1):
+                    keys.setdefault((row, col), []).append(i)
+
+        return keys
+
+    def draw_segments(self, lines, color, thickness, shift=0):
+        """
+        Draws many line segments of the same color and thickness, allocating
+        tiles only where ink lands.
+
+        Parameters:
+            lines (list of 2d numpy arrays): (2, 2) int32 arrays holding the
+                                             x, y world start and end of each
+                                             segment.
+            color (tuple of ints): The bgr color code for the lines. Black
+                                   erases.
+            thickness (int): The line thickness.
+            shift (int): Number of fractional bits in the coordinates.
+        """
+
+        # Case for nothing to draw
+        if not lines:
+            return
+
+        ink = 255 if any(color) else 0
+        for key, index in self.tile_keys(lines, thickness, shift).items():
+            tile = self.tiles.get(key)
+
+            # Erasing never allocates tiles
+            if tile is None:
+                if not ink:
+                    continue
+                tile = self.tiles[key] = [np.zeros((self.tile_size, self.tile_size, 3), dtype=np.uint8),
+                                          np.zeros((self.tile_size, self.tile_size), dtype=np.uint8)]
+
+            # Segments in tile coordinates
+            origin = np.array([key[1], key[0]], dtype=np.int32) * (self.tile_size << shift)
+            tile_lines = [lines[i] - origin for i in index]
+            cv2.polylines(tile[0], tile_lines, False, color, thickness, shift=shift)
+            cv2.polylines(tile[1], tile_lines, False, ink, thickness, shift=shift)
+
+            # Free tiles that were erased completely
+            if not ink and not tile[1].any():
+                del self.tiles[key]
+
+    def clear(self):
+        """Erases all drawings by dropping every tile."""
+        self.tiles = {}
+
+    def visible_tiles(self):
+        """
+        Finds the allocated tiles that intersect the viewport.
+
+        Returns:
+            (list of tuples): The tile row, tile col of each visible tile.
+        """
+        top, left, bottom, right = self.viewport
+        x0, y0 = (np.floor(np.array([left, top]) / self.zoom + self.offset).astype(int) // self.tile_size).tolist()
+        x1, y1 = (np.floor(np.array([right, bottom]) / self.zoom + self.offset).astype(int) // self.tile_size).tolist()
+
+        # Iterate whichever is smaller: the visible tile range or the allocated tiles
+        if (x1 - x0 + 1) * (y1 - y0 + 1) < len(self.tiles):
+            return [(row, col) for row in range(y0, y1 + 1) for col in range(x0, x1 + 1) if (row, col) in self.tiles]
+        return [key for key in self.tiles if y0 <= key[0] <= y1 and x0 <= key[1] <= x1]
+
+    def composite(self, frame):
+        """
+        Copies the visible drawings onto a frame in place.
+
+        Parameters:
+            frame (3d numpy array): The frame to draw on.
+
+        Returns:
+            (3d numpy array): The input frame with the drawings added.
+        """
+        top, left, bottom, right = self.viewport
+        for row, col in self.visible_tiles():
+
+            # Screen edges of the tile (computed from world edges so neighbouring tiles never leave gaps)
+            world_edges = np.array([[col, row], [col + 1, row + 1]], dtype=np.float64) * self.tile_size
+            (sx0, sy0), (sx1, sy1) = np.floor((world_edges - self.offset) * self.zoom).astype(int).tolist()
+            if sx1 <= sx0 or sy1 <= sy0:
+                continue
+
+            # Tile scaled to the screen
+            image, mask = self.tiles[(row, col)]
+            if self.zoom != 1.0:
+                image = cv2.resize(image, (sx1 - sx0, sy1 - sy0), interpolation=cv2.INTER_NEAREST)
+                mask = cv2.resize(mask, (sx1 - sx0, sy1 - sy0), interpolation=cv2.INTER_NEAREST)
+
+            # Clip to the viewport and copy in place through the mask
+            cx0, cy0 = max(sx0, left), max(sy0, top)
+            cx1, cy1 = min(sx1, right), min(sy1, bottom)
+            if cx1 <= cx0 or cy1 <= cy0:
+                continue
+            src = (slice(cy0 - sy0, cy1 - sy0), slice(cx0 - sx0, cx1 - sx0))
+            cv2.copyTo(image[src], mask[src], frame[cy0:cy1, cx0:cx1])
+
+        return frame
+
+    def tile_in_bounds(self, key, tile_size):
+        """
+        Checks if a tile lies on the canvas (always true for an unbounded
+        canvas).
+
+        Parameters:
+            key (tuple of ints): The tile row, tile col.
+            tile_size (int): The tile side length in pixels.
+
+        Returns:
+            (bool): Whether or not the tile overlaps the canvas.
+        """
+        return True
+
+    def check_tile_size(self, tile_size):
+        """
+        Raises an error if a tile size differs from the canvas tiles.
+
+        Parameters:
+            tile_size (int): The tile side length in pixels.
+        """
+        if tile_size != self.tile_size:
+            raise ValueError("Tile size {} does not match the canvas tile size {}".format(tile_size, self.tile_size))
+
+    def read_tile(self, key, tile_size):
+        """
+        Copies a tile of the image and mask.
+
+        Parameters:
+            key (tuple of ints): The tile row, tile col.
+            tile_size (int): The tile side length in pixels.
+
+        Returns:
+            (3d numpy array), (2d numpy array): The image and mask of the tile
+                                                (zeros if it is not
+                                                allocated).
+        """
+        self.check_tile_size(tile_size)
+        tile = self.tiles.get(key)
+        if tile is None:
+            return (np.zeros((tile_size, tile_size, 3), dtype=np.uint8),
+                    np.zeros((tile_size, tile_size), dtype=np.uint8))
+        return tile[0].copy(), tile[1].copy()
+
+    def write_tile(self, key, tile_size, image, mask):
+        """
+        Overwrites a tile of the image and mask.
+
+        Parameters:
+            key (tuple of ints): The tile row, tile col.
+            tile_size (int): The tile side length in pixels.
+            image (3d numpy array): The tile image.
+            mask (2d numpy array): The tile mask.
+        """
+        self.check_tile_size(tile_size)
+
+        # Tiles without ink are not kept
+        if not mask.any():
+            self.tiles.pop(key, None)
+        else:
+            self.tiles[key] = [image.copy(), mask.copy()]
+
+    def ink_tiles(self, tile_size):
+        """
+        Finds the tiles that hold ink.
+
+        Parameters:
+            tile_size (int): The tile side length in pixels.
+
+        Returns:
+            (list of tuples): The tile row, tile col of each tile with ink.
+        """
+        self.check_tile_size(tile_size)
+        return list(self.tiles)
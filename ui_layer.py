@@ -0,0 +1,154 @@
+import cv2
+import numpy as np
+
+
+class UILayer:
+    """Class representing a pre-rendered, semi-transparent UI overlay.
+
+    The overlay covers a horizontal band at the top of the frame. It is built
+    once from regions and shapes and then blended onto every frame in a single
+    pass. It only needs rebuilding when something it shows changes.
+    """
+
+    def __init__(self, width, height):
+        """
+        Initializes a UILayer object.
+
+        Parameters:
+            width (int): The width of the overlay in pixels.
+            height (int): The height of the band covered by the overlay.
+        """
+
+        # Defining class attributes with constructor args
+        self.width = width
+        self.height = height
+
+        # Color layer and per pixel opacity
+        self.color_layer = np.zeros((height, width, 3), dtype=np.uint8)
+        self.alpha_mask = np.zeros((height, width), dtype=np.float32)
+
+        # Blend weights and output buffer (set up by finish)
+        self.weights = np.zeros((height, width), dtype=np.float32)
+        self.bg_weights = np.ones((height, width), dtype=np.float32)
+        self.blend_buf = np.zeros((height, width, 3), dtype=np.uint8)
+
+        # Key describing the state the overlay was built for
+        self.key = None
+
+    def needs_rebuild(self, key):
+        """
+        Checks if the overlay was built for a different UI state.
+
+        Parameters:
+            key (hashable): Description of the current UI state.
+
+        Returns:
+            (bool): Whether or not the overlay must be rebuilt.
+        """
+        return key != self.key
+
+    def clear(self):
+        """Resets the overlay to fully transparent."""
+        self.color_layer[:] = 0
+        self.alpha_mask[:] = 0
+
+    def add_region(self, region, **kwargs):
+        """
+        Adds a region (color, transparency, and text) to the overlay.
+
+        Parameters:
+            region (Region): The region to add.
+            **kwargs: Text options passed to Region.draw_layer.
+        """
+        region.draw_layer(self.color_layer, self.alpha_mask, **kwargs)
+
+    def add_outline(self, region, color, thickness):
+        """
+        Adds the opaque border of a region (of any shape) to the overlay.
+
+        Parameters:
+            region (Region): The region to outline.
+            color (tuple of ints): The bgr color code for the border.
+            thickness (int): Line thickness of the border.
+        """
+        region.draw_outline(self.color_layer, color, thickness)
+        region.draw_outline(self.alpha_mask, 1.0, thickness)
+
+    def add_rectangle(self, pt1, pt2, color, thickness):
+        """
+        Adds an opaque rectangle to the overlay.
+
+        Parameters:
+            pt1 (tuple of ints): The x, y position of one corner.
+            pt2 (tuple of ints): The x, y position of the opposite corner.
+            color (tuple of ints): The bgr color code for the rectangle.
+            thickness (int): Line thickness (-1 for a filled rectangle).
+        """
+        cv2.rectangle(self.color_layer, pt1, pt2, color, thickness)
+        cv2.rectangle(self.alpha_mask, pt1, pt2, 1.0, thickness)
+
+    def add_circle(self, center, radius, color, thickness):
+        """
+        Adds an opaque circle to the overlay.
+
+        Parameters:
+            center (tuple of ints): The x, y position of the center.
+            radius (int): The circle radius.
+            color (tuple of ints): The bgr color code for the circle.
+            thickness (int): Line thickness (-1 for a filled circle).
+        """
+        cv2.circle(self.color_layer, center, radius, color, thickness)
+        cv2.circle(self.alpha_mask, center, radius, 1.0, thickness)
+
+    def add_text(self, text, pos, color, font=cv2.FONT_HERSHEY_SIMPLEX, font_scale=0.8, thickness=2):
+        """
+        Adds opaque text to the overlay.
+
+        Parameters:
+            text (str): The text to add.
+            pos (tuple of ints): The x, y position of the bottom left corner.
+            color (tuple of ints): The bgr color code for the text.
+            font (int): The text font.
+            font_scale (float): Scale for text size.
+            thickness (int): Line thickness for text.
+        """
+        cv2.putText(self.color_layer, text, pos, font, font_scale, color, thickness)
+        cv2.putText(self.alpha_mask, text, pos, font, font_scale, 1.0, thickness)
+
+    def finish(self, key):
+        """
+        Precomputes blend weights after all elements have been added.
+
+        Parameters:
+            key (hashable): Description of the UI state the overlay shows.
+        """
+        np.copyto(self.weights, self.alpha_mask)
+        np.subtract(1.0, self.alpha_mask, out=self.bg_weights)
+        self.key = key
+
+    def apply(self, frame):
+        """
+        Blends the overlay onto the top band of a frame in place.
+
+        Parameters:
+            frame (3d numpy array): The frame to draw on.
+
+        Returns:
+            (3d numpy array): The input frame with the overlay blended in.
+        """
+
+        # Index the band covered by the overlay (clipped to the frame)
+        rows = min(self.height, frame.shape[0])
+        cols = min(self.width, frame.shape[1])
+        band = frame[:rows, :cols]
+
+        # Case for a frame that exactly matches the overlay (the common case; no extra copies)
+        if rows == self.height and cols == self.width:
+            cv2.blendLinear(self.color_layer, band, self.weights, self.bg_weights, self.blend_buf)
+            band[:] = self.blend_buf
+
+        else:
+            band[:] = cv2.blendLinear(self.color_layer[:rows, :cols], band,
+                                      self.weights[:rows, :cols], self.bg_weights[:rows, :cols])
+
+        return frame
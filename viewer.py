@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import json
+import time
+
+import cv2
+import numpy as np
+from broadcast import CLEAR, HEADER, HELLO, KEYFRAME, SEGMENTS, TILES, decode_tiles, read_message
+from canvas import Canvas
+from pipeline import LatencyStats
+from session import RECORD_DTYPE
+from tiled_canvas import TiledCanvas
+
+
+class Viewer:
+    """Class rebuilding a broadcast sketchpad canvas from its deltas."""
+
+    def __init__(self, host="127.0.0.1", port=8765, read_delay=0.0):
+        """
+        Initializes a Viewer object.
+
+        Parameters:
+            host (str): The address of the broadcasting sketchpad.
+            port (int): The broadcast port.
+            read_delay (float): Seconds to sleep after every message
+                                (simulates a slow viewer).
+        """
+
+        # Defining class attributes with constructor args
+        self.host = host
+        self.port = port
+        self.read_delay = read_delay
+
+        # Canvas (created from the hello message)
+        self.canvas = None
+
+        # Statistics
+        self.bytes_received = 0
+        self.messages_received = 0
+        self.keyframes = 0
+        self.latency = LatencyStats(window=100000)
+        self.start_time = None
+
+    def apply(self, kind, payload):
+        """
+        Applies one message to the canvas.
+
+        Parameters:
+            kind (int): The message kind.
+            payload (bytes): The message body.
+        """
+
+        # Setting up a canvas matching the broadcast one
+        if kind == HELLO:
+            hello = json.loads(payload.decode())
+            if hello["infinite"]:
+                self.canvas = TiledCanvas((0, 0, 720, 1280), tile_size=hello["tile_size"])
+            else:
+                self.canvas = Canvas(hello["width"], hello["height"])
+
+        # Drawing segments (one call per run of the same color and width)
+        elif kind == SEGMENTS:
+            records = np.frombuffer(payload, dtype=RECORD_DTYPE)
+            styles = records["color"].astype(np.int32) @ np.array([1 << 16, 1 << 8, 1]) * 1024 + records["width"]
+            bounds = np.concatenate(([0], np.flatnonzero(np.diff(styles)) + 1, [len(records)]))
+            lines = records["coords"].reshape(-1, 2, 2)
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                self.canvas.draw_segments(list(lines[start:end]), tuple(records["color"][start].tolist()),
+                                          int(records["width"][start]))
+
+        # Replacing tiles (a keyframe replaces the whole canvas)
+        elif kind in (TILES, KEYFRAME):
+            if kind == KEYFRAME:
+                self.canvas.clear()
+                self.keyframes += 1
+            tile_size, tiles = decode_tiles(payload)
+            for key, image, mask in tiles:
+                self.canvas.write_tile(key, tile_size, image, mask)
+
+        elif kind == CLEAR:
+            self.canvas.clear()
+
+    async def run(self, display=False, duration=None):
+        """
+        Receives and applies deltas until the connection closes.
+
+        Parameters:
+            display (bool): Whether or not to show the canvas in a window.
+            duration (float): Seconds to run for (None until disconnected).
+        """
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        self.start_time = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.receive(reader, display), duration)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def receive(self, reader, display):
+        """
+        Applies messages as they arrive.
+
+        Parameters:
+            reader (asyncio.StreamReader): The connection.
+            display (bool): Whether or not to show the canvas in a window.
+        """
+        last_shown = 0.0
+        while True:
+            kind, payload, t = await read_message(reader)
+
+            # Recording size and creation-to-applied latency
+            self.apply(kind, payload)
+            self.latency.add(time.time() - t)
+            self.bytes_received += HEADER.size + len(payload)
+            self.messages_received += 1
+
+            # Showing the canvas at most 30 times a second
+            if display and time.perf_counter() - last_shown > 1 / 30:
+                last_shown = time.perf_counter()
+                if isinstance(self.canvas, TiledCanvas):
+                    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+                else:
+                    frame = np.zeros((self.canvas.height, self.canvas.width, 3), dtype=np.uint8)
+                cv2.imshow("Sketchpad Viewer", self.canvas.composite(frame))
+                if cv2.waitKey(1) == ord('q'):
+                    return
+
+            if self.read_delay:
+                await asyncio.sleep(self.read_delay)
+
+    def summary(self):
+        """
+        Summarizes what the viewer received.
+
+        Returns:
+            (dict): Bytes, messages, bytes per second, keyframes, and latency
+                    percentiles in milliseconds.
+        """
+        elapsed = time.perf_counter() - self.start_time if self.start_time is not None else 0.0
+        return {"bytes": self.bytes_received,
+                "messages": self.messages_received,
+                "bytes_per_s": self.bytes_received / elapsed if elapsed > 0 else 0.0,
+                "keyframes": self.keyframes,
+                "latency_ms": self.latency.summary()}
+
+
+def parse_args():
+    """
+    Parses command line arguments.
+
+    Returns:
+        (argparse.Namespace): The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="View a broadcast Interactive Sketchpad canvas")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address of the sketchpad started with --broadcast")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="broadcast port")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    viewer = Viewer(args.host, args.port)
+    asyncio.run(viewer.run(display=True))
+    cv2.destroyAllWindows()
+    print(json.dumps(viewer.summary(), indent=2))